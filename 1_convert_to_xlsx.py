@@ -1,160 +1,112 @@
-import pandas as pd
-import sqlparse
+import os
 import re
+import time
+from decimal import Decimal
+from compressed_io import compressed_position, find_dump, open_dump
+from dedup import RowDeduplicator
+from dump_reader import iter_raw_statements
+from excel_export import ExcelExport
+from insert_parser import parse_insert
+from instrumentation import Instrumentation, Progress, report_path
+from row_spool import RowSpool
 
 # Hardcoded input and output files
 INPUT_SQL_FILE = "0_to_be_convert.sql"
 OUTPUT_XLSX_FILE = "1_insert_data.xlsx"
+# Statements with this anywhere in them are parsed as INSERTs
+_INSERT_KEYWORD = re.compile(r'INSERT INTO', re.IGNORECASE)
+
+def excel_value(value):
+    """Convert a parsed SQL value into something Excel can hold losslessly"""
+    if isinstance(value, bytes):
+        # PostgreSQL bytea hex format, so it survives the trip to step 3
+        return '\\x' + value.hex()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
 
 def extract_insert_data(sql_statement):
-    # Extract table name from INSERT statement
-    table_name = re.search(r"INSERT INTO [`]?(\w+)[`]?", sql_statement, re.IGNORECASE)
-    if not table_name:
-        return None, None
-    
-    table_name = table_name.group(1)
-    print(f"Processing table: {table_name}")
-    
-    # Extract all value groups - Modified to handle multiple VALUES sections
-    # Updated pattern to better handle multiple INSERT VALUES
-    values_pattern = r'VALUES?\s*(\((?:[^()]|\([^()]*\))*\)(?:\s*,\s*\((?:[^()]|\([^()]*\))*\))*)'
-    values_match = re.search(values_pattern, sql_statement, re.IGNORECASE | re.DOTALL)
+    # Parse table name, column list and typed rows in a single pass
+    try:
+        parsed = parse_insert(sql_statement)
+    except ValueError as e:
+        print(f"No values found: {e}")
+        return None, None, None
+    if not parsed:
+        return None, None, None
     
-    if not values_match:
-        # Try alternate pattern for different VALUES format
-        values_pattern = r'VALUES?\s*(\([^;]+\)(?:\s*,\s*\([^;]+\))*)'
-        values_match = re.search(values_pattern, sql_statement, re.IGNORECASE | re.DOTALL)
-        if not values_match:
-            print(f"No values found for table {table_name}")
-            return None, None
-    
-    # Get the values section and normalize whitespace
-    values_section = values_match.group(1)
-    values_section = re.sub(r'\s+', ' ', values_section)
-    
-    # Split into individual value groups
-    value_groups = []
-    current_group = []
-    buffer = ''
-    in_quotes = False
-    paren_level = 0
+    table_name, columns, rows = parsed
+    if not rows:
+        return None, None, None
+
+    # Use column names from the INSERT statement when they line up
+    if columns and len(columns) != len(rows[0]):
+        print(f"Column mismatch for {table_name}: {len(columns)} names but {len(rows[0])} values")
+        columns = None
     
-    for char in values_section:
-        if char == "'" and not in_quotes:
-            in_quotes = True
-            buffer += char
-        elif char == "'" and in_quotes:
-            in_quotes = False
-            buffer += char
-        elif char == '(' and not in_quotes:
-            paren_level += 1
-            if paren_level == 1:
-                buffer = ''
-            else:
-                buffer += char
-        elif char == ')' and not in_quotes:
-            paren_level -= 1
-            if paren_level == 0:
-                if buffer:
-                    current_group.append(buffer.strip())
-                if current_group:
-                    value_groups.append(current_group)
-                current_group = []
-            else:
-                buffer += char
-        elif char == ',' and not in_quotes:
-            if paren_level == 0:
-                continue
-            if paren_level == 1:
-                if buffer.strip():
-                    current_group.append(buffer.strip())
-                buffer = ''
-            else:
-                buffer += char
-        else:
-            buffer += char
+    return table_name, columns, rows
 
-    # Clean values and create rows
-    cleaned_rows = []
-    for group in value_groups:
-        cleaned_row = []
-        for val in group:
-            # Remove leading/trailing quotes and spaces
-            val = val.strip()
-            if val.lower() == 'null':
-                val = None
-            elif (val.startswith("'") and val.endswith("'")) or (val.startswith('"') and val.endswith('"')):
-                # Keep semicolons and other special characters within quotes
-                val = val[1:-1]  # Remove quotes but preserve content including semicolons
-            cleaned_row.append(val)
-        if cleaned_row:  # Only append non-empty rows
-            cleaned_rows.append(cleaned_row)
+def spooled_tables(spool):
+    """Yield (table_name, columns, rows) for each spooled table, rows read back lazily"""
+    for table_name in spool.tables():
+        rows = ([excel_value(val) for val in row] for row in spool.iter_rows(table_name))
+        yield table_name, spool.columns(table_name), rows
 
-    # Create DataFrame
-    if cleaned_rows:
-        df = pd.DataFrame(cleaned_rows)
-    else:
-        return None, None
+def write_excel(tables, output_file, stats=None):
+    """Write each table to its own sheets of an Excel file.
 
-    # Try to extract column names
-    columns_match = re.search(r"INSERT INTO.*?\((.*?)\)\s*VALUES?", sql_statement, re.IGNORECASE | re.DOTALL)
-    if columns_match:
-        columns = [col.strip().strip('`').strip('"') for col in columns_match.group(1).split(',')]
-        if len(columns) == len(df.columns):
-            df.columns = columns
-            print(f"Found {len(columns)} columns for table {table_name}")
-        else:
-            print(f"Column mismatch for {table_name}: {len(columns)} names but {len(df.columns)} values")
-    
-    print(f"Extracted {len(cleaned_rows)} rows for table {table_name}")
-    return table_name, df
+    tables is an iterable of (table_name, columns, rows), and rows are
+    streamed into the file one at a time, so memory doesn't grow with the
+    size of a table. Tables longer than a sheet continue on table_2,
+    table_3, ... sheets. The time spent on each table is added to stats
+    if given.
+    """
+    stats = stats or Instrumentation()
+    print("\nWriting tables to Excel")
+    with ExcelExport(output_file) as export:
+        for table_name, columns, rows in tables:
+            with stats.timer('excel', table_name):
+                row_count = export.add_table(table_name, columns, rows)
+            print(f"Wrote table: {table_name} with {row_count} rows")
 
-def main():
-    # Read SQL file
-    print(f"Reading SQL file: {INPUT_SQL_FILE}")
-    with open(INPUT_SQL_FILE, 'r', encoding='utf-8') as file:
-        sql_content = file.read()
-    
-    # Parse SQL content and combine INSERT statements for the same table
-    statements = sqlparse.split(sql_content)
-    print(f"Found {len(statements)} SQL statements")
-    
-    # Dictionary to store DataFrames for each table
-    tables_data = {}
+def main(input_file=INPUT_SQL_FILE, output_file=OUTPUT_XLSX_FILE):
+    # Stream statements from the SQL file instead of loading it whole
+    print(f"Reading SQL file: {input_file}")
     
-    # Process each statement
-    for i, statement in enumerate(statements):
-        print(f"\nProcessing statement {i+1}/{len(statements)}")
-        if 'INSERT INTO' in statement.upper():
-            table_name, df = extract_insert_data(statement)
-            if table_name and df is not None and not df.empty:
-                if table_name in tables_data:
-                    # Concatenate with existing data for the same table
-                    print(f"Appending {len(df)} rows to existing table {table_name}")
-                    tables_data[table_name] = pd.concat([tables_data[table_name], df], ignore_index=True)
-                else:
-                    tables_data[table_name] = df
+    stats = Instrumentation()
+    progress = Progress(f"Reading {input_file}", os.path.getsize(input_file))
     
-    # Add debug print
-    for statement in statements:
-        if 'INSERT INTO `master_data_supplier`' in statement:
-            print("Found master_data_supplier insert statement:")
-            print(statement[:200])  # Print first 200 chars for debugging
-            table_name, df = extract_insert_data(statement)
-            if df is not None:
-                print(f"Extracted {len(df)} rows")
-            else:
-                print("Failed to extract data")
-    
-    # Write all tables to Excel
-    print(f"\nWriting {len(tables_data)} tables to Excel")
-    with pd.ExcelWriter(OUTPUT_XLSX_FILE, engine='xlsxwriter') as writer:
-        for table_name, df in tables_data.items():
-            # Remove duplicates before writing
-            df = df.drop_duplicates()
-            df.to_excel(writer, sheet_name=table_name, index=False)
-            print(f"Wrote table: {table_name} with {len(df)} rows")
+    # Rows are deduplicated and spilled to disk per table as they are parsed
+    with RowSpool() as spool, RowDeduplicator() as dedup:
+        # Process each statement as soon as it has been read
+        statement_count = 0
+        with open_dump(input_file) as dump, stats.stage('read'):
+            for _, end, raw_statement in iter_raw_statements(dump):
+                statement_count += 1
+                statement = raw_statement.decode('utf-8', errors='surrogateescape')
+                if _INSERT_KEYWORD.search(statement):
+                    started = time.perf_counter()
+                    table_name, columns, rows = extract_insert_data(statement)
+                    if table_name:
+                        stats.add_time('parse', time.perf_counter() - started, table_name)
+                    if table_name and rows:
+                        # Remove duplicates as batches arrive rather than on whole tables
+                        with stats.timer('dedup', table_name):
+                            rows = dedup.filter_rows(table_name, columns, rows)
+                        with stats.timer('spool', table_name):
+                            spool.append(table_name, columns, rows)
+                        stats.count('rows', len(rows), table_name)
+                        stats.count('bytes', len(raw_statement), table_name)
+                        progress.update(compressed_position(dump, end), len(rows))
+        progress.finish()
+        print(f"Found {statement_count} SQL statements")
+        dedup.report()
+
+        with stats.stage('excel'):
+            write_excel(spooled_tables(spool), output_file, stats)
+    stats.report()
+    stats.save_report(report_path(output_file), input_file=input_file, output_file=output_file)
 
 if __name__ == "__main__":
-    main()
+    main(find_dump(INPUT_SQL_FILE))
     print(f"\nConversion completed! File saved as {OUTPUT_XLSX_FILE}")
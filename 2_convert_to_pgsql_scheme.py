@@ -1,73 +1,228 @@
 import re
+from compressed_io import find_dump, open_dump
+from dump_reader import iter_raw_statements
+from schema_model import build_schema, sidecar_path, split_definitions
+from section_manifest import ManifestWriter
+
+# A single pass over each DDL statement handles everything that needs
+# rewriting. Quoted strings and backticked identifiers are matched first,
+# so words like "text" inside a default value or column name are left alone.
+_QUOTED = r"'(?:[^'\\]|\\.|'')*'"
+DDL_TOKEN = re.compile(rf"""
+    (?P<string>{_QUOTED})
+  | `(?P<identifier>(?:[^`]|``)*)`
+  | \b(?P<enum>enum|set)\s*\((?:{_QUOTED}|[^)'])*\)
+  | \b(?P<type>tinyint|smallint|mediumint|bigint|integer|int|float|double|datetime|varchar|varbinary|binary
+        |tinytext|mediumtext|longtext|text|tinyblob|mediumblob|longblob|blob|decimal|bit)\b(?!\s+precision)
+    (?P<params>\s*\([^)]*\))?
+  | (?P<drop>\s+UNSIGNED\b|\s+ZEROFILL\b|\s+(?:CHARACTER\s+SET|CHARSET)\s*=?\s*\w+|\s+COLLATE\s*=?\s*\w+
+        |\s+COMMENT\s+{_QUOTED}|\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP(?:\(\d*\))?)
+""", re.IGNORECASE | re.VERBOSE)
+
+# MySQL type -> (PostgreSQL type, whether to keep the MySQL parameters)
+TYPE_MAPPINGS = {
+    'tinyint': ('smallint', False),
+    'smallint': ('smallint', False),
+    'mediumint': ('integer', False),
+    'int': ('integer', False),
+    'integer': ('integer', False),
+    'bigint': ('bigint', False),
+    'float': ('float', False),
+    'double': ('double precision', False),
+    'datetime': ('timestamp', True),
+    'varchar': ('character varying', True),
+    'varbinary': ('bytea', False),
+    'binary': ('bytea', False),
+    'tinytext': ('text', False),
+    'mediumtext': ('text', False),
+    'longtext': ('text', False),
+    'text': ('text', False),
+    'tinyblob': ('bytea', False),
+    'mediumblob': ('bytea', False),
+    'longblob': ('bytea', False),
+    'blob': ('bytea', False),
+    'decimal': ('numeric', True),
+    'bit': ('bit', True),
+}
+SERIAL_TYPES = {'smallint': 'smallserial', 'integer': 'serial', 'bigint': 'bigserial'}
+
+_AUTO_INCREMENT_COLUMN = re.compile(
+    r'^(\s*)(\w+)\s+(smallint|integer|bigint)\b(.*?)\s+AUTO_INCREMENT\b', re.MULTILINE | re.IGNORECASE
+)
+_MODIFY_AUTO_INCREMENT = re.compile(r'MODIFY\s+(\w+)\s[^,;]*?\bAUTO_INCREMENT\b', re.IGNORECASE)
+# The AUTO_INCREMENT=N table option, the next value MySQL would have given out
+_AUTO_INCREMENT_OPTION = re.compile(r'\bAUTO_INCREMENT\s*=\s*(\d+)', re.IGNORECASE)
+_BOOLEAN_DEFAULT = re.compile(r"(\bboolean\b[^,\n]*?\bDEFAULT\s+)'?([01])'?", re.IGNORECASE)
+# Zero dates are loaded as NULL, so a NOT NULL that comes with a zero date default goes too
+_ZERO_DATE_DEFAULT = re.compile(r"(?:\s+NOT\s+NULL)?\s+DEFAULT\s+'0000-00-00(?: 00:00:00)?'", re.IGNORECASE)
+
+# Secondary indexes, inline in CREATE TABLE (mysqldump) or added by ALTER TABLE (phpMyAdmin).
+# Column lists may carry prefix lengths like name(10).
+_INDEX_BODY = r'(?:(UNIQUE|FULLTEXT|SPATIAL)\s+)?(?:KEY|INDEX)(?:\s+(\w+))?\s*\(((?:[^()]|\(\d+\))*)\)'
+_INDEX_DEFINITION = re.compile(_INDEX_BODY + r'(?:\s+USING\s+\w+)?', re.IGNORECASE)
+_UNIQUE_DEFINITION = re.compile(r'(UNIQUE)(?:\s+(\w+))?\s*\(((?:[^()]|\(\d+\))*)\)', re.IGNORECASE)
+_ADD_INDEX = re.compile(r'\bADD\s+' + _INDEX_BODY, re.IGNORECASE)
+_FOREIGN_KEY_DEFINITION = re.compile(
+    r'(?:CONSTRAINT\s+\w+\s+)?FOREIGN KEY\s*\(([^)]+)\)\s*REFERENCES\s*(\w+)\s*\(([^)]+)\)', re.IGNORECASE
+)
+
+def _rewrite_token(match):
+    if match.group('string') is not None:
+        return match.group('string')
+    if match.group('identifier') is not None:
+        return match.group('identifier').replace('``', '`')
+    if match.group('enum'):
+        return 'character varying'
+    if match.group('drop'):
+        return ''
+
+    mysql_type = match.group('type').lower()
+    params = match.group('params') or ''
+    width = params.replace(' ', '')
+    if (mysql_type == 'tinyint' and width == '(1)') or (mysql_type == 'bit' and width in ('', '(1)')):
+        return 'boolean'
+    pg_type, keep_params = TYPE_MAPPINGS[mysql_type]
+    return pg_type + params.strip() if keep_params else pg_type
+
+def convert_ddl(statement):
+    """Rewrite MySQL types and syntax in one CREATE or ALTER TABLE statement"""
+    return DDL_TOKEN.sub(_rewrite_token, statement)
+
+def index_statement(table, kind, name, columns):
+    """Return a CREATE INDEX statement for a MySQL index, or None to skip it"""
+    if kind and kind.upper() in ('FULLTEXT', 'SPATIAL'):
+        # No direct PostgreSQL equivalent; these need a manual GIN/GiST index
+        return None
+    columns = [re.sub(r'\(\d+\)', '', column).strip() for column in columns.split(',')]
+    # PostgreSQL index names are unique per schema, not per table
+    index_name = name or '_'.join(columns)
+    if not index_name.startswith(table + '_'):
+        index_name = f"{table}_{index_name}"
+    index_name = index_name[:63]
+    unique = 'UNIQUE ' if kind and kind.upper() == 'UNIQUE' else ''
+    return f"CREATE {unique}INDEX {index_name} ON {table} ({', '.join(columns)});"
+
+# The table a statement made by foreign_key_statement() points at
+_REFERENCED_TABLE = re.compile(r'REFERENCES (\w+)\(')
+
+def foreign_key_statement(table, columns, ref_table, ref_columns):
+    return f"ALTER TABLE {table}\n  ADD FOREIGN KEY ({columns}) REFERENCES {ref_table}({ref_columns});"
+
+def convert_create_table(statement, auto_increment_columns=()):
+    """Convert one MySQL CREATE TABLE statement to PostgreSQL.
+
+    Returns (create_statement, index_statements, foreign_key_statements).
+    Secondary indexes and foreign keys are taken out of the table body, so
+    they can be built after the data has been loaded.
+    """
+    converted = convert_ddl(statement)
+    body_start = converted.index('(')
+    # Table options (ENGINE=, AUTO_INCREMENT=, DEFAULT CHARSET=...) follow the body
+    body_end = converted.rindex(')')
+    header = converted[:body_start].rstrip()
+    table = re.search(r'(\w+)$', header).group(1)
+
+    definitions = []
+    index_statements = []
+    foreign_key_statements = []
+    for definition in split_definitions(converted[body_start + 1:body_end]):
+        index = _INDEX_DEFINITION.fullmatch(definition) or _UNIQUE_DEFINITION.fullmatch(definition)
+        foreign_key = _FOREIGN_KEY_DEFINITION.match(definition)
+        if index:
+            statement = index_statement(table, *index.groups())
+            if statement:
+                index_statements.append(statement)
+        elif foreign_key:
+            foreign_key_statements.append(foreign_key_statement(table, *foreign_key.groups()))
+        else:
+            definitions.append(definition)
+    converted = header + ' (\n  ' + ',\n  '.join(definitions) + '\n);'
+
+    # AUTO_INCREMENT columns, inline or from a later ALTER TABLE ... MODIFY, become serials
+    def to_serial(match):
+        return f"{match.group(1)}{match.group(2)} {SERIAL_TYPES[match.group(3).lower()]}{match.group(4)}"
+    converted = _AUTO_INCREMENT_COLUMN.sub(to_serial, converted)
+    for column in auto_increment_columns:
+        converted = re.sub(
+            rf'^(\s*{re.escape(column)}\s+)(smallint|integer|bigint)\b',
+            lambda match: match.group(1) + SERIAL_TYPES[match.group(2).lower()],
+            converted, count=1, flags=re.MULTILINE | re.IGNORECASE
+        )
+
+    # PostgreSQL rejects 0/1 as boolean defaults and zero dates altogether
+    converted = _BOOLEAN_DEFAULT.sub(
+        lambda match: match.group(1) + ('true' if match.group(2) == '1' else 'false'), converted
+    )
+    converted = _ZERO_DATE_DEFAULT.sub('', converted)
+    return converted, index_statements, foreign_key_statements
 
 def has_id_column(create_statement):
     # Check if the CREATE TABLE statement contains an 'id' column
     return bool(re.search(r'\bid\b.*?(?:integer|bigint|SERIAL)', create_statement, re.IGNORECASE))
 
+def read_ddl_statements(input_file):
+    """Return the CREATE TABLE and ALTER TABLE statements of a dump.
+
+    INSERT statements are skipped by looking at their first bytes only,
+    so row data is never decoded or run through the conversion rules.
+    """
+    create_statements = []
+    alter_statements = []
+    with open_dump(input_file) as f:
+        for _, _, statement in iter_raw_statements(f):
+            head = statement[:13].upper()
+            if head.startswith(b'CREATE TABLE'):
+                create_statements.append(statement.decode('utf-8', errors='surrogateescape'))
+            elif head.startswith(b'ALTER TABLE'):
+                alter_statements.append(statement.decode('utf-8', errors='surrogateescape'))
+    return create_statements, alter_statements
+
 def convert_mysql_to_postgresql(input_file, output_file):
-    # Read input file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Remove MySQL-specific syntax and convert to PostgreSQL
-    content = re.sub(r'`', '', content)  # Remove backticks
-    content = re.sub(r'ENGINE=.*?;', ';', content)
-    content = re.sub(r'AUTO_INCREMENT', 'SERIAL', content, flags=re.IGNORECASE)
-    content = re.sub(r'DEFAULT CHARSET=\w+', '', content)
-    content = re.sub(r'COLLATE \w+', '', content)
-    content = re.sub(r'UNSIGNED', '', content)
-    content = re.sub(r'DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP', 'DEFAULT CURRENT_TIMESTAMP', content)
-    
-    # Convert data types
-    type_mappings = {
-        r'tinyint\(1\)': 'boolean',
-        r'tinyint': 'boolean',
-        r'int\(\d+\)': 'integer',
-        r'smallint\(\d+\)': 'smallint',
-        r'mediumint\(\d+\)': 'integer',
-        r'bigint\(\d+\)': 'bigint',
-        r'float\(\d+,\d+\)': 'float',
-        r'double\(\d+,\d+\)': 'double precision',
-        r'datetime': 'timestamp',
-        r'varchar': 'character varying',
-        r'longtext': 'text',
-        r'mediumtext': 'text',
-        r'text': 'text',
-        r'longblob': 'bytea',
-        r'mediumblob': 'bytea',
-        r'blob': 'bytea',
-        r'enum\([^)]+\)': 'character varying',
-        r'decimal': 'numeric'
-    }
-    
-    for mysql_type, pg_type in type_mappings.items():
-        content = re.sub(mysql_type, pg_type, content, flags=re.IGNORECASE)
-    
-    # Extract CREATE TABLE statements only
-    create_statements = re.findall(r'CREATE TABLE.*?;', content, re.DOTALL | re.IGNORECASE)
-
-    # Also extract ALTER TABLE statements
-    alter_statements = re.findall(r'ALTER TABLE.*?;', content, re.DOTALL | re.IGNORECASE)
-    
-    # Clean up ALTER statements - remove backticks and CONSTRAINT syntax
-    cleaned_alter_statements = []
+    # Only DDL is read from the dump; its size doesn't depend on the data
+    write_schema(*read_ddl_statements(input_file), output_file)
+
+def write_schema(mysql_create_statements, mysql_alter_statements, output_file):
+    """Convert MySQL CREATE TABLE and ALTER TABLE statements into a schema file and its model"""
+    alter_statements = [convert_ddl(statement) for statement in mysql_alter_statements]
+
+    # Columns made AUTO_INCREMENT by ALTER TABLE ... MODIFY (phpMyAdmin style), and their next values
+    auto_increment_columns = {}
+    auto_increment_values = {}
     for statement in alter_statements:
-        # Remove backticks
-        cleaned = re.sub(r'`', '', statement)
-        # Convert foreign key syntax if needed
-        cleaned = re.sub(r'FOREIGN KEY \((.*?)\) REFERENCES (.*?) \((.*?)\)', 
-                        r'FOREIGN KEY (\1) REFERENCES \2 (\3)', cleaned)
-        # Clean up ON DELETE/UPDATE actions
-        cleaned = re.sub(r'ON DELETE CASCADE ON UPDATE CASCADE', 'ON DELETE CASCADE', cleaned)
-        cleaned = re.sub(r'ON UPDATE CASCADE', '', cleaned)
-        cleaned_alter_statements.append(cleaned)
-    
+        table_match = re.search(r'ALTER TABLE (\w+)', statement)
+        if table_match:
+            auto_increment_columns.setdefault(table_match.group(1), []).extend(
+                _MODIFY_AUTO_INCREMENT.findall(statement)
+            )
+            option = _AUTO_INCREMENT_OPTION.search(statement)
+            if option:
+                auto_increment_values[table_match.group(1)] = int(option.group(1))
+
+    create_statements = []
+    index_statements = []
+    foreign_key_statements = []
+    for statement in mysql_create_statements:
+        table_match = re.search(r'CREATE TABLE (?:IF NOT EXISTS )?`?(\w+)`?', statement, re.IGNORECASE)
+        table = table_match.group(1) if table_match else None
+        # Table options follow the body, after its last parenthesis
+        option = _AUTO_INCREMENT_OPTION.search(statement, statement.rfind(')') + 1)
+        if table and option:
+            auto_increment_values[table] = int(option.group(1))
+        create_statement, indexes, foreign_keys = convert_create_table(
+            statement, auto_increment_columns.get(table, ())
+        )
+        create_statements.append(create_statement)
+        index_statements.extend(indexes)
+        foreign_key_statements.extend(foreign_keys)
+
     # First extract table names to generate primary key statements
     primary_key_statements = []
+    table_names = set()
     for create_statement in create_statements:
         table_match = re.search(r'CREATE TABLE (\w+)', create_statement)
         if table_match:
             table = table_match.group(1)
+            table_names.add(table.lower())
             # Special cases for cache tables
             if table in ['cache', 'cache_locks']:
                 primary_key_statements.append(f"ALTER TABLE {table}\n  ADD PRIMARY KEY (key);")
@@ -75,42 +230,83 @@ def convert_mysql_to_postgresql(input_file, output_file):
             elif has_id_column(create_statement):
                 primary_key_statements.append(f"ALTER TABLE {table}\n  ADD PRIMARY KEY (id);")
 
-    # Extract and clean foreign key relationships
-    foreign_key_statements = []
+    # Extract secondary indexes and foreign key relationships
     for statement in alter_statements:
+        table_match = re.search(r'ALTER TABLE (\w+)', statement)
+        if not table_match:
+            continue
+        table_name = table_match.group(1)
+        for kind, name, columns in _ADD_INDEX.findall(statement):
+            index = index_statement(table_name, kind, name, columns)
+            if index:
+                index_statements.append(index)
         if 'FOREIGN KEY' in statement:
-            # Extract table name
-            table_name = re.search(r'ALTER TABLE (\w+)', statement).group(1)
             # Extract foreign key details
             fk_matches = re.findall(r'FOREIGN KEY\s*\(([^)]+)\)\s*REFERENCES\s*(\w+)\s*\(([^)]+)\)', statement)
             for fk_col, ref_table, ref_col in fk_matches:
-                foreign_key_statements.append(
-                    f"ALTER TABLE {table_name}\n  ADD FOREIGN KEY ({fk_col}) REFERENCES {ref_table}({ref_col});"
-                )
+                foreign_key_statements.append(foreign_key_statement(table_name, fk_col, ref_table, ref_col))
+
+    # A foreign key can only point at a table of this schema, which may be some of the dump's tables only
+    foreign_keys_kept = []
+    for statement in foreign_key_statements:
+        ref_table = _REFERENCED_TABLE.search(statement).group(1)
+        if ref_table.lower() in table_names:
+            foreign_keys_kept.append(statement)
+        else:
+            print(f"Skipping foreign key to {ref_table}, which is not in the schema: {' '.join(statement.split())}")
+    foreign_key_statements = foreign_keys_kept
+
+    # Remove PRIMARY KEY constraints from CREATE TABLE
+    cleaned_create_statements = [
+        re.sub(r',\s*PRIMARY KEY\s*\([^)]+\)', '', statement) for statement in create_statements
+    ]
 
     # Write converted schema to output file
-    with open(output_file, 'w', encoding='utf-8') as f:
+    # The manifest records each section's byte range, so step 4 can copy them as they are
+    with open(output_file, 'w', encoding='utf-8', errors='surrogateescape') as f:
+        manifest = ManifestWriter(f)
         f.write('-- Converted from MySQL to PostgreSQL schema\n\n')
-        
+
         # Write CREATE TABLE statements
         f.write('-- Table Creation\n\n')
-        for statement in create_statements:
-            # Remove PRIMARY KEY constraints from CREATE TABLE
-            cleaned = re.sub(r',\s*PRIMARY KEY\s*\([^)]+\)', '', statement)
-            f.write(cleaned + '\n\n')
-        
+        manifest.begin()
+        for statement in cleaned_create_statements:
+            f.write(statement + '\n\n')
+        manifest.end('creates')
+
         # Write PRIMARY KEY constraints first
         f.write('\n-- Primary Keys\n\n')
+        manifest.begin()
         for statement in primary_key_statements:
             f.write(statement + '\n\n')
-        
+        manifest.end('primary_keys')
+
+        # Secondary indexes, which need only their own table
+        f.write('-- Indexes\n\n')
+        manifest.begin()
+        for statement in index_statements:
+            f.write(statement + '\n\n')
+        manifest.end('indexes')
+
         # Then write FOREIGN KEY constraints
         f.write('-- Foreign Keys\n\n')
+        manifest.begin()
         for statement in foreign_key_statements:
             f.write(statement + '\n\n')
+        manifest.end('foreign_keys')
+    manifest.save(output_file)
+
+    # Save the parsed schema next to the SQL so later steps don't reparse it
+    schema = build_schema(
+        cleaned_create_statements, primary_key_statements + index_statements + foreign_key_statements
+    )
+    for table, value in auto_increment_values.items():
+        if table in schema.tables:
+            schema.tables[table].auto_increment = value
+    schema.save(sidecar_path(output_file))
 
-if __name__ == '__main__': 
-    input_file = "0_to_be_convert.sql"
+if __name__ == '__main__':
+    input_file = find_dump("0_to_be_convert.sql")
     output_file = "2_postgresql_scheme.sql"
     try:
         convert_mysql_to_postgresql(input_file, output_file)
@@ -1,149 +1,275 @@
+import numpy as np
+import openpyxl
+import os
 import pandas as pd
-import re
-from datetime import datetime
+import shutil
+import sys
+from checkpoint import Checkpoint, checkpoint_path, commit_file, input_fingerprint, partial_path
+from excel_export import ExcelExport, load_sheet_tables
+from instrumentation import Instrumentation, report_path
+from schema_model import load_schema
+from section_manifest import ByteRanges, ManifestWriter
+from sequences import SequenceValues, column_max
+from pg_writer import (COPY_NULL, FALSE_STRINGS, TRUE_STRINGS, column_kind, copy_escape, copy_header,
+                       is_boolean_type, is_zero_date)
 
 def get_column_types(sql_file):
-    column_types = {}
-    with open(sql_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-        
-    tables = re.findall(r'CREATE TABLE (\w+) \((.*?)\);', content, re.DOTALL)
-    for table, columns in tables:
-        column_types[table] = {}
-        for line in columns.split('\n'):
-            matches = re.search(r'\s*(\w+)\s+([\w\s\(\),]+?)(?:\s+(?:NOT NULL|DEFAULT|CHECK|PRIMARY KEY|REFERENCES|UNIQUE)|,|$)', line.strip())
-            if matches:
-                col_name, col_type = matches.groups()
-                column_types[table][col_name] = col_type.strip().lower()
-    return column_types
+    """Get {table: {column: type}} from the schema model of a schema file"""
+    return load_schema(sql_file).column_types()
+
+PROCESSED_EXCEL_FILE = '3_processed_insert_data.xlsx'
+
+# Every spelling of 'nan', which is written as NULL like an empty cell
+NAN_STRINGS = {'nan', 'naN', 'nAn', 'nAN', 'Nan', 'NaN', 'NAn', 'NAN'}
+
+def _float_strings(floats):
+    """str() of each float, with whole numbers written as integers"""
+    result = np.array(list(map(str, floats.tolist())), dtype=object)
+    whole = np.isfinite(floats) & (floats == np.floor(floats))
+    small = whole & (np.abs(floats) < 2 ** 63)
+    result[small] = floats[small].astype(np.int64).astype(str)
+    big = whole & ~small
+    result[big] = [str(int(value)) for value in floats[big].tolist()]
+    return result
+
+def format_column(values, column_type=None):
+    """Format a whole column as PostgreSQL literals at once.
 
-def is_boolean_type(col_type):
-    """Check if the column type should be considered boolean."""
-    if not col_type:
-        return False
-    # Matches any occurrence of bool, boolean, tinyint(1), or bit(1)
-    return bool(re.search(r'\b(bool|boolean|tinyint\(1\)|bit\(1\))\b', col_type, re.IGNORECASE))
+    Missing and blank cells, any spelling of 'nan' and zero dates in date
+    columns become NULL. In boolean columns the strings of TRUE_STRINGS
+    and FALSE_STRINGS and numbers become true or false, and anything else
+    NULL. Elsewhere booleans become true or false, whole floats are
+    written as integers and everything else is a quoted string. The column
+    type is resolved once, and each kind of value (NULL, boolean, number,
+    string) is formatted by one operation over the whole column.
+    """
+    cells = values.to_numpy(dtype=object)
+    null_mask = pd.isna(cells)
+    is_boolean_column = bool(column_type) and is_boolean_type(column_type)
 
-def format_value(value, column_type=None):
-    if pd.isna(value) or str(value).lower() == 'nan' or str(value).strip() == '':
-        return 'NULL'
+    # Typed columns from read_excel can't hold '' or 'nan' strings
+    if values.dtype.kind in 'biuf':
+        if values.dtype.kind == 'b' or is_boolean_column:
+            numbers = values.to_numpy(dtype=float, na_value=np.nan)
+            result = np.where(numbers != 0, 'true', 'false').astype(object)
+        elif values.dtype.kind == 'f':
+            result = _float_strings(values.to_numpy(dtype=float))
+        else:
+            result = np.array(list(map(str, cells.tolist())), dtype=object)
+        result[null_mask] = 'NULL'
+        return pd.Series(result)
 
-    if column_type and is_boolean_type(column_type):
+    # Object columns: find booleans and numbers once per column, not per cell
+    cell_types = pd.Series(cells).map(type).to_numpy()
+    unique_types = set(cell_types.tolist())
+    def type_mask(kinds, exclude=()):
+        matching = [t for t in unique_types if issubclass(t, kinds) and not issubclass(t, exclude)]
+        return np.isin(cell_types, matching) if matching else np.zeros(len(cells), dtype=bool)
+    bool_mask = type_mask((bool, np.bool_))
+    float_mask = type_mask((float, np.floating)) & ~null_mask
+    number_mask = type_mask((int, float, np.number), exclude=(bool, np.bool_))
+
+    # Builtin str methods mapped over the column run without per-cell Python code
+    as_str = list(map(str, cells.tolist()))
+    str_array = np.array(as_str, dtype=object)
+    null_mask |= np.fromiter(map(str.isspace, as_str), dtype=bool, count=len(as_str))
+    null_mask |= (str_array == '') | pd.Series(as_str, dtype=object).isin(NAN_STRINGS).to_numpy()
+    if column_kind(column_type) == 'date':
+        # PostgreSQL has no zero dates; MySQL's become NULL
+        null_mask |= np.fromiter(map(is_zero_date, as_str), dtype=bool, count=len(as_str))
+
+    if is_boolean_column:
         # Convert to 'true' or 'false' if recognized as boolean
-        if isinstance(value, (bool, int, float)):
-            return 'true' if bool(value) else 'false'
-        val_str = str(value).lower().strip()
-        if val_str in ('true', 't', 'yes', 'y', '1'):
-            return 'true'
-        elif val_str in ('false', 'f', 'no', 'n', '0'):
-            return 'false'
-        return 'NULL'
+        lowered = pd.Series(list(map(str.lower, map(str.strip, as_str))), dtype=object)
+        result = np.full(len(cells), 'NULL', dtype=object)
+        result[lowered.isin(TRUE_STRINGS).to_numpy()] = 'true'
+        result[lowered.isin(FALSE_STRINGS).to_numpy()] = 'false'
+        numeric_mask = (bool_mask | number_mask) & ~null_mask
+        truthy = cells[numeric_mask].astype(float) != 0
+        result[numeric_mask] = np.where(truthy, 'true', 'false')
+        result[null_mask] = 'NULL'
+        return pd.Series(result)
 
     # Handle remaining types
-    if isinstance(value, bool):
-        return str(value).lower()
-    if isinstance(value, (int, float)):
-        return str(int(value) if float(value).is_integer() else value)
-    return "'" + str(value).replace("'", "''") + "'"
+    result = np.array(["'" + value.replace("'", "''") + "'" for value in as_str], dtype=object)
+    result[bool_mask] = np.where(cells[bool_mask].astype(bool), 'true', 'false')
+    result[number_mask] = str_array[number_mask]
+    result[float_mask] = _float_strings(cells[float_mask].astype(float))
+    result[null_mask] = 'NULL'
+    return pd.Series(result)
+
+def format_copy_column(values, column_type=None):
+    """Format a whole column as fields in PostgreSQL COPY text format"""
+    return pd.Series([
+        COPY_NULL if literal == 'NULL'
+        else copy_escape(literal[1:-1].replace("''", "'")) if literal.startswith("'")
+        else literal
+        for literal in format_column(values, column_type).tolist()
+    ], dtype=object)
+
+def format_rows(df, column_types, column_formatter=format_column):
+    """Format every row of a DataFrame, one column at a time"""
+    formatted = [
+        column_formatter(df.iloc[:, i], column_types.get(col)).tolist()
+        for i, col in enumerate(df.columns)
+    ]
+    return zip(*formatted)
 
 def get_table_columns(schema_file, table_name):
     """Get column names from schema file for a specific table"""
-    with open(schema_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    table_match = re.search(f'CREATE TABLE {table_name} \((.*?)\);', content, re.DOTALL)
-    if not table_match:
-        return []
-    
-    columns = []
-    for line in table_match.group(1).split('\n'):
-        col_match = re.match(r'\s*(\w+)\s+', line.strip())
-        if col_match:
-            columns.append(col_match.group(1))
-    
-    return columns
-
-def preprocess_excel_boolean(df, table_column_types):
-    """Convert boolean values in Excel before SQL conversion"""
-    for col in df.columns:
-        col_type = table_column_types.get(str(col), '')
-        if is_boolean_type(col_type):
-            df[col] = df[col].map({
-                1: True, 
-                0: False,
-                '1': True,
-                '0': False,
-                1.0: True,
-                0.0: False,
-                'true': True,
-                'false': False,
-                'yes': True,
-                'no': False,
-                'y': True,
-                'n': False,
-                True: True,
-                False: False
-            }, na_action='ignore')
-            df[col] = df[col].map({True: "true", False: "false"}, na_action='ignore')
-            df[col] = df[col].astype(str)
-    return df
+    table = load_schema(schema_file).tables.get(table_name)
+    return table.column_names() if table else []
 
 def get_boolean_columns(schema_file):
     """Get boolean columns from PostgreSQL schema file"""
-    boolean_cols = {}
-    
-    with open(schema_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-        
-    current_table = None
-    
-    for line in content.split('\n'):
-        # Check for table definition
-        if 'CREATE TABLE' in line:
-            current_table = line.split()[2]
-            boolean_cols[current_table] = []
-            continue
-            
-        # Look for boolean columns
-        if current_table and 'boolean' in line.lower():
-            # Extract column name
-            col_match = re.match(r'\s*(\w+)\s+boolean', line.strip(), re.IGNORECASE)
-            if col_match:
-                boolean_cols[current_table].append(col_match.group(1))
-                
-    return boolean_cols
+    return {
+        table.name: [column.name for column in table.columns if column.type.startswith('boolean')]
+        for table in load_schema(schema_file).tables.values()
+    }
+
+def excel_boolean(value):
+    """'true' or 'false' for a cell of a boolean column; empty cells are false"""
+    return 'true' if str(value).lower().strip() in ('1', 'true', 'yes', 'y', 't') else 'false'
 
 def preprocess_excel_file(excel_file, schema_file):
-    """Preprocess Excel file to handle boolean values"""
-    output_excel = '3_processed_insert_data.xlsx'
+    """Preprocess Excel file to handle boolean values.
+
+    Rows are streamed from the input sheets into the processed file one
+    at a time, so memory stays flat however large the sheets are.
+    """
+    output_excel = PROCESSED_EXCEL_FILE
     boolean_cols = get_boolean_columns(schema_file)
+    sheet_tables = load_sheet_tables(excel_file)
     
-    xl = pd.ExcelFile(excel_file)
-    with pd.ExcelWriter(output_excel, engine='openpyxl') as writer:
-        for sheet in xl.sheet_names:
-            df = pd.read_excel(excel_file, sheet_name=sheet)
-            
-            # Convert boolean columns if present
-            if sheet in boolean_cols:
-                for col in boolean_cols[sheet]:
-                    if col in df.columns:
-                        print(f"Converting boolean column {col} in table {sheet}")
-                        df[col] = df[col].apply(lambda x: 
-                            'true' if str(x).lower().strip() in ('1', 'true', 'yes', 'y', 't') 
-                            else 'false'
-                        )
-            
-            df.to_excel(writer, sheet_name=sheet, index=False)
+    workbook = openpyxl.load_workbook(excel_file, read_only=True)
+    try:
+        with ExcelExport(output_excel) as export:
+            for sheet in workbook.sheetnames:
+                table_name = sheet_tables.get(sheet, sheet)
+                rows = workbook[sheet].iter_rows(values_only=True)
+                header = next(rows, ())
+                columns = ['' if col is None else str(col) for col in header]
+                
+                # Convert boolean columns if present
+                boolean_indexes = []
+                for col in boolean_cols.get(table_name, []):
+                    if col in columns:
+                        print(f"Converting boolean column {col} in table {table_name}")
+                        boolean_indexes.append(columns.index(col))
+                if boolean_indexes:
+                    rows = (
+                        [excel_boolean(value) if i in boolean_indexes else value for i, value in enumerate(row)]
+                        for row in rows
+                    )
+                
+                export.add_table(table_name, columns, rows)
+    finally:
+        workbook.close()
     
     return output_excel
 
-def generate_insert_statements(excel_file, output_file, schema_file):
+def sequence_values(df, serial_columns):
+    """{column: highest value} of a sheet's serial columns, None for those it leaves out"""
+    values = {}
+    if df.empty:
+        return values
+    for column in serial_columns:
+        if column not in df.columns:
+            values[column] = None
+            continue
+        largest = column_max(df[column].tolist())
+        if largest is not None:
+            values[column] = largest
+    return values
+
+def write_sheet(f, xl, sheet_name, table_name, schema_file, boolean_columns, column_types, output_format, stats,
+                serial_columns=()):
+    """Write the rows of one sheet of table_name as an INSERT statement or a COPY block.
+
+    xl is the open pd.ExcelFile, so the workbook is read once for all
+    its sheets rather than once per sheet. Returns the highest value of
+    each of serial_columns in the sheet.
+    """
+    # Force boolean columns to be read as strings
+    converters = {col: str for col in boolean_columns.get(table_name, [])}
+    with stats.timer('read', table_name):
+        df = xl.parse(sheet_name, converters=converters)
+    
+    table_column_types = column_types.get(table_name, {})
+    
+    schema_columns = get_table_columns(schema_file, table_name)
+    if schema_columns and len(schema_columns) == len(df.columns):
+        df.columns = schema_columns
+    else:
+        df.columns = [str(col) for col in df.columns]
+    
+    print("Column names:", df.columns.tolist())
+    columns = df.columns.tolist()
+    
+    if output_format == 'copy':
+        # One COPY ... FROM stdin block per table
+        with stats.timer('format', table_name):
+            data = ''.join(
+                '\t'.join(values) + '\n'
+                for values in format_rows(df, table_column_types, format_copy_column)
+            )
+        with stats.timer('write', table_name):
+            f.write(copy_header(table_name, columns))
+            f.write(data)
+            f.write('\\.\n\n')
+    else:
+        # Format column by column, then join rows in bulk
+        with stats.timer('format', table_name):
+            rows = [f"({', '.join(values)})" for values in format_rows(df, table_column_types)]
+            data = ',\n'.join(rows)
+        
+        if rows:
+            with stats.timer('write', table_name):
+                f.write(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES\n")
+                f.write(data + ';\n\n')
+    stats.count('rows', len(df), table_name)
+    stats.count('bytes', len(data), table_name)
+    return sequence_values(df, serial_columns)
+
+def write_sheet_part(f, xl, sheet_name, table_name, schema_file, boolean_columns, column_types, output_format,
+                     stats, checkpoint, parts_dir, serial_columns=()):
+    """Write one sheet through its own part file, reusing it if an earlier run finished it"""
+    part_file = os.path.join(parts_dir, f"{sheet_name}.sql")
+    if checkpoint.is_done('insert', sheet_name) and os.path.exists(part_file):
+        print(f"Skipping sheet {sheet_name}, converted in an earlier run")
+        values = checkpoint.latest('insert', sheet_name).get('sequence_values', {})
+    else:
+        with open(partial_path(part_file), 'w', encoding='utf-8', errors='surrogateescape') as part:
+            values = write_sheet(part, xl, sheet_name, table_name, schema_file, boolean_columns, column_types,
+                                 output_format, stats, serial_columns)
+        commit_file(partial_path(part_file), part_file)
+        checkpoint.record('insert', sheet_name, done=True, sequence_values=values)
+    ByteRanges(part_file, [(0, os.path.getsize(part_file))]).copy_to(f)
+    return values
+
+def generate_insert_statements(excel_file, output_file, schema_file, output_format='insert', checkpoint=None,
+                               stats=None):
+    """Write the INSERT statements or COPY blocks of every sheet to output_file.
+
+    With a checkpoint, each sheet is first committed to its own part file
+    and journaled, so a rerun after a failure skips the sheets that were
+    already done. Time spent reading, formatting and writing each sheet
+    is added to stats if given.
+    """
+    stats = stats or Instrumentation()
     try:
+        parts_dir = os.path.splitext(output_file)[0] + '_parts'
+        if checkpoint:
+            os.makedirs(parts_dir, exist_ok=True)
         boolean_columns = get_boolean_columns(schema_file)
         column_types = get_column_types(schema_file)
         xl = pd.ExcelFile(excel_file)
+        sheet_tables = load_sheet_tables(excel_file)
+        sequences = SequenceValues(load_schema(schema_file))
         
-        with open(output_file, 'w', encoding='utf-8') as f:
+        with open(output_file, 'w', encoding='utf-8', errors='surrogateescape') as f:
+            # Byte range of each table's data, for step 4
+            manifest = ManifestWriter(f)
             f.write('-- Generated PostgreSQL INSERT statements\n\n')
             
             # Write transaction begin and disable FK constraints
@@ -154,39 +280,22 @@ def generate_insert_statements(excel_file, output_file, schema_file):
             
             # Original insert statements generation
             for sheet_name in xl.sheet_names:
-                print(f"\nProcessing table: {sheet_name}")
+                # Long tables continue on more sheets, and long table names are cut
+                table_name = sheet_tables.get(sheet_name, sheet_name)
+                print(f"\nProcessing table: {table_name}" +
+                      (f" (sheet {sheet_name})" if sheet_name != table_name else ''))
                 try:
-                    # Force boolean columns to be read as strings
-                    converters = {col: str for col in boolean_columns.get(sheet_name, [])}
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name, converters=converters)
-                    
-                    table_column_types = column_types.get(sheet_name, {})
-                    
-                    schema_columns = get_table_columns(schema_file, sheet_name)
-                    if schema_columns and len(schema_columns) == len(df.columns):
-                        df.columns = schema_columns
+                    manifest.begin()
+                    serial_columns = sequences.columns.get(table_name, ())
+                    if checkpoint:
+                        values = write_sheet_part(f, xl, sheet_name, table_name, schema_file, boolean_columns,
+                                                  column_types, output_format, stats, checkpoint, parts_dir,
+                                                  serial_columns)
                     else:
-                        df.columns = [str(col) for col in df.columns]
-                    
-                    print("Column names:", df.columns.tolist())
-                    columns = df.columns.tolist()
-                    
-                    f.write(f"INSERT INTO {sheet_name} ({', '.join(columns)}) VALUES\n")
-                    
-                    rows = []
-                    for idx, row in df.iterrows():
-                        row_dict = row.to_dict()
-                        formatted_values = []
-                        for col in columns:
-                            val = row_dict[col]
-                            col_type = table_column_types.get(col)
-                            formatted_val = format_value(val, col_type)
-                            formatted_values.append(formatted_val)
-                        row_str = f"({', '.join(formatted_values)})"
-                        rows.append(row_str)
-                    
-                    if rows:
-                        f.write(',\n'.join(rows) + ';\n\n')
+                        values = write_sheet(f, xl, sheet_name, table_name, schema_file, boolean_columns,
+                                             column_types, output_format, stats, serial_columns)
+                    sequences.update(table_name, values)
+                    manifest.end('data', table_name)
                 
                 except Exception as e:
                     print(f"Error processing sheet {sheet_name}: {str(e)}")
@@ -198,56 +307,16 @@ def generate_insert_statements(excel_file, output_file, schema_file):
             f.write('-- Commit the transaction\n')
             f.write('COMMIT;\n\n')
             
-            # Add sequence reset code
-            f.write('-- This script generates commands to reset all sequences in the database\n')
-            f.write('-- It will reset sequences based on the maximum value in each table\'s corresponding column\n\n')
-            f.write('''DO $$
-DECLARE
-    -- Variables for storing sequence information
-    sequence_record RECORD;
-    max_value bigint;
-    sequence_name text;
-    table_name text;
-    column_name text;
-    set_value_query text;
-BEGIN
-    -- Loop through all sequences in the current schema
-    FOR sequence_record IN 
-        SELECT
-            n.nspname as schema_name,
-            t.relname as table_name,
-            a.attname as column_name,
-            s.relname as sequence_name
-        FROM pg_class s
-        JOIN pg_depend d ON d.objid = s.oid
-        JOIN pg_class t ON d.refobjid = t.oid
-        JOIN pg_attribute a ON (d.refobjid, d.refobjsubid) = (a.attrelid, a.attnum)
-        JOIN pg_namespace n ON n.oid = s.relnamespace
-        WHERE s.relkind = 'S'
-        AND n.nspname = 'public'  -- Change this if you want to target a different schema
-    LOOP
-        -- Get the maximum value from the corresponding table column
-        EXECUTE format('SELECT COALESCE(MAX(%I), 0) + 1 FROM %I.%I', 
-            sequence_record.column_name,
-            sequence_record.schema_name,
-            sequence_record.table_name
-        ) INTO max_value;
-
-        -- Set the sequence value
-        EXECUTE format(
-            'ALTER SEQUENCE %I.%I RESTART WITH %s',
-            sequence_record.schema_name,
-            sequence_record.sequence_name,
-            max_value
-        );
-
-        RAISE NOTICE 'Reset sequence %.% for column % to %',
-            sequence_record.schema_name,
-            sequence_record.sequence_name,
-            sequence_record.column_name,
-            max_value;
-    END LOOP;
-END $$;''')
+            # Set each sequence to continue after the rows written above
+            f.write('-- Sequences\n\n')
+            manifest.begin()
+            for statement in sequences.statements():
+                f.write(statement + '\n\n')
+            manifest.end('sequences')
+        manifest.save(output_file)
+        if checkpoint:
+            checkpoint.remove()
+            shutil.rmtree(parts_dir, ignore_errors=True)
                 
     except Exception as e:
         print(f"Critical error: {str(e)}")
@@ -259,13 +328,31 @@ def main():
     excel_file = "1_insert_data.xlsx"
     output_file = "3_postgresql_inserts.sql"
     schema_file = "2_postgresql_scheme.sql"
+    # Pass --copy to write COPY FROM stdin blocks instead of INSERT statements
+    output_format = 'copy' if '--copy' in sys.argv[1:] else 'insert'
     
     try:
-        processed_excel = preprocess_excel_file(excel_file, schema_file)
-        print(f"Created processed Excel file: {processed_excel}")
+        # Pick up after the last finished sheet if an earlier run was interrupted
+        checkpoint = Checkpoint(
+            checkpoint_path(output_file),
+            input_fingerprint([excel_file, schema_file], output_format=output_format)
+        )
+        stats = Instrumentation()
+        if checkpoint.is_done('preprocess') and os.path.exists(PROCESSED_EXCEL_FILE):
+            processed_excel = PROCESSED_EXCEL_FILE
+            print(f"Reusing processed Excel file: {processed_excel}")
+        else:
+            with stats.stage('preprocess'):
+                processed_excel = preprocess_excel_file(excel_file, schema_file)
+            checkpoint.record('preprocess', done=True)
+            print(f"Created processed Excel file: {processed_excel}")
         
-        generate_insert_statements(processed_excel, output_file, schema_file)
-        print(f"Successfully generated INSERT statements in {output_file}")
+        with stats.stage('generate'):
+            generate_insert_statements(processed_excel, output_file, schema_file, output_format, checkpoint, stats)
+        print(f"Successfully generated {output_format.upper()} statements in {output_file}")
+        stats.report()
+        stats.save_report(report_path(output_file), input_file=excel_file, output_file=output_file,
+                          output_format=output_format)
     except Exception as e:
         print(f"Error occurred: {str(e)}")
 
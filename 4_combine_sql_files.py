@@ -1,132 +1,15 @@
+import mmap
+import os
 import re
+from compressed_io import open_output
+from section_manifest import ByteRanges, load_manifest
 
-def extract_sections(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    def split_sql(sql):
-        statements = []
-        current = []
-        in_string = False
-        in_comment = False
-        quote_char = None
-        
-        i = 0
-        while i < len(sql):
-            char = sql[i]
-            
-            # Handle comments
-            if sql[i:i+2] == '--' and not in_string:
-                in_comment = True
-                i += 2
-                continue
-            elif char == '\n' and in_comment:
-                in_comment = False
-                i += 1
-                continue
-            elif in_comment:
-                i += 1
-                continue
-                
-            # Handle strings
-            if char in ["'", '"'] and not in_string:
-                in_string = True
-                quote_char = char
-                current.append(char)
-            elif char == quote_char and in_string:
-                if sql[max(0, i-1)] != '\\': # Check it's not escaped
-                    in_string = False
-                    quote_char = None
-                current.append(char)
-            # Handle statement endings    
-            elif char == ';' and not in_string:
-                current.append(char)
-                stmt = ''.join(current).strip()
-                if stmt:
-                    statements.append(stmt)
-                current = []
-            else:
-                current.append(char)
-            i += 1
-            
-        # Add any remaining statement
-        stmt = ''.join(current).strip()
-        if stmt:
-            statements.append(stmt)
-            
-        return [s for s in statements if s.strip()]
-
-    statements = split_sql(content)
-    
-    # Improved pattern matching for CREATE TABLE statements
-    creates = []
-    primary_keys = []
-    foreign_keys = []
-    inserts = []
-    
-    for stmt in statements:
-        # Handle CREATE TABLE with better pattern matching
-        if re.search(r'CREATE\s+TABLE\s+[\w"`]+\s*\(', stmt, re.IGNORECASE):
-            creates.append(stmt)
-        elif 'ADD PRIMARY KEY' in stmt.upper():
-            primary_keys.append(stmt) 
-        elif 'ADD FOREIGN KEY' in stmt.upper():
-            foreign_keys.append(stmt)
-        elif stmt.upper().startswith('INSERT INTO'):
-            inserts.append(stmt)
-    
-    return creates, primary_keys, foreign_keys, inserts
+# A COPY ... FROM stdin statement is followed by inline data up to a \. line
+COPY_FROM_STDIN = re.compile(r'COPY\s.*\bFROM\s+stdin\s*;$', re.IGNORECASE | re.DOTALL)
 
-def combine_sql_files(schema_file, insert_file, output_file):
-    # Extract sections from schema file
-    creates, pks, fks, schema_inserts = extract_sections(schema_file)
-    
-    # Extract sections from insert file 
-    _, _, _, inserts = extract_sections(insert_file)
-    
-    # Combine all inserts
-    all_inserts = schema_inserts + inserts
-    
-    # Write combined file in desired order
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('-- Combined PostgreSQL Schema and Data\n\n')
-        
-        # 1. CREATE TABLE statements
-        f.write('-- Table Creation\n\n')
-        for stmt in creates:
-            f.write(stmt + '\n\n')
-        
-        # 2. Transaction start and disable FK constraints
-        f.write('-- Begin transaction\n')
-        f.write('BEGIN;\n\n')
-        f.write('-- Disable foreign key constraints for all tables\n')
-        f.write('SET session_replication_role = \'replica\';\n\n')
-        
-        # 3. All INSERT statements
-        f.write('-- Data Insertion\n\n')
-        for stmt in all_inserts:
-            f.write(stmt + '\n\n')
-        
-        # 4. Re-enable FK constraints and commit
-        f.write('-- Re-enable foreign key constraints\n')
-        f.write('SET session_replication_role = \'origin\';\n\n')
-        f.write('-- Commit the transaction\n')
-        f.write('COMMIT;\n\n')
-            
-        # 5. Primary Key constraints
-        f.write('-- Primary Keys\n\n')
-        for stmt in pks:
-            if 'ADD PRIMARY KEY' in stmt:
-                f.write(stmt + '\n\n')
-        
-        # 6. Foreign Key constraints  
-        f.write('-- Foreign Keys\n\n')
-        for stmt in fks:
-            if 'ADD FOREIGN KEY' in stmt:
-                f.write(stmt + '\n\n')
-                
-        # 7. Add sequence reset code at the very end
-        f.write('''-- This script generates commands to reset all sequences in the database
+# For data whose serial columns weren't tracked while converting, e.g. an insert
+# file without a manifest; scans every table with a sequence
+SEQUENCE_RESET_SQL = '''-- This script generates commands to reset all sequences in the database
 -- It will reset sequences based on the maximum value in each table's corresponding column
 
 DO $$
@@ -175,7 +58,216 @@ BEGIN
             sequence_record.column_name,
             max_value;
     END LOOP;
-END $$;''')
+END $$;'''
+
+# Bytes that can change how the text after them is read
+SIGNIFICANT = re.compile(rb"[;'\"]|--|/\*|\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+# Whitespace and comments in front of a statement
+LEADING = re.compile(rb'(?:\s+|--[^\n]*|/\*.*?\*/)*', re.DOTALL)
+# E'...' strings are the only ones where a backslash escapes the quote
+ESCAPE_STRING_END = re.compile(rb"(?:[^'\\]|\\.|'')*'", re.DOTALL)
+COPY_DATA_END = re.compile(rb'^\\\.$', re.MULTILINE)
+
+def _skip_quoted(data, pos, quote):
+    """Return the position after a quoted string whose opening quote ends at pos"""
+    if quote == b"'" and pos >= 2 and data[pos - 2:pos - 1] in (b'E', b'e'):
+        match = ESCAPE_STRING_END.match(data, pos)
+        return match.end() if match else len(data)
+    while True:
+        end = data.find(quote, pos)
+        if end == -1:
+            return len(data)
+        # A doubled quote stands for itself and doesn't close the string
+        if data[end + 1:end + 2] != quote:
+            return end + 1
+        pos = end + 2
+
+def iter_statement_spans(data):
+    """Yield (start, end) byte ranges of the SQL statements in data.
+
+    data is bytes or a memory-mapped file. The scan jumps straight from one
+    significant character (quote, ';', comment start, dollar quote) to the
+    next, so it runs in linear time. Leading comments are not part of a
+    statement. COPY ... FROM stdin statements include their inline data up
+    to the closing \\. line.
+    """
+    size = len(data)
+    pos = LEADING.match(data, 0).end()
+    start = pos
+    while pos < size:
+        match = SIGNIFICANT.search(data, pos)
+        if not match:
+            break
+        token = match.group()
+        pos = match.end()
+        if token == b';':
+            end = pos
+            if data[start:start + 5].upper() == b'COPY ' and COPY_FROM_STDIN.match(
+                data[start:end].decode('utf-8', errors='replace')
+            ):
+                # Keep the inline data with its COPY statement, unparsed
+                data_end = COPY_DATA_END.search(data, end)
+                end = data_end.end() if data_end else size
+            yield start, end
+            pos = LEADING.match(data, end).end()
+            start = pos
+        elif token in (b"'", b'"'):
+            pos = _skip_quoted(data, pos, token)
+        elif token == b'--':
+            newline = data.find(b'\n', pos)
+            pos = size if newline == -1 else newline + 1
+        elif token == b'/*':
+            comment_end = data.find(b'*/', pos)
+            pos = size if comment_end == -1 else comment_end + 2
+        else:
+            # Dollar-quoted body, closed by the same tag
+            body_end = data.find(token, pos)
+            pos = size if body_end == -1 else body_end + len(token)
+
+    # A last statement without a terminating ';'
+    end = size
+    while end > start and data[end - 1:end].isspace():
+        end -= 1
+    if end > start:
+        yield start, end
+
+def iter_statements(file_path):
+    """Yield the statements of a SQL file, scanning it memory-mapped"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in iter_statement_spans(data):
+                yield data[start:end].decode('utf-8', errors='surrogateescape')
+
+def extract_sections(file_path):
+    statements = iter_statements(file_path)
+    
+    # Improved pattern matching for CREATE TABLE statements
+    creates = []
+    primary_keys = []
+    indexes = []
+    foreign_keys = []
+    inserts = []
+    
+    for stmt in statements:
+        # Data statements can be huge, so they are recognized by their head alone
+        if stmt[:12].upper().startswith(('INSERT INTO', 'COPY ')):
+            inserts.append(stmt)
+        # Handle CREATE TABLE with better pattern matching
+        elif re.search(r'CREATE\s+TABLE\s+[\w"`]+\s*\(', stmt, re.IGNORECASE):
+            creates.append(stmt)
+        elif 'ADD PRIMARY KEY' in stmt.upper():
+            primary_keys.append(stmt) 
+        elif re.match(r'CREATE\s+(?:UNIQUE\s+)?INDEX\b', stmt, re.IGNORECASE):
+            indexes.append(stmt)
+        elif 'ADD FOREIGN KEY' in stmt.upper():
+            foreign_keys.append(stmt)
+    
+    return creates, primary_keys, indexes, foreign_keys, inserts
+
+def write_statements(f, statements):
+    """Write statements, each followed by a blank line.
+
+    statements is a list of SQL strings, or ByteRanges of an earlier step's
+    output, which are copied over byte for byte.
+    """
+    if isinstance(statements, ByteRanges):
+        statements.copy_to(f)
+        return
+    for stmt in statements:
+        f.write(stmt + '\n\n')
+
+def write_preamble(f, creates):
+    """Write the header, CREATE TABLE statements and start of the data section"""
+    f.write('-- Combined PostgreSQL Schema and Data\n\n')
+    
+    # 1. CREATE TABLE statements
+    f.write('-- Table Creation\n\n')
+    write_statements(f, creates)
+    
+    # 2. Transaction start and disable FK constraints
+    f.write('-- Begin transaction\n')
+    f.write('BEGIN;\n\n')
+    f.write('-- Disable foreign key constraints for all tables\n')
+    f.write('SET session_replication_role = \'replica\';\n\n')
+    
+    # 3. Data section header, followed by the data itself
+    f.write('-- Data Insertion\n\n')
+
+def write_postamble(f, pks, fks, indexes=(), sequences=None):
+    """Write everything that follows the data section.
+
+    sequences are the setval() statements of the converted data, or None
+    to reset every sequence from its table's data with SEQUENCE_RESET_SQL.
+    """
+    # 4. Re-enable FK constraints and commit
+    f.write('-- Re-enable foreign key constraints\n')
+    f.write('SET session_replication_role = \'origin\';\n\n')
+    f.write('-- Commit the transaction\n')
+    f.write('COMMIT;\n\n')
+        
+    # 5. Primary Key constraints
+    f.write('-- Primary Keys\n\n')
+    write_statements(f, pks)
+
+    # 6. Secondary indexes
+    f.write('-- Indexes\n\n')
+    write_statements(f, indexes)
+    
+    # 7. Foreign Key constraints  
+    f.write('-- Foreign Keys\n\n')
+    write_statements(f, fks)
+            
+    # 8. Set sequences to continue after the loaded rows, at the very end
+    if sequences is None:
+        f.write(SEQUENCE_RESET_SQL)
+    else:
+        f.write('-- Sequences\n\n')
+        write_statements(f, sequences)
+
+def manifest_sections(schema_file, insert_file):
+    """Return the sections of both files as ByteRanges, read from their manifests.
+
+    Returns (creates, pks, indexes, fks, inserts, sequences), or None if
+    either file has no manifest or was changed after it was written.
+    sequences is None if the insert file has no setval() statements.
+    """
+    schema_manifest = load_manifest(schema_file)
+    insert_manifest = load_manifest(insert_file)
+    if not (schema_manifest and insert_manifest):
+        return None
+    schema_sections = schema_manifest['sections']
+    return (
+        *[ByteRanges(schema_file, [schema_sections[name]] if name in schema_sections else [])
+          for name in ('creates', 'primary_keys', 'indexes', 'foreign_keys')],
+        ByteRanges(insert_file, insert_manifest['sections'].get('data', [])),
+        ByteRanges(insert_file, [insert_manifest['sections']['sequences']])
+        if 'sequences' in insert_manifest['sections'] else None,
+    )
+
+def combine_sql_files(schema_file, insert_file, output_file):
+    # Steps 2 and 3 record where their sections are, so nothing needs parsing
+    sections = manifest_sections(schema_file, insert_file)
+    sequences = None
+    if sections:
+        creates, pks, indexes, fks, all_inserts, sequences = sections
+    else:
+        # Extract sections from schema file
+        creates, pks, indexes, fks, schema_inserts = extract_sections(schema_file)
+        
+        # Extract sections from insert file 
+        _, _, _, _, inserts = extract_sections(insert_file)
+        
+        # Combine all inserts
+        all_inserts = schema_inserts + inserts
+    
+    # Write combined file in desired order
+    # The final file is compressed on the fly if its name ends in .gz or .zst
+    with open_output(output_file) as f:
+        write_preamble(f, creates)
+        write_statements(f, all_inserts)
+        write_postamble(f, pks, fks, indexes, sequences)
 
 if __name__ == '__main__':
     schema_file = "2_postgresql_scheme.sql"
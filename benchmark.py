@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from synthetic_dump import SHAPES, generate_dump
+
+# Stages in the order they run; later stages read the files of earlier ones
+STAGES = ['extract', 'excel', 'schema', 'inserts', 'combine', 'pipeline']
+REQUIRES = {
+    'inserts': ['excel', 'schema'],
+    'combine': ['schema', 'inserts'],
+}
+# Stages that only read the schema, for which rows/s means nothing
+SCHEMA_ONLY_STAGES = {'schema'}
+
+
+def stage_files(work_dir, shape_name):
+    """Paths of the files the stages of one shape read and write"""
+    base = os.path.join(work_dir, shape_name)
+    return {
+        'dump': base + '.sql',
+        'excel': base + '_1_insert_data.xlsx',
+        'schema': base + '_2_postgresql_scheme.sql',
+        'inserts': base + '_3_postgresql_inserts.sql',
+        'combined': base + '_4_final_postgresql.sql',
+        'pipeline': base + '_pipeline.sql',
+        'pipeline_schema': base + '_pipeline_scheme.sql',
+    }
+
+
+def run_extract(files, jobs):
+    """Step 1's parsing alone: extract_insert_data() on every INSERT"""
+    excel_step = importlib.import_module('1_convert_to_xlsx')
+    from dump_reader import iter_statements
+    for statement in iter_statements(files['dump']):
+        if 'INSERT INTO' in statement.upper():
+            excel_step.extract_insert_data(statement)
+    return files['dump']
+
+
+def run_excel(files, jobs):
+    importlib.import_module('1_convert_to_xlsx').main(files['dump'], files['excel'])
+    return files['dump']
+
+
+def run_schema(files, jobs):
+    importlib.import_module('2_convert_to_pgsql_scheme').convert_mysql_to_postgresql(files['dump'], files['schema'])
+    return files['dump']
+
+
+def run_inserts(files, jobs):
+    importlib.import_module('3_convert_to_pgsql_insert').generate_insert_statements(
+        files['excel'], files['inserts'], files['schema']
+    )
+    return files['excel']
+
+
+def run_combine(files, jobs):
+    importlib.import_module('4_combine_sql_files').combine_sql_files(
+        files['schema'], files['inserts'], files['combined']
+    )
+    return files['schema'], files['inserts']
+
+
+def run_pipeline(files, jobs):
+    importlib.import_module('mysql2pgsql').convert_dump(
+        files['dump'], files['pipeline'], files['pipeline_schema'], jobs=jobs, resume=False
+    )
+    return files['dump']
+
+
+STAGE_FUNCTIONS = {
+    'extract': run_extract,
+    'excel': run_excel,
+    'schema': run_schema,
+    'inserts': run_inserts,
+    'combine': run_combine,
+    'pipeline': run_pipeline,
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process or any of its children, in MB"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def stage_worker(stage, files, jobs, results):
+    """Run one stage in a fresh process, so its peak RSS is its own"""
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            inputs = STAGE_FUNCTIONS[stage](files, jobs)
+            seconds = time.perf_counter() - started
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        results.put({
+            'seconds': seconds,
+            'input_bytes': sum(os.path.getsize(path) for path in inputs),
+            'peak_rss_mb': peak_rss_mb(),
+        })
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_stage(stage, files, jobs):
+    # spawn, not fork, so nothing the harness imported counts toward the stage
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=stage_worker, args=(stage, files, jobs, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def stages_to_run(selected):
+    """Return [(stage, timed)] for the selected stages and the stages they need"""
+    needed = set(selected)
+    for stage in reversed(STAGES):
+        if stage in needed:
+            needed.update(REQUIRES.get(stage, []))
+    return [(stage, stage in selected) for stage in STAGES if stage in needed]
+
+
+def benchmark_shape(shape_name, size_mb, seed, work_dir, selected, jobs):
+    """Generate a dump of one shape and time each selected stage on it"""
+    files = stage_files(work_dir, shape_name)
+    print(f"\nGenerating {shape_name} dump of {size_mb} MB")
+    dump = generate_dump(files['dump'], SHAPES[shape_name], int(size_mb * 2**20), seed)
+
+    results = []
+    for stage, timed in stages_to_run(selected):
+        result = run_stage(stage, files, jobs)
+        if not timed:
+            continue
+        result.update({'shape': shape_name, 'stage': stage, 'rows': dump['rows']})
+        if 'error' in result:
+            print(f"{shape_name:18} {stage:9} failed: {result['error']}")
+        else:
+            seconds = result['seconds']
+            rows_per_second = None if stage in SCHEMA_ONLY_STAGES else dump['rows'] / seconds
+            result['rows_per_second'] = rows_per_second
+            result['mb_per_second'] = result['input_bytes'] / 2**20 / seconds
+            rate = f"{rows_per_second:12,.0f}" if rows_per_second is not None else f"{'-':>12}"
+            rss = f"{result['peak_rss_mb']:8.1f}" if result['peak_rss_mb'] is not None else f"{'-':>8}"
+            print(f"{shape_name:18} {stage:9} {seconds:8.2f}s {rate} rows/s "
+                  f"{result['mb_per_second']:8.2f} MB/s {rss} MB peak")
+        results.append(result)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_results(baseline_file, results):
+    """Print how each stage's time changed against an earlier results file"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    before = {(r['shape'], r['stage']): r for r in baseline['results'] if 'seconds' in r}
+    print(f"\nCompared with {baseline_file} (commit {baseline.get('commit')})")
+    for result in results:
+        old = before.get((result['shape'], result['stage']))
+        if old and 'seconds' in result:
+            speedup = old['seconds'] / result['seconds']
+            print(f"{result['shape']:18} {result['stage']:9} {old['seconds']:8.2f}s -> "
+                  f"{result['seconds']:8.2f}s ({speedup:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each conversion stage on synthetic dumps")
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=sorted(SHAPES))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--size-mb', type=float, default=20, help="approximate size of each dump")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=1, help="worker processes for the pipeline stage")
+    parser.add_argument('--work-dir', default='benchmark_work', help="directory for the dumps and stage outputs")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file to write results to")
+    parser.add_argument('--compare', metavar='FILE', help="results file of an earlier run to compare with")
+    args = parser.parse_args()
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    results = []
+    for shape_name in args.shapes:
+        results += benchmark_shape(shape_name, args.size_mb, args.seed, args.work_dir, args.stages, args.jobs)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': git_commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'size_mb': args.size_mb,
+            'seed': args.seed,
+            'jobs': args.jobs,
+            'results': results,
+        }, f, indent=1)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
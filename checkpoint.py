@@ -0,0 +1,100 @@
+import json
+import os
+
+# Bytes of input converted between two progress records of a table
+CHECKPOINT_INTERVAL = 64 * 1024 * 1024
+
+
+def checkpoint_path(output_file):
+    """Path of the checkpoint journal kept next to an output file"""
+    return os.path.splitext(output_file)[0] + '.checkpoint.jsonl'
+
+
+def partial_path(path):
+    """Path a file is written to until it is complete"""
+    return path + '.partial'
+
+
+def input_fingerprint(files, **options):
+    """Identify a run by the size and mtime of its input files and its options"""
+    fingerprint = {'files': [], 'options': options}
+    for path in files:
+        stat = os.stat(path)
+        fingerprint['files'].append([path, stat.st_size, stat.st_mtime_ns])
+    # Round-trip through JSON so it compares equal to what is read back
+    return json.loads(json.dumps(fingerprint))
+
+
+def commit_file(temp_path, path):
+    """Move a finished file into place, so path is always either complete or absent"""
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class Checkpoint:
+    """Append-only journal of the work a run has finished.
+
+    Each line is a JSON record of a stage, an optional table and the state
+    reached, e.g. the input offset and output size. The first line holds
+    the fingerprint of the run's inputs and options; a journal written for
+    other inputs is started over. Records are fsynced as they are written,
+    so a crash loses at most the work since the last one, and worker
+    processes can append to the same journal.
+    """
+
+    def __init__(self, path, fingerprint, resume=True):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.records = self._read() if resume else None
+        self.resumed = bool(self.records)
+        if self.records is None:
+            self.records = []
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'fingerprint': fingerprint}) + '\n')
+
+    def _read(self):
+        """Records of the journal, or None if it is missing or for another run"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The last line may have been cut short by a crash
+                continue
+        if not records or records[0].get('fingerprint') != self.fingerprint:
+            return None
+        return records[1:]
+
+    def latest(self, stage, table=None):
+        """The last record of a stage and table, or None"""
+        for record in reversed(self.records):
+            if record['stage'] == stage and record['table'] == table:
+                return record
+        return None
+
+    def is_done(self, stage, table=None):
+        record = self.latest(stage, table)
+        return bool(record and record['done'])
+
+    def record(self, stage, table=None, done=False, **state):
+        """Append a record and make sure it is on disk before returning"""
+        line = json.dumps({'stage': stage, 'table': table, 'done': done, **state})
+        # Keep what was written, not the caller's objects, which may still change
+        self.records.append(json.loads(line))
+        # A single O_APPEND write keeps lines from concurrent workers whole
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, (line + '\n').encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def remove(self):
+        """Delete the journal once the run has completed"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
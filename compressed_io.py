@@ -0,0 +1,224 @@
+import gzip
+import io
+import os
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression of a file, by the extension of its name
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+# Bytes decompressed or compressed at a time by the background thread
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+# Chunks the background thread may run ahead of the reader or behind the writer
+QUEUE_DEPTH = 4
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def compression_of(path):
+    """'gzip', 'zstd' or None, from the extension of path"""
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("Reading or writing .zst files needs zstandard: pip install zstandard")
+
+
+class ThreadedReader(io.RawIOBase):
+    """Decompress a file in a background thread, ahead of whoever reads it.
+
+    zlib and zstandard release the GIL while they work, so decompression
+    overlaps with parsing in the main thread. At most QUEUE_DEPTH chunks
+    are held in memory. Seeking only goes forward, by reading and dropping
+    the data in between.
+    """
+
+    def __init__(self, path, compression, chunk_size=STREAM_CHUNK_SIZE):
+        self.path = path
+        self._raw = open(path, 'rb')
+        if compression == 'zstd':
+            _require_zstandard()
+            self._source = zstandard.ZstdDecompressor().stream_reader(self._raw, read_across_frames=True)
+        else:
+            self._source = gzip.GzipFile(fileobj=self._raw, mode='rb')
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self._stop = threading.Event()
+        self._buffer = b''
+        self._position = 0
+        self._eof = False
+        # Bytes of the compressed file consumed for the data handed out so far
+        self.compressed_position = 0
+        self._thread = threading.Thread(target=self._decompress, name=f"decompress {path}", daemon=True)
+        self._thread.start()
+
+    def _decompress(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._source.read(self._chunk_size)
+                self._put((chunk, self._raw.tell()))
+                if not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        # Give up once the reader is closed, instead of blocking on a full queue forever
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _fill(self):
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            raise item
+        chunk, self.compressed_position = item
+        if not chunk:
+            self._eof = True
+        self._buffer += chunk
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size < 0 or size >= len(self._buffer):
+            # Hand over the whole buffer, usually one chunk, without copying it
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._position += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return False
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence != io.SEEK_SET or offset < self._position:
+            raise io.UnsupportedOperation("A compressed dump can only be read forward")
+        while self._position < offset:
+            if not self.read(min(offset - self._position, self._chunk_size)):
+                break
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+            self._raw.close()
+        super().close()
+
+
+class ThreadedWriter(io.RawIOBase):
+    """Compress what is written to it in a background thread"""
+
+    def __init__(self, path, compression):
+        self.path = path
+        self._raw = open(path, 'wb')
+        if compression == 'zstd':
+            _require_zstandard()
+            self._sink = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self._raw, closefd=False)
+        else:
+            self._sink = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=GZIP_LEVEL)
+        self._queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self._error = None
+        self._position = 0
+        self._thread = threading.Thread(target=self._compress, name=f"compress {path}", daemon=True)
+        self._thread.start()
+
+    def _compress(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._sink.write(chunk)
+                except Exception as e:
+                    # Keep draining the queue, so the writer never blocks on it
+                    self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._check()
+        data = bytes(b)
+        self._queue.put(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if self.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._sink.close()
+        finally:
+            self._raw.close()
+            super().close()
+        self._check()
+
+
+def find_dump(path):
+    """path if it exists, else a compressed copy of it next to it, such as path.gz"""
+    if os.path.exists(path):
+        return path
+    for extension in COMPRESSIONS:
+        if os.path.exists(path + extension):
+            return path + extension
+    return path
+
+
+def open_dump(path):
+    """Open a dump for reading as a binary stream, decompressing it if needed"""
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, 'rb')
+    return ThreadedReader(path, compression)
+
+
+def open_output(path, encoding='utf-8'):
+    """Open a text file for writing, compressed if its name ends in .gz or .zst.
+
+    Bytes of the dump that aren't valid UTF-8, which the dump reader
+    decodes to surrogates, are written back unchanged.
+    """
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, 'w', encoding=encoding, errors='surrogateescape')
+    raw = io.BufferedWriter(ThreadedWriter(path, compression), STREAM_CHUNK_SIZE)
+    return io.TextIOWrapper(raw, encoding=encoding, errors='surrogateescape')
+
+
+def compressed_position(stream, position):
+    """Map a position in a dump opened by open_dump() to one in the file on disk"""
+    if isinstance(stream, ThreadedReader):
+        return stream.compressed_position
+    return position
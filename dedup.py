@@ -0,0 +1,119 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# Rough cost of one 16-byte digest in a Python set, object and slot included
+_BYTES_PER_KEY = 100
+# SQLite's default limit on host parameters is 999
+_QUERY_BATCH = 900
+
+
+def row_digest(values):
+    """Return a 16-byte hash of a tuple of parsed values"""
+    # repr() tells apart values that compare equal across types, like 1 and '1'
+    return hashlib.blake2b(repr(values).encode('utf-8', errors='surrogateescape'), digest_size=16).digest()
+
+
+class RowDeduplicator:
+    """Drop repeated rows from a stream of INSERT batches.
+
+    Rows are keyed on their primary key columns when key_columns has an
+    entry for the table ({table_name: [column, ...]}), and on a hash of the
+    whole row otherwise. Keys are kept as 16-byte digests in memory; once
+    they would take more than memory_budget bytes, they are moved to an
+    on-disk SQLite index and only new keys are held in memory until the
+    next spill.
+    """
+
+    def __init__(self, key_columns=None, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+        self.key_columns = key_columns or {}
+        self.max_keys = max(1, memory_budget // _BYTES_PER_KEY)
+        self.directory = directory
+        self.dropped = {}
+        self._seen = {}
+        self._key_count = 0
+        self._index = None
+        self._index_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _key_positions(self, table_name, columns):
+        key = self.key_columns.get(table_name)
+        if not key or not columns or not all(column in columns for column in key):
+            return None
+        return [columns.index(column) for column in key]
+
+    def filter_rows(self, table_name, columns, rows):
+        """Return the rows of a batch that haven't been seen for this table"""
+        positions = self._key_positions(table_name, columns)
+        if positions is None:
+            digests = [row_digest(row) for row in rows]
+        else:
+            digests = [row_digest(tuple([row[i] for i in positions])) for row in rows]
+
+        seen = self._seen.setdefault(table_name, set())
+        on_disk = self._lookup(table_name, [digest for digest in digests if digest not in seen])
+
+        kept = []
+        for row, digest in zip(rows, digests):
+            if digest in seen or digest in on_disk:
+                continue
+            seen.add(digest)
+            kept.append(row)
+        self._key_count += len(kept)
+
+        if len(kept) < len(rows):
+            self.dropped[table_name] = self.dropped.get(table_name, 0) + len(rows) - len(kept)
+        if self._key_count > self.max_keys:
+            self._spill()
+        return kept
+
+    def _lookup(self, table_name, digests):
+        """Return the subset of digests already in the on-disk index"""
+        if self._index is None or not digests:
+            return set()
+        found = set()
+        for i in range(0, len(digests), _QUERY_BATCH):
+            batch = digests[i:i + _QUERY_BATCH]
+            found.update(key for (key,) in self._index.execute(
+                f"SELECT key FROM seen WHERE tbl = ? AND key IN ({', '.join('?' * len(batch))})",
+                [table_name, *batch]
+            ))
+        return found
+
+    def _spill(self):
+        """Move every in-memory key to the on-disk index"""
+        if self._index is None:
+            fd, self._index_path = tempfile.mkstemp(prefix='dedup_', suffix='.sqlite', dir=self.directory)
+            os.close(fd)
+            self._index = sqlite3.connect(self._index_path)
+            self._index.execute('PRAGMA journal_mode = OFF')
+            self._index.execute('PRAGMA synchronous = OFF')
+            self._index.execute(
+                'CREATE TABLE seen (tbl TEXT, key BLOB, PRIMARY KEY (tbl, key)) WITHOUT ROWID'
+            )
+        with self._index:
+            for table_name, seen in self._seen.items():
+                self._index.executemany(
+                    'INSERT OR IGNORE INTO seen VALUES (?, ?)', ((table_name, key) for key in seen)
+                )
+                seen.clear()
+        self._key_count = 0
+
+    def report(self):
+        """Print how many duplicate rows were dropped per table"""
+        for table_name, count in self.dropped.items():
+            print(f"Dropped {count} duplicate rows from table {table_name}")
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            os.remove(self._index_path)
+            self._index = None
+        self._seen.clear()
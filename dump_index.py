@@ -0,0 +1,136 @@
+import argparse
+import json
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+from checkpoint import input_fingerprint
+from compressed_io import compression_of
+from dump_reader import iter_raw_statements
+from insert_parser import TABLE_NAME, insert_table_name, matched_table_name
+
+# Bumped when the layout or content of index files changes, so older ones are rebuilt
+INDEX_VERSION = 2
+# The statements step 2 reads, with table names written as in INSERT statements
+_DDL_HEAD = re.compile(r'(CREATE|ALTER)\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?' + TABLE_NAME, re.IGNORECASE)
+
+
+def index_path(input_file):
+    """Path of the index written next to a dump"""
+    return os.path.splitext(input_file)[0] + '.index.json'
+
+
+@contextmanager
+def map_dump(path):
+    """Open an uncompressed file for reading at random, memory-mapped unless it is empty"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as dump:
+            yield dump
+
+
+class DumpIndex:
+    """Byte ranges of each table's statements in a dump.
+
+    tables is {table_name: {'create': [...], 'alter': [...], 'inserts':
+    [...]}}, each a list of [start, end] ranges of CREATE TABLE, ALTER
+    TABLE and INSERT statements, with tables in the order they first
+    appear. The index is built in one pass and saved next to the dump
+    along with its size and mtime, so runs that only need a few tables
+    read just their statements instead of the whole dump.
+    """
+
+    def __init__(self, fingerprint, tables=None):
+        self.fingerprint = fingerprint
+        self.tables = tables if tables is not None else {}
+
+    @classmethod
+    def build(cls, input_file):
+        index = cls(input_fingerprint([input_file]))
+        with open(input_file, 'rb') as dump:
+            for start, end, statement in iter_raw_statements(dump):
+                # The table name is always within the first few hundred bytes
+                head = statement[:512].decode('utf-8', errors='ignore')
+                ddl = _DDL_HEAD.match(head)
+                if ddl:
+                    kind = ddl.group(1).lower()
+                    table_name = matched_table_name(ddl)
+                else:
+                    kind = 'inserts'
+                    table_name = insert_table_name(head)
+                    if not table_name:
+                        continue
+                table = index.tables.setdefault(table_name, {'create': [], 'alter': [], 'inserts': []})
+                table[kind].append([start, end])
+        return index
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'fingerprint': self.fingerprint, 'tables': self.tables}, f)
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at path, or None if it is missing or from another version"""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            return None
+        return cls(data['fingerprint'], data['tables'])
+
+    def insert_size(self, table_name):
+        return sum(end - start for start, end in self.tables[table_name]['inserts'])
+
+    def select(self, tables=None, exclude_tables=None):
+        """Names of the tables given, or of all but exclude_tables, in dump order.
+
+        Raises ValueError for names of either that aren't in the dump.
+        """
+        missing = [name for name in [*(tables or ()), *(exclude_tables or ())] if name not in self.tables]
+        if missing:
+            raise ValueError(f"Tables not found in the dump: {', '.join(missing)}")
+        return [
+            name for name in self.tables
+            if (tables is None or name in tables) and name not in (exclude_tables or ())
+        ]
+
+    def ddl_statements(self, dump, table_names):
+        """(create_statements, alter_statements) of some tables, in dump order, read from dump"""
+        statements = {'create': [], 'alter': []}
+        for kind, found in statements.items():
+            ranges = sorted(byte_range for name in table_names for byte_range in self.tables[name][kind])
+            found.extend(dump[start:end].decode('utf-8', errors='surrogateescape') for start, end in ranges)
+        return statements['create'], statements['alter']
+
+
+def load_index(input_file):
+    """The index of an uncompressed dump, built and saved first if it is missing or out of date"""
+    if compression_of(input_file):
+        raise ValueError(f"{input_file} is compressed and can't be read at random; decompress it to index it")
+    path = index_path(input_file)
+    index = DumpIndex.load(path)
+    if index is not None and index.fingerprint == input_fingerprint([input_file]):
+        return index
+    print(f"Indexing {input_file}")
+    index = DumpIndex.build(input_file)
+    index.save(path)
+    print(f"Saved index of {len(index.tables)} tables as {path}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the tables of a MySQL dump and list them")
+    parser.add_argument('input', help="uncompressed MySQL dump")
+    args = parser.parse_args()
+    index = load_index(args.input)
+    for table_name, table in index.tables.items():
+        print(f"{table_name}: {len(table['inserts'])} INSERT statements, "
+              f"{index.insert_size(table_name) / 2**20:,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
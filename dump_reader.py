@@ -0,0 +1,182 @@
+import re
+
+from compressed_io import open_dump
+
+# Size of each read from the dump file. Peak memory is bounded by the largest
+# single statement plus one chunk, never by the size of the dump itself.
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Significant bytes while outside of any quote or comment
+_NORMAL = re.compile(rb";|'|\"|`|#|--|/\*")
+# Everything up to the byte that may end each kind of quoted token. Backslash
+# escapes are skipped inside the regex, so escape-dense strings such as
+# _binary blobs don't need a Python step per escape. A backslash at the end
+# of the buffer is left for the next chunk.
+_QUOTE_BODY = {
+    b"'": re.compile(rb"[^'\\]*(?:\\[\s\S][^'\\]*)*"),
+    b'"': re.compile(rb'[^"\\]*(?:\\[\s\S][^"\\]*)*'),
+    b'`': re.compile(rb"[^`]*"),
+}
+_LEADING_SPACE = re.compile(rb"\s*")
+
+
+def _is_line_comment(buf, pos):
+    """Return True/False for a '--' at pos, or None if more data is needed.
+
+    MySQL only treats '--' as a comment when followed by whitespace or EOL.
+    """
+    if pos + 2 >= len(buf):
+        return None
+    return buf[pos + 2:pos + 3].isspace()
+
+
+def iter_raw_statements(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (start, end, statement_bytes) for each statement in a binary stream.
+
+    Quote, escape and comment state is carried across chunk boundaries, so a
+    statement is only yielded once its terminating ';' has been seen outside
+    of any string. start/end are absolute byte offsets of the statement text
+    (leading comments and whitespace excluded, terminating ';' included).
+    """
+    buf = bytearray()
+    base = 0          # absolute offset of buf[0]
+    pos = 0           # scan position inside buf
+    stmt_start = None # start of current statement inside buf, None until seen
+    state = None      # None, a quote byte, b'--' or b'/*'
+    eof = False
+
+    while True:
+        need_more = False
+
+        while not need_more:
+            if state is None:
+                if stmt_start is None:
+                    # Skip whitespace and comments between statements
+                    pos = _LEADING_SPACE.match(buf, pos).end()
+                    if pos >= len(buf):
+                        need_more = True
+                        break
+                    head = buf[pos:pos + 2]
+                    if head[:1] == b';':
+                        # Empty statement, e.g. left behind by a /*!...*/; line
+                        pos += 1
+                        continue
+                    if head[:1] == b'#':
+                        state = b'--'
+                        pos += 1
+                        continue
+                    if head == b'--':
+                        is_comment = _is_line_comment(buf, pos)
+                        if is_comment is None and not eof:
+                            need_more = True
+                            break
+                        if is_comment:
+                            state = b'--'
+                            pos += 2
+                            continue
+                    elif head == b'/*':
+                        state = b'/*'
+                        pos += 2
+                        continue
+                    elif len(head) < 2 and head in (b'-', b'/') and not eof:
+                        need_more = True
+                        break
+                    stmt_start = pos
+
+                match = _NORMAL.search(buf, pos)
+                if not match:
+                    # Keep a trailing '-' or '/' around in case it starts a comment
+                    pos = max(pos, len(buf) - 1)
+                    need_more = True
+                    break
+
+                token = match.group()
+                pos = match.start()
+                if token == b';':
+                    pos += 1
+                    yield base + stmt_start, base + pos, bytes(buf[stmt_start:pos])
+                    stmt_start = None
+                elif token in _QUOTE_BODY:
+                    state = token
+                    pos += 1
+                elif token == b'#':
+                    state = b'--'
+                    pos += 1
+                elif token == b'--':
+                    is_comment = _is_line_comment(buf, pos)
+                    if is_comment is None and not eof:
+                        need_more = True
+                        break
+                    state = b'--' if is_comment else None
+                    pos += 2
+                else:
+                    state = b'/*'
+                    pos += 2
+
+            elif state == b'--':
+                end = buf.find(b'\n', pos)
+                if end == -1:
+                    pos = len(buf)
+                    need_more = True
+                    break
+                pos = end + 1
+                state = None
+
+            elif state == b'/*':
+                end = buf.find(b'*/', pos)
+                if end == -1:
+                    pos = max(pos, len(buf) - 1)
+                    need_more = True
+                    break
+                pos = end + 2
+                state = None
+
+            else:
+                pos = _QUOTE_BODY[state].match(buf, pos).end()
+                if pos >= len(buf) or buf[pos] == 0x5C:
+                    # The closing quote, or the byte a trailing backslash escapes, is in the next chunk
+                    need_more = True
+                    break
+                # A doubled quote is an escaped quote, not the end of the string
+                if pos + 1 >= len(buf) and not eof:
+                    need_more = True
+                    break
+                if buf[pos + 1:pos + 2] == state:
+                    pos += 2
+                    continue
+                pos += 1
+                state = None
+
+        if eof:
+            break
+
+        # Drop everything before the current statement, then read more data
+        keep_from = stmt_start if stmt_start is not None else pos
+        if keep_from:
+            del buf[:keep_from]
+            base += keep_from
+            pos -= keep_from
+            if stmt_start is not None:
+                stmt_start = 0
+
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buf += chunk
+        else:
+            eof = True
+
+    # Anything left without a terminating ';' is still a statement
+    if stmt_start is not None:
+        tail = bytes(buf[stmt_start:]).rstrip()
+        if tail:
+            yield base + stmt_start, base + stmt_start + len(tail), tail
+
+
+def iter_statements(input_file, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+    """Yield each SQL statement of a MySQL dump as a string, one at a time.
+
+    A dump ending in .gz or .zst is decompressed as it is read.
+    """
+    with open_dump(input_file) as f:
+        for _, _, statement in iter_raw_statements(f, chunk_size):
+            yield statement.decode(encoding, errors='surrogateescape')
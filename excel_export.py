@@ -0,0 +1,135 @@
+import json
+import math
+import os
+import re
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Rows of an Excel sheet, the first of which holds the column names
+EXCEL_MAX_ROWS = 1048576
+# Longest sheet name Excel accepts
+SHEET_NAME_LENGTH = 31
+# Characters Excel doesn't allow in sheet names
+_INVALID_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+
+
+def _require_xlsxwriter():
+    if xlsxwriter is None:
+        raise RuntimeError("Writing Excel files needs xlsxwriter: pip install xlsxwriter")
+
+
+def sheet_map_path(excel_file):
+    """Path of the sidecar naming the table of each sheet, written next to an Excel file"""
+    return os.path.splitext(excel_file)[0] + '.sheets.json'
+
+
+def load_sheet_tables(excel_file):
+    """{sheet name: table name} of an Excel file.
+
+    Files written before sheets were renamed or split have no sidecar;
+    their sheets are named after their tables.
+    """
+    path = sheet_map_path(excel_file)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['sheets']
+
+
+class ExcelExport:
+    """Stream tables into an Excel file with xlsxwriter's constant_memory mode.
+
+    Each row is written out to a temporary file as soon as it is added,
+    so memory stays flat however large the tables are. A table with more
+    rows than a sheet holds continues on table_2, table_3, ... sheets,
+    each starting with the column names. Sheet names are made valid and
+    cut to 31 characters, and the table of each sheet is saved next to
+    the file, to be read back with load_sheet_tables().
+    """
+
+    def __init__(self, path, max_rows=EXCEL_MAX_ROWS):
+        _require_xlsxwriter()
+        self.path = path
+        self.max_rows = max_rows
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.header_format = self.workbook.add_format({'bold': True})
+        self.sheet_tables = {}
+        # Sheets per table so far, to number the next one
+        self._sheet_counts = {}
+        self._used_names = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _sheet_name(self, table_name):
+        number = self._sheet_counts.get(table_name, 0) + 1
+        self._sheet_counts[table_name] = number
+        base = _INVALID_SHEET_CHARACTERS.sub('_', str(table_name)).strip("'") or 'sheet'
+        suffix = f"_{number}" if number > 1 else ''
+        name = base[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+        # Cut names can collide, and Excel compares them ignoring case
+        duplicate = 1
+        while name.lower() in self._used_names:
+            duplicate += 1
+            tag = f"~{duplicate}{suffix}"
+            name = base[:SHEET_NAME_LENGTH - len(tag)] + tag
+        self._used_names.add(name.lower())
+        self.sheet_tables[name] = table_name
+        return name
+
+    def _add_sheet(self, table_name, columns):
+        sheet = self.workbook.add_worksheet(self._sheet_name(table_name))
+        sheet.write_row(0, 0, [str(column) for column in columns], self.header_format)
+        return sheet
+
+    def add_table(self, table_name, columns, rows):
+        """Write a table's rows under its column names and return how many there were.
+
+        rows is an iterable of sequences of cell values, consumed one row
+        at a time. Without column names, columns are numbered from 0.
+        """
+        sheet = None
+        row_number = self.max_rows
+        row_count = 0
+        for row in rows:
+            if row_number == self.max_rows:
+                sheet = self._add_sheet(table_name, columns or range(len(row)))
+                row_number = 1
+            for column_number, value in enumerate(row):
+                _write_cell(sheet, row_number, column_number, value)
+            row_number += 1
+            row_count += 1
+        if sheet is None:
+            self._add_sheet(table_name, columns or [])
+        return row_count
+
+    def close(self):
+        """Finish the Excel file and save which table each sheet holds"""
+        if self.workbook is None:
+            return
+        self.workbook.close()
+        self.workbook = None
+        with open(sheet_map_path(self.path), 'w', encoding='utf-8') as f:
+            json.dump({'sheets': self.sheet_tables}, f, indent=1)
+
+
+def _write_cell(sheet, row_number, column_number, value):
+    # Typed writes, so strings that look like formulas, numbers or URLs stay strings
+    if value is None:
+        return
+    if isinstance(value, str):
+        sheet.write_string(row_number, column_number, value)
+    elif isinstance(value, bool):
+        sheet.write_boolean(row_number, column_number, value)
+    elif isinstance(value, int) or isinstance(value, float) and math.isfinite(value):
+        sheet.write_number(row_number, column_number, value)
+    elif isinstance(value, float) and math.isnan(value):
+        return
+    else:
+        sheet.write_string(row_number, column_number, str(value))
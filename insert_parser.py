@@ -0,0 +1,244 @@
+import re
+from decimal import Decimal
+
+# [`db`.]`table` or [db.]table, where a backquoted name may hold any character
+TABLE_NAME = r"(?:(?:`[^`]+`|\w+)\s*\.\s*)?(?:`(?P<quoted>(?:[^`]|``)+)`|(?P<name>\w+))"
+# INSERT [IGNORE] INTO `db`.`table` [(col, ...)] VALUES
+_INSERT_HEAD = re.compile(
+    r"\s*(?:INSERT|REPLACE)(?:\s+(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE))*\s+INTO\s+" + TABLE_NAME + r"\s*",
+    re.IGNORECASE
+)
+_COLUMN_LIST = re.compile(r"\(([^()]*)\)\s*", re.DOTALL)
+_COLUMN_NAME = re.compile(r'`((?:[^`]|``)+)`|"((?:[^"]|"")+)"|(\w+)')
+_VALUES_KEYWORD = re.compile(r"VALUES?\s*", re.IGNORECASE)
+
+# One literal inside a VALUES tuple. String patterns are written as unrolled
+# loops so they match in linear time without backtracking.
+_VALUE = re.compile(r"""
+    \s*(?:
+        '(?P<string>[^'\\]*(?:(?:\\.|'')[^'\\]*)*)'
+      | "(?P<dstring>[^"\\]*(?:(?:\\.|"")[^"\\]*)*)"
+      | 0x(?P<hex>[0-9a-fA-F]*)
+      | [xX]'(?P<xhex>[0-9a-fA-F]*)'
+      | 0b(?P<bit>[01]+)
+      | [bB]'(?P<bbit>[01]*)'
+      | (?P<number>[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<null>NULL)\b
+      | (?P<true>TRUE)\b
+      | (?P<false>FALSE)\b
+      | _(?P<introducer>\w+)(?=\s*['"xXbB0])
+    )
+""", re.VERBOSE | re.DOTALL | re.IGNORECASE)
+# A run of whole VALUES tuples, each followed by a comma, in the raw bytes of
+# an INSERT. Strings are skipped whole, so parentheses and commas in them
+# don't count. Values never contain bare parentheses in a dump.
+_TUPLE_RUN_PATTERN = rb"""
+    (?:\s*\(
+        (?:[^'"()]++
+          | '[^'\\]*+(?:\\[\s\S][^'\\]*+)*+'
+          | "[^"\\]*+(?:\\[\s\S][^"\\]*+)*+"
+        )*+
+    \)\s*,)++
+"""
+# Before Python 3.11, which lacks possessive quantifiers. A plain + inside
+# the * would backtrack exponentially over the tuple cut off at max_bytes,
+# so runs outside strings are matched whole by a lookahead and backreference.
+_TUPLE_RUN_FALLBACK_PATTERN = rb"""
+    (?:\s*\(
+        (?:(?=([^'"()]+))\1
+          | '[^'\\]*(?:\\[\s\S][^'\\]*)*'
+          | "[^"\\]*(?:\\[\s\S][^"\\]*)*"
+        )*
+    \)\s*,)+
+"""
+try:
+    # Possessive quantifiers (Python 3.11+) keep no backtracking state, which
+    # makes the match about four times faster
+    _TUPLE_RUN = re.compile(_TUPLE_RUN_PATTERN, re.VERBOSE)
+except re.error:
+    _TUPLE_RUN = re.compile(_TUPLE_RUN_FALLBACK_PATTERN, re.VERBOSE)
+_TUPLE_OPEN = re.compile(r"\s*\(")
+_SEPARATOR = re.compile(r"\s*([,)])")
+_NEXT_TUPLE = re.compile(r"\s*,\s*(?=\()")
+
+# MySQL backslash escapes; unknown escapes drop the backslash, while \% and
+# \_ keep it (they only mean something inside LIKE patterns).
+_ESCAPES = {
+    '0': '\0', "'": "'", '"': '"', 'b': '\b', 'n': '\n', 'r': '\r',
+    't': '\t', 'Z': '\x1a', '\\': '\\', '%': '\\%', '_': '\\_',
+}
+_SINGLE_ESCAPE = re.compile(r"\\(.)|''", re.DOTALL)
+_DOUBLE_ESCAPE = re.compile(r'\\(.)|""', re.DOTALL)
+
+
+def _unescape(text, pattern, quote):
+    if '\\' not in text and quote + quote not in text:
+        return text
+    # split() leaves the escaped characters at odd indexes (None for a doubled
+    # quote), which is much cheaper than a sub() callback per escape in the
+    # escape-dense strings of _binary blobs
+    parts = pattern.split(text)
+    escapes = _ESCAPES
+    parts[1::2] = [quote if char is None else escapes.get(char, char) for char in parts[1::2]]
+    return ''.join(parts)
+
+
+def _hex_bytes(digits):
+    if len(digits) % 2:
+        digits = '0' + digits
+    return bytes.fromhex(digits)
+
+
+def _literal_value(match, introducer=None):
+    """Convert one matched literal to a Python value."""
+    kind = match.lastgroup
+    text = match.group(kind)
+    if kind == 'string':
+        value = _unescape(text, _SINGLE_ESCAPE, "'")
+    elif kind == 'dstring':
+        value = _unescape(text, _DOUBLE_ESCAPE, '"')
+    elif kind == 'number':
+        if '.' in text or 'e' in text or 'E' in text:
+            return Decimal(text)
+        return int(text)
+    elif kind in ('hex', 'xhex'):
+        return _hex_bytes(text)
+    elif kind in ('bit', 'bbit'):
+        return int(text, 2) if text else 0
+    elif kind == 'null':
+        return None
+    elif kind == 'true':
+        return 1
+    elif kind == 'false':
+        return 0
+    else:
+        raise ValueError(f"Unsupported literal {match.group().strip()!r}")
+
+    if introducer == 'binary':
+        # Raw bytes were decoded with surrogateescape by the dump reader
+        return value.encode('utf-8', errors='surrogateescape')
+    return value
+
+
+def matched_table_name(match):
+    """The table name matched by TABLE_NAME in a pattern"""
+    if match.group('quoted') is not None:
+        return match.group('quoted').replace('``', '`')
+    return match.group('name')
+
+
+def insert_table_name(sql_statement):
+    """Return the table an INSERT statement writes to, or None.
+
+    Only the head of the statement is looked at, so this is cheap enough to
+    call for every statement while grouping a dump by table.
+    """
+    head = _INSERT_HEAD.match(sql_statement)
+    return matched_table_name(head) if head else None
+
+
+def parse_insert(sql_statement):
+    """Parse an INSERT statement into (table_name, columns, rows).
+
+    columns is None when the statement has no column list. Each row is a
+    tuple of typed values: None, int, Decimal, str or bytes. Returns None if
+    the statement is not an INSERT; raises ValueError on malformed VALUES.
+    """
+    head = _INSERT_HEAD.match(sql_statement)
+    if not head:
+        return None
+    table_name = matched_table_name(head)
+    pos = head.end()
+
+    columns = None
+    column_list = _COLUMN_LIST.match(sql_statement, pos)
+    if column_list:
+        columns = [
+            (quoted.replace('``', '`') if quoted else dquoted.replace('""', '"') if dquoted else bare)
+            for quoted, dquoted, bare in _COLUMN_NAME.findall(column_list.group(1))
+        ]
+        pos = column_list.end()
+
+    keyword = _VALUES_KEYWORD.match(sql_statement, pos)
+    if not keyword:
+        raise ValueError(f"No VALUES clause found for table {table_name}")
+    pos = keyword.end()
+
+    rows = []
+    value_match = _VALUE.match
+    separator_match = _SEPARATOR.match
+    while True:
+        opened = _TUPLE_OPEN.match(sql_statement, pos)
+        if not opened:
+            raise ValueError(f"Expected '(' at offset {pos} in INSERT for table {table_name}")
+        pos = opened.end()
+
+        row = []
+        closed = separator_match(sql_statement, pos)
+        if not (closed and closed.group(1) == ')'):
+            while True:
+                match = value_match(sql_statement, pos)
+                if not match:
+                    raise ValueError(f"Unexpected value at offset {pos} in INSERT for table {table_name}")
+                introducer = match.group('introducer')
+                if introducer is not None:
+                    match = value_match(sql_statement, match.end())
+                    if not match or match.lastgroup == 'introducer':
+                        raise ValueError(f"Dangling _{introducer} introducer in INSERT for table {table_name}")
+                    introducer = introducer.lower()
+                row.append(_literal_value(match, introducer))
+
+                closed = separator_match(sql_statement, match.end())
+                if not closed:
+                    raise ValueError(f"Expected ',' or ')' at offset {match.end()} in INSERT for table {table_name}")
+                pos = closed.end()
+                if closed.group(1) == ')':
+                    break
+        else:
+            pos = closed.end()
+        rows.append(tuple(row))
+
+        # Another tuple follows, or the VALUES list (and anything after it) ends
+        following = _NEXT_TUPLE.match(sql_statement, pos)
+        if not following:
+            break
+        pos = following.end()
+
+    return table_name, columns, rows
+
+
+def split_insert(statement, max_bytes):
+    """Split the raw bytes of a long INSERT into pieces of whole tuples.
+
+    Returns (head_end, pieces): the statement up to head_end is the part
+    before the first tuple, and each (start, end) piece is a run of whole
+    tuples of up to about max_bytes, so that head + piece is an INSERT of
+    its own. Returns None for a statement that isn't an INSERT. A piece is
+    only cut where the tuples before it could be matched, so anything
+    unusual ends up in one, larger, last piece.
+    """
+    head_text = statement[:65536].decode('utf-8', errors='surrogateescape')
+    head = _INSERT_HEAD.match(head_text)
+    if not head:
+        return None
+    pos = head.end()
+    column_list = _COLUMN_LIST.match(head_text, pos)
+    if column_list:
+        pos = column_list.end()
+    keyword = _VALUES_KEYWORD.match(head_text, pos)
+    if not keyword:
+        return None
+    head_end = len(head_text[:keyword.end()].encode('utf-8', errors='surrogateescape'))
+
+    pieces = []
+    pos = head_end
+    while len(statement) - pos > max_bytes:
+        # The match can't see past pos + max_bytes, so it stops at the last tuple that fits
+        run = _TUPLE_RUN.match(statement, pos, pos + max_bytes)
+        if not run:
+            break
+        # Leave out the comma after the last tuple
+        pieces.append((pos, run.end() - 1))
+        pos = run.end()
+    pieces.append((pos, len(statement)))
+    return head_end, pieces
@@ -0,0 +1,191 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Seconds between two progress lines
+PROGRESS_INTERVAL = 5.0
+
+
+def report_path(output_file):
+    """Path of the JSON run report written next to an output file"""
+    return os.path.splitext(output_file)[0] + '.report.json'
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def stop_profiling():
+    """Initializer of worker processes, which fork with the parent's profiler and tracing on"""
+    sys.setprofile(None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+class Progress:
+    """Print a progress line with throughput and ETA at most every interval seconds"""
+
+    def __init__(self, label, total_bytes, interval=PROGRESS_INTERVAL):
+        self.label = label
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.started = self._last = time.perf_counter()
+        self.done_bytes = 0
+        self.rows = 0
+
+    def update(self, done_bytes, rows=0):
+        """Record the input bytes processed so far and rows added since the last call"""
+        self.done_bytes = done_bytes
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._print(now)
+
+    def finish(self):
+        """Print the final line, once all of the input has been processed"""
+        self.done_bytes = self.total_bytes
+        self._print(time.perf_counter())
+
+    def _print(self, now):
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.done_bytes / elapsed
+        fraction = self.done_bytes / self.total_bytes if self.total_bytes else 1.0
+        eta = (self.total_bytes - self.done_bytes) / rate if rate else 0
+        print(f"{self.label}: {fraction:6.1%} of {self.total_bytes / 2**20:,.1f} MB, "
+              f"{rate / 2**20:,.1f} MB/s, {self.rows / elapsed:,.0f} rows/s, "
+              f"elapsed {format_duration(elapsed)}, ETA {format_duration(eta)}")
+
+
+class Instrumentation:
+    """Timers, counters and stage measurements of one run.
+
+    Time is added up per table and phase, e.g. parse, convert and format,
+    and counters such as rows and bytes per table. Stages are timed as a
+    whole, optionally under cProfile (one .prof file per stage in
+    profile_dir) and tracemalloc (peak traced memory per stage). The
+    threads of a pipelined conversion are measured in pipeline. Worker
+    processes keep their own Instrumentation and send to_dict() back to be
+    merged.
+    """
+
+    def __init__(self, profile_dir=None, trace_memory=False):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.started = time.time()
+        self.timings = {}
+        self.counters = {}
+        self.stages = {}
+        # Pipeline.measurements() of a pipelined conversion
+        self.pipeline = {}
+
+    @contextmanager
+    def timer(self, phase, table=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - started, table)
+
+    def add_time(self, phase, seconds, table=None):
+        phases = self.timings.setdefault(table, {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def count(self, name, amount, table=None):
+        counters = self.counters.setdefault(table, {})
+        counters[name] = counters.get(name, 0) + amount
+
+    @contextmanager
+    def stage(self, name):
+        """Time one stage of the run, profiling it if enabled"""
+        profiler = None
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler = cProfile.Profile()
+            profiler.enable()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = {'seconds': time.perf_counter() - started}
+            if profiler:
+                profiler.disable()
+                stage['profile'] = os.path.join(self.profile_dir, f"{name}.prof")
+                profiler.dump_stats(stage['profile'])
+            if self.trace_memory:
+                stage['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+            self.stages[name] = stage
+
+    def to_dict(self):
+        return {'timings': self.timings, 'counters': self.counters}
+
+    def merge(self, stats):
+        """Add the timers and counters of a worker's to_dict()"""
+        for table, phases in stats['timings'].items():
+            for phase, seconds in phases.items():
+                self.add_time(phase, seconds, table)
+        for table, counters in stats['counters'].items():
+            for name, amount in counters.items():
+                self.count(name, amount, table)
+
+    def table_summary(self):
+        """{table: {'rows', 'bytes', 'seconds', 'rows_per_second', 'timings'}}"""
+        summary = {}
+        for table in [name for name in {**self.counters, **self.timings} if name is not None]:
+            counters = self.counters.get(table, {})
+            timings = self.timings.get(table, {})
+            seconds = sum(timings.values())
+            summary[table] = {
+                **counters,
+                'seconds': seconds,
+                'rows_per_second': counters.get('rows', 0) / seconds if seconds else None,
+                'timings': timings,
+            }
+        return summary
+
+    def report(self):
+        """Print rows, bytes and time per table, the time of each stage and any pipeline measurements"""
+        for table, summary in self.table_summary().items():
+            rate = f", {summary['rows_per_second']:,.0f} rows/s" if summary['rows_per_second'] else ''
+            print(f"Table {table}: {summary.get('rows', 0)} rows, {summary.get('bytes', 0) / 2**20:,.1f} MB "
+                  f"in {summary['seconds']:.2f}s{rate}")
+        for name, stage in self.stages.items():
+            print(f"Stage {name}: {stage['seconds']:.2f}s")
+        if self.pipeline:
+            # The stage that is busiest keeps the queue in front of it full and the one after it empty
+            bottleneck = max(self.pipeline, key=lambda name: self.pipeline[name]['busy_seconds'])
+            for name, measurement in self.pipeline.items():
+                queue = ''
+                if 'queue_size' in measurement:
+                    queue = (f", input queue {measurement['mean_queue_depth']:.1f} on average, "
+                             f"{measurement['max_queue_depth']} at most of {measurement['queue_size']}")
+                print(f"Pipeline {name}: busy {measurement['busy_seconds']:.2f}s, "
+                      f"waited {measurement['wait_seconds']:.2f}s for input, "
+                      f"stalled {measurement['stall_seconds']:.2f}s on a full queue{queue}"
+                      f"{' (bottleneck)' if name == bottleneck else ''}")
+
+    def save_report(self, path, **info):
+        """Write the machine-readable run report"""
+        totals = {}
+        for counters in self.counters.values():
+            for name, amount in counters.items():
+                totals[name] = totals.get(name, 0) + amount
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                **info,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'seconds': time.time() - self.started,
+                'stages': self.stages,
+                'pipeline': self.pipeline,
+                'totals': totals,
+                'tables': self.table_summary(),
+            }, f, indent=1)
@@ -0,0 +1,1018 @@
+import argparse
+import importlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from checkpoint import CHECKPOINT_INTERVAL, Checkpoint, checkpoint_path, commit_file, input_fingerprint, partial_path
+from compressed_io import compressed_position, compression_of, find_dump, open_dump, open_output
+from dedup import DEFAULT_MEMORY_BUDGET, RowDeduplicator
+from dump_index import load_index, map_dump
+from dump_reader import DEFAULT_CHUNK_SIZE, iter_raw_statements
+from insert_parser import insert_table_name, parse_insert, split_insert
+from instrumentation import Instrumentation, Progress, report_path, stop_profiling
+from pg_writer import write_copy_block, write_copy_rows, write_insert_statement
+from pipeline import PIPELINE_QUEUE_SIZE, IterableReader, Pipeline
+from row_spool import RowSpool
+from schema_model import load_schema
+from section_manifest import ByteRanges
+from sequences import SequenceValues
+from table_cache import DEFAULT_CACHE_SIZE, TableCache, payload_hasher
+
+# The numbered step scripts can't be imported with a plain import statement
+schema_step = importlib.import_module('2_convert_to_pgsql_scheme')
+combine_step = importlib.import_module('4_combine_sql_files')
+
+INPUT_SQL_FILE = "0_to_be_convert.sql"
+SCHEMA_FILE = "2_postgresql_scheme.sql"
+OUTPUT_FILE = "4_final_postgresql.sql"
+
+# With more than one worker, tables larger than this are split between workers
+PARTITION_SIZE = 256 * 1024 * 1024
+# Longer INSERTs are cut between tuples, so they can be split too
+MAX_STATEMENT_SIZE = 16 * 1024 * 1024
+
+
+def copy_file_path(copy_dir, table_name):
+    return os.path.join(copy_dir, f"{table_name}.copy")
+
+
+def is_insert(statement):
+    return statement[:7].upper().startswith(('INSERT', 'REPLACE'))
+
+
+def convert_insert(statement, column_types):
+    """Parse one INSERT statement and line its columns up with the schema.
+
+    Returns (table_name, columns, rows), or None if the statement is
+    skipped.
+    """
+    try:
+        parsed = parse_insert(statement)
+    except ValueError as e:
+        print(f"Skipping INSERT statement: {e}")
+        return None
+    if not parsed:
+        return None
+
+    table_name, columns, rows = parsed
+    if not columns:
+        columns = list(column_types.get(table_name, {}))
+    if len(columns) != len(rows[0]):
+        print(f"Column mismatch for {table_name}: {len(columns)} names but {len(rows[0])} values")
+        return None
+    return table_name, columns, rows
+
+
+def write_rows(f, table_name, columns, rows, table_column_types, output_format):
+    """Write one batch of rows as INSERT, COPY block or bare COPY lines"""
+    if output_format == 'copy-data':
+        write_copy_rows(f, rows, [table_column_types.get(col) for col in columns])
+    elif output_format == 'copy':
+        write_copy_block(f, table_name, columns, rows, table_column_types)
+    else:
+        write_insert_statement(f, table_name, columns, rows, table_column_types)
+
+
+def format_rows(table_name, columns, rows, table_column_types, output_format):
+    """Return one batch of rows as write_rows() would write it"""
+    text = io.StringIO()
+    write_rows(text, table_name, columns, rows, table_column_types, output_format)
+    return text.getvalue()
+
+
+def write_copy_commands(f, copy_dir, copy_columns):
+    """Load each per-table .copy file with psql's \\copy"""
+    for table_name, columns in copy_columns.items():
+        path = copy_file_path(copy_dir, table_name).replace("'", "''")
+        f.write(f"\\copy {table_name} ({', '.join(columns)}) FROM '{path}'\n\n")
+
+
+def convert_statements(input_file, f, column_types, output_format, copy_dir=None, collect_rows=False,
+                       deduplicator=None, checkpoint=None, resume_from=None, stats=None, sequences=None,
+                       pipeline=False, queue_size=PIPELINE_QUEUE_SIZE):
+    """Convert the dump one statement at a time in this process.
+
+    With collect_rows, the parsed rows are also kept in a RowSpool, which
+    the caller must close. Rows already seen by deduplicator are dropped.
+    With a checkpoint, the input offset reached and the size of every
+    output file are journaled every CHECKPOINT_INTERVAL bytes of input.
+    Given the last such progress record as resume_from, the conversion
+    continues from there, after cutting the output files back to their
+    recorded sizes. A compressed output can't be cut back, so no
+    checkpoint should be given for one. Time, rows and bytes per table are
+    added to stats, and the values of serial columns to sequences.
+
+    The dump is read, split into statements, parsed, formatted and
+    written in stages. With pipeline, each stage runs in its own thread
+    and hands its items on through a queue of up to queue_size items, and
+    the time each stage was busy, waited for input and stalled on a full
+    queue is recorded in stats.pipeline.
+    """
+    stats = stats or Instrumentation()
+    excel_rows = RowSpool() if collect_rows else None
+    row_counts = {}
+    copy_columns = {}
+    offset = 0
+    if copy_dir:
+        os.makedirs(copy_dir, exist_ok=True)
+    if resume_from:
+        print(f"Resuming conversion at byte {resume_from['offset']} of {input_file}")
+        offset = resume_from['offset']
+        row_counts = resume_from['row_counts']
+        copy_columns = resume_from['copy_columns']
+        f.seek(resume_from['size'])
+        f.truncate()
+        for table_name, size in resume_from['copy_sizes'].items():
+            os.truncate(copy_file_path(copy_dir, table_name), size)
+        for table_name, row_count in row_counts.items():
+            stats.count('rows', row_count, table_name)
+        for table_name, values in resume_from.get('sequence_values', {}).items():
+            sequences.update(table_name, values)
+    progress = Progress(f"Converting {input_file}", os.path.getsize(input_file))
+
+    def read():
+        return iter(lambda: dump.read(DEFAULT_CHUNK_SIZE), b'')
+
+    def split(chunks):
+        return iter_raw_statements(IterableReader(chunks))
+
+    def parse(statements):
+        for _, end, raw_statement in statements:
+            statement = raw_statement.decode('utf-8', errors='surrogateescape')
+            if not is_insert(statement):
+                continue
+            started = time.perf_counter()
+            converted = convert_insert(statement, column_types)
+            if not converted:
+                continue
+            table_name, columns, rows = converted
+            stats.add_time('parse', time.perf_counter() - started, table_name)
+            if deduplicator:
+                with stats.timer('dedup', table_name):
+                    rows = deduplicator.filter_rows(table_name, columns, rows)
+            yield offset + end, len(raw_statement), table_name, columns, rows
+
+    def format_batches(batches):
+        for batch in batches:
+            table_name, columns, rows = batch[2:]
+            with stats.timer('format', table_name):
+                text = format_rows(table_name, columns, rows, column_types.get(table_name, {}), output_format)
+            yield batch + (text,)
+
+    def write(batches):
+        # End of the last statement whose rows have been written
+        position = last_checkpoint = offset
+        # The .copy file of the last batch's table, kept open while that table's INSERTs follow one another
+        copy_table = copy_file = None
+        try:
+            for end, size, table_name, columns, rows, text in batches:
+                if checkpoint and position - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    if copy_file:
+                        copy_file.flush()
+                    checkpoint.record(
+                        'convert', offset=position, size=f.tell(), row_counts=row_counts,
+                        copy_columns=copy_columns,
+                        copy_sizes={name: os.path.getsize(copy_file_path(copy_dir, name)) for name in copy_columns},
+                        sequence_values=sequences.values
+                    )
+                    last_checkpoint = position
+                sequences.observe(table_name, columns, rows)
+
+                with stats.timer('write', table_name):
+                    if copy_dir:
+                        if table_name != copy_table:
+                            if copy_file:
+                                copy_file.close()
+                            # First batch of a table truncates any .copy file from an earlier run
+                            mode = 'a' if table_name in copy_columns else 'w'
+                            copy_columns.setdefault(table_name, columns)
+                            copy_file = open(copy_file_path(copy_dir, table_name), mode, encoding='utf-8',
+                                             errors='surrogateescape')
+                            copy_table = table_name
+                        copy_file.write(text)
+                    else:
+                        f.write(text)
+                position = end
+                row_counts[table_name] = row_counts.get(table_name, 0) + len(rows)
+                stats.count('rows', len(rows), table_name)
+                stats.count('bytes', size, table_name)
+                progress.update(compressed_position(dump, position), len(rows))
+
+                if excel_rows is not None:
+                    excel_rows.append(table_name, columns, rows)
+        finally:
+            if copy_file:
+                copy_file.close()
+
+    with open_dump(input_file) as dump:
+        # A compressed dump is decompressed up to offset and the data dropped
+        dump.seek(offset)
+        if pipeline:
+            stages = Pipeline(queue_size)
+            stages.add('read', read).add('split', split).add('parse', parse)
+            stages.add('format', format_batches).add('write', write)
+            stages.run()
+            stats.pipeline = stages.measurements()
+        else:
+            write(format_batches(parse(iter_raw_statements(dump))))
+    progress.finish()
+
+    if copy_dir:
+        write_copy_commands(f, copy_dir, copy_columns)
+    return row_counts, excel_rows
+
+
+def convert_table(input_file, table_name, ranges, column_types, output_format, part_file, sequences,
+                  deduplicator=None, checkpoint=None, partition=None):
+    """Convert every INSERT of one table, given as byte ranges of the dump.
+
+    Runs in a worker process, with its own copy of deduplicator and
+    sequences. Returns (table_name, columns, row_count,
+    duplicates_dropped, stats, sequence_values), where stats is the
+    to_dict() of the table's Instrumentation and sequence_values the
+    highest value of each serial column of the table. With a
+    checkpoint, the part file is written under a temporary name and only
+    moved into place once the table is complete. Without a deduplicator,
+    whose seen rows can't be restored, the input offset reached is also
+    journaled as the table goes, and a rerun continues from there. When
+    ranges are only one partition of the table, its number is given as
+    partition, which keeps its journal records apart from the others.
+    """
+    stats = Instrumentation()
+    job = table_name if partition is None else partition_job(table_name, partition)
+    table_column_types = column_types.get(table_name, {})
+    table_columns = None
+    row_count = 0
+    output_path = partial_path(part_file) if checkpoint else part_file
+    resumable = checkpoint is not None and deduplicator is None
+    mode = 'w'
+    progress = checkpoint.latest('convert', job) if resumable else None
+    if progress and not progress['done'] and os.path.exists(output_path):
+        print(f"Resuming table {job} at byte {progress['offset']}")
+        os.truncate(output_path, progress['size'])
+        table_columns = progress['columns']
+        row_count = progress['row_count']
+        sequences.update(table_name, progress.get('sequence_values', {}))
+        ranges = [byte_range for byte_range in ranges if byte_range[0] >= progress['offset']]
+        mode = 'a'
+
+    with map_dump(input_file) as dump, open(output_path, mode, encoding='utf-8', errors='surrogateescape') as f:
+        last_checkpoint = ranges[0][0] if ranges else 0
+        for byte_range in ranges:
+            start, end = byte_range[:2]
+            with stats.timer('parse', table_name):
+                statement = read_range(dump, byte_range).decode('utf-8', errors='surrogateescape')
+                converted = convert_insert(statement, column_types)
+            if not converted:
+                continue
+            _, columns, rows = converted
+            table_columns = table_columns or columns
+            if deduplicator:
+                with stats.timer('dedup', table_name):
+                    rows = deduplicator.filter_rows(table_name, columns, rows)
+            sequences.observe(table_name, columns, rows)
+            with stats.timer('format', table_name):
+                write_rows(f, table_name, columns, rows, table_column_types, output_format)
+            row_count += len(rows)
+            stats.count('rows', len(rows), table_name)
+            stats.count('bytes', end - start, table_name)
+            if resumable and end - last_checkpoint >= CHECKPOINT_INTERVAL:
+                f.flush()
+                os.fsync(f.fileno())
+                checkpoint.record('convert', job, offset=end, size=f.tell(), columns=table_columns,
+                                  row_count=row_count, sequence_values=sequences.values.get(table_name, {}))
+                last_checkpoint = end
+    if checkpoint:
+        commit_file(output_path, part_file)
+    dropped = 0
+    if deduplicator:
+        deduplicator.close()
+        dropped = deduplicator.dropped.get(table_name, 0)
+    return table_name, table_columns, row_count, dropped, stats.to_dict(), sequences.values.get(table_name, {})
+
+
+def spooled_dump_path(spool_dir, table_name):
+    return os.path.join(spool_dir, f"{table_name}.sql")
+
+
+def table_dump(input_file, spool_dir, table_name):
+    """The file a table's byte ranges point into: the dump, or its spooled INSERTs"""
+    return spooled_dump_path(spool_dir, table_name) if spool_dir else input_file
+
+
+def read_range(dump, byte_range):
+    """Read one INSERT given as a range from group_inserts_by_table()"""
+    start, end = byte_range[:2]
+    head = b''
+    if len(byte_range) > 2:
+        # A piece of a long INSERT, which needs the statement's head in front
+        dump.seek(byte_range[2])
+        head = dump.read(byte_range[3] - byte_range[2])
+    dump.seek(start)
+    return head + dump.read(end - start)
+
+
+def insert_ranges(statement, start, max_statement=None):
+    """Ranges of one INSERT found at start, cut into pieces of whole tuples if longer than max_statement"""
+    if max_statement and len(statement) > max_statement:
+        split = split_insert(statement, max_statement)
+        if split and len(split[1]) > 1:
+            head_end, pieces = split
+            return [(start + piece_start, start + piece_end, start, start + head_end)
+                    for piece_start, piece_end in pieces]
+    return [(start, start + len(statement))]
+
+
+def group_inserts_by_table(input_file, payload_digests=None, spool_dir=None, max_statement=None):
+    """Return {table_name: [(start, end), ...]} for all INSERTs, in dump order.
+
+    If payload_digests is a dict, it is filled with a hash of each table's
+    INSERT statements, computed in the same pass. With spool_dir, each
+    table's INSERT statements are copied to their own file there, and the
+    ranges are offsets in that file; this is how a compressed dump, which
+    can't be read at random, is split between workers. With max_statement,
+    INSERTs longer than that many bytes are cut into pieces of whole
+    tuples, given as (start, end, head_start, head_end) ranges that
+    read_range() turns back into INSERTs.
+    """
+    table_ranges = {}
+    hashers = {}
+    spool_sizes = {}
+    spool = spool_table = None
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+    try:
+        with open_dump(input_file) as dump:
+            for start, end, statement in iter_raw_statements(dump):
+                # The table name is always within the first few hundred bytes
+                head = statement[:512].decode('utf-8', errors='ignore')
+                if not is_insert(head):
+                    continue
+                table_name = insert_table_name(head)
+                if not table_name:
+                    continue
+                if spool_dir:
+                    if table_name != spool_table:
+                        if spool:
+                            spool.close()
+                        mode = 'ab' if table_name in spool_sizes else 'wb'
+                        spool = open(spooled_dump_path(spool_dir, table_name), mode)
+                        spool_table = table_name
+                    spool.write(statement)
+                    start = spool_sizes.get(table_name, 0)
+                    end = spool_sizes[table_name] = start + len(statement)
+                table_ranges.setdefault(table_name, []).extend(insert_ranges(statement, start, max_statement))
+                if payload_digests is not None:
+                    hashers.setdefault(table_name, payload_hasher()).update(statement)
+    finally:
+        if spool:
+            spool.close()
+    if payload_digests is not None:
+        payload_digests.update((table_name, hasher.hexdigest()) for table_name, hasher in hashers.items())
+    return table_ranges
+
+
+def indexed_inserts_by_table(input_file, index, table_names, payload_digests=None, max_statement=None):
+    """group_inserts_by_table() for table_names only, reading just their INSERTs through a DumpIndex"""
+    table_names = [name for name in table_names if index.tables[name]['inserts']]
+    # In the order of their first INSERT, as group_inserts_by_table() finds them
+    table_names.sort(key=lambda name: index.tables[name]['inserts'][0][0])
+    table_ranges = {}
+    with map_dump(input_file) as dump:
+        for table_name in table_names:
+            ranges = table_ranges[table_name] = []
+            hasher = payload_hasher() if payload_digests is not None else None
+            for start, end in index.tables[table_name]['inserts']:
+                if hasher is None and not (max_statement and end - start > max_statement):
+                    ranges.append((start, end))
+                    continue
+                statement = dump[start:end]
+                ranges.extend(insert_ranges(statement, start, max_statement))
+                if hasher:
+                    hasher.update(statement)
+            if hasher:
+                payload_digests[table_name] = hasher.hexdigest()
+    return table_ranges
+
+
+def convert_schema(input_file, schema_file, index=None, table_names=None):
+    """Run step 2 on the dump, or with an index only on the DDL of table_names"""
+    if index is None:
+        schema_step.convert_mysql_to_postgresql(input_file, schema_file)
+        return
+    with map_dump(input_file) as dump:
+        schema_step.write_schema(*index.ddl_statements(dump, table_names), schema_file)
+
+
+def ranges_size(ranges):
+    return sum(byte_range[1] - byte_range[0] for byte_range in ranges)
+
+
+def partition_ranges(ranges, partition_size):
+    """Split a table's ranges into runs of about partition_size bytes, in dump order"""
+    partitions = [[]]
+    size = 0
+    for byte_range in ranges:
+        if size >= partition_size:
+            partitions.append([])
+            size = 0
+        partitions[-1].append(byte_range)
+        size += byte_range[1] - byte_range[0]
+    return partitions
+
+
+def partition_job(table_name, partition):
+    """Name of one partition of a table in the checkpoint journal"""
+    return f"{table_name}#{partition}"
+
+
+def join_partitions(partition_files, part_file, checkpoint=None):
+    """Concatenate the part files of a table's partitions, in order, into its part file"""
+    output_path = partial_path(part_file) if checkpoint else part_file
+    with open(output_path, 'wb') as f:
+        for path in partition_files:
+            ByteRanges(path, [(0, os.path.getsize(path))]).copy_to(f)
+    if checkpoint:
+        commit_file(output_path, part_file)
+    for path in partition_files:
+        os.remove(path)
+
+
+def convert_tables_parallel(input_file, f, column_types, output_format, jobs, work_dir, sequences, copy_dir=None,
+                            deduplicator=None, checkpoint=None, cache=None, stats=None,
+                            partition_size=PARTITION_SIZE, index=None, table_names=None):
+    """Convert tables on a process pool and merge their output in dump order.
+
+    Each table is converted by one worker into its own part file. Tables
+    larger than partition_size bytes are split into partitions of about
+    that size, each converted by a worker of its own, so that one huge
+    table still keeps every worker busy; INSERTs longer than
+    MAX_STATEMENT_SIZE are cut between tuples for this. The partitions'
+    output is joined back in order into the table's part file. The
+    largest tables are submitted first so they don't end up running alone
+    at the end. Part files are appended to f in the order their tables
+    first appear in the dump, so the result doesn't depend on scheduling.
+    With copy_dir, the part files are the final .copy files and only the
+    \\copy commands go into f. Duplicates dropped by the workers are added
+    to deduplicator.dropped; as each worker only sees its own rows, tables
+    aren't partitioned with a deduplicator. With a checkpoint, each
+    finished table and partition is journaled and its part file kept until
+    the whole run completes, so a rerun only converts what wasn't
+    finished. With a TableCache, tables whose definition and rows are
+    unchanged since they were cached are copied from the cache instead of
+    converted. The workers' timers and counters are merged into stats, and
+    the highest values of serial columns into sequences; both are
+    journaled and cached along with each table. A compressed dump is first
+    split into one file of INSERT statements per table in work_dir. With a
+    DumpIndex, only table_names are converted, and only their INSERTs are
+    read.
+    """
+    stats = stats or Instrumentation()
+    if deduplicator:
+        partition_size = None
+    payload_digests = {} if cache else None
+    spool_dir = os.path.join(work_dir, 'dump') if compression_of(input_file) else None
+    max_statement = min(partition_size, MAX_STATEMENT_SIZE) if partition_size else None
+    if index is not None:
+        table_ranges = indexed_inserts_by_table(input_file, index, table_names, payload_digests, max_statement)
+    else:
+        table_ranges = group_inserts_by_table(input_file, payload_digests, spool_dir, max_statement)
+    os.makedirs(work_dir, exist_ok=True)
+    if copy_dir:
+        os.makedirs(copy_dir, exist_ok=True)
+
+    def part_file(table_name):
+        if copy_dir:
+            return copy_file_path(copy_dir, table_name)
+        return os.path.join(work_dir, f"{table_name}.sql")
+
+    def partition_file(table_name, partition):
+        return os.path.join(work_dir, f"{table_name}.{partition}.part")
+
+    table_sizes = {table_name: ranges_size(ranges) for table_name, ranges in table_ranges.items()}
+    by_size = sorted(table_ranges, key=table_sizes.get, reverse=True)
+    results = {}
+    for table_name in by_size:
+        if checkpoint and checkpoint.is_done('convert', table_name) and os.path.exists(part_file(table_name)):
+            done = checkpoint.latest('convert', table_name)
+            results[table_name] = (table_name, done['columns'], done['row_count'], done['dropped'])
+            sequences.update(table_name, done.get('sequence_values', {}))
+            print(f"Skipping table {table_name}, converted in an earlier run")
+
+    cache_keys = {}
+    if cache:
+        for table_name in by_size:
+            if table_name in results:
+                continue
+            cache_keys[table_name] = cache.key(table_name, payload_digests[table_name])
+            cached = cache.fetch(cache_keys[table_name], part_file(table_name))
+            if cached:
+                results[table_name] = (table_name, cached['columns'], cached['row_count'], cached['dropped'])
+                sequences.update(table_name, cached['sequence_values'])
+                print(f"Reusing cached output for unchanged table {table_name}")
+
+    progress = Progress(f"Converting {input_file}", sum(table_sizes.values()))
+    done_bytes = 0
+    for table_name, (_, _, row_count, _) in results.items():
+        stats.count('rows', row_count, table_name)
+        done_bytes += table_sizes[table_name]
+
+    # {table_name: [result or None for each partition]} of partitioned tables
+    partitions = {}
+    errors = []
+
+    def join_table(table_name):
+        """Join the part files of a table whose partitions are all done and return its result"""
+        with stats.timer('join', table_name):
+            join_partitions(
+                [partition_file(table_name, n) for n in range(len(partitions[table_name]))],
+                part_file(table_name), checkpoint
+            )
+        columns = next((done[1] for done in partitions[table_name] if done[1]), None)
+        return table_name, columns, sum(done[2] for done in partitions[table_name]), 0
+
+    def finish_table(result):
+        table_name, columns, row_count, dropped = result[:4]
+        results[table_name] = result[:4]
+        sequence_values = sequences.values.get(table_name, {})
+        if checkpoint:
+            checkpoint.record('convert', table_name, done=True, columns=columns,
+                              row_count=row_count, dropped=dropped, sequence_values=sequence_values)
+        if cache:
+            cache.store(cache_keys[table_name], part_file(table_name), columns=columns,
+                        row_count=row_count, dropped=dropped, sequence_values=sequence_values)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=stop_profiling) as executor:
+        futures = {}
+        for table_name in by_size:
+            if table_name in results:
+                continue
+            table_input = table_dump(input_file, spool_dir, table_name)
+            if not partition_size or table_sizes[table_name] <= partition_size:
+                future = executor.submit(
+                    convert_table, table_input, table_name, table_ranges[table_name],
+                    column_types, output_format, part_file(table_name), sequences, deduplicator, checkpoint
+                )
+                futures[future] = (table_name, None, table_sizes[table_name])
+                continue
+            table_partitions = partition_ranges(table_ranges[table_name], partition_size)
+            partitions[table_name] = [None] * len(table_partitions)
+            for n, ranges in enumerate(table_partitions):
+                job = partition_job(table_name, n)
+                if checkpoint and checkpoint.is_done('convert', job) and os.path.exists(partition_file(table_name, n)):
+                    done = checkpoint.latest('convert', job)
+                    partitions[table_name][n] = (table_name, done['columns'], done['row_count'], 0, None)
+                    sequences.update(table_name, done.get('sequence_values', {}))
+                    done_bytes += ranges_size(ranges)
+                    continue
+                future = executor.submit(
+                    convert_table, table_input, table_name, ranges, column_types, output_format,
+                    partition_file(table_name, n), sequences, None, checkpoint, n
+                )
+                futures[future] = (table_name, n, ranges_size(ranges))
+
+        # An earlier run can have finished every partition of a table and stopped before joining them
+        for table_name, table_partitions in partitions.items():
+            if None not in table_partitions:
+                finish_table(join_table(table_name))
+
+        # Journal each table as soon as it is done, so one failing table doesn't lose the others
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            table_name, partition, size = futures[future]
+            stats.merge(result[4])
+            sequences.update(table_name, result[5])
+            done_bytes += size
+            progress.update(done_bytes, result[2])
+            if partition is not None:
+                if checkpoint:
+                    checkpoint.record('convert', partition_job(table_name, partition), done=True,
+                                      columns=result[1], row_count=result[2], sequence_values=result[5])
+                partitions[table_name][partition] = result
+                if None in partitions[table_name]:
+                    continue
+                # The last partition of the table is done; join them into the table's output
+                result = join_table(table_name)
+            finish_table(result)
+    if cache:
+        # Also applies a smaller size limit when every table was a hit
+        cache.evict()
+    if errors:
+        raise errors[0]
+    progress.finish()
+
+    row_counts = {}
+    copy_columns = {}
+    for table_name in table_ranges:
+        _, columns, row_count, dropped = results[table_name]
+        row_counts[table_name] = row_count
+        if dropped:
+            deduplicator.dropped[table_name] = dropped
+        if copy_dir:
+            if columns:
+                copy_columns[table_name] = columns
+            continue
+        with stats.timer('merge', table_name):
+            with open(part_file(table_name), 'r', encoding='utf-8', errors='surrogateescape') as part:
+                shutil.copyfileobj(part, f)
+        if not checkpoint:
+            os.remove(part_file(table_name))
+
+    if copy_dir:
+        write_copy_commands(f, copy_dir, copy_columns)
+    return row_counts
+
+
+def make_deduplicator(schema, dedup, memory_budget):
+    """Return a RowDeduplicator for a --dedup mode, or None for 'none'"""
+    if dedup == 'none':
+        return None
+    key_columns = {}
+    if dedup == 'key':
+        key_columns = {name: table.primary_key for name, table in schema.tables.items()}
+    return RowDeduplicator(key_columns, memory_budget=memory_budget)
+
+
+def convert_dump(input_file, output_file, schema_file, excel_file=None,
+                 output_format='insert', copy_dir=None, jobs=1, dedup='none',
+                 dedup_memory=DEFAULT_MEMORY_BUDGET, resume=True, cache_dir=None,
+                 cache_size=DEFAULT_CACHE_SIZE, stats=None, partition_size=PARTITION_SIZE, pipeline=False,
+                 queue_size=PIPELINE_QUEUE_SIZE, tables=None, exclude_tables=None):
+    """Convert a MySQL dump straight into the final PostgreSQL file.
+
+    Rows are streamed from the dump parser into the output one statement
+    at a time; no intermediate Excel file is involved unless excel_file is
+    given as a debug export. output_format is 'insert' for multi-row INSERT
+    statements or 'copy' for COPY ... FROM stdin blocks. With copy_dir, the
+    data of each table goes to its own .copy file instead, and the final
+    file loads those with psql's \\copy. With jobs > 1, tables are
+    converted in parallel worker processes, and tables larger than
+    partition_size bytes are split between several of them, unless rows
+    are deduplicated. INSERTs cut between tuples for this are written as
+    several statements, with the same rows in the same order. dedup drops
+    repeated rows, keyed on the whole 'row' or on the primary 'key' from
+    the schema. dedup_memory is the memory budget in bytes for the seen
+    keys, shared by all workers; past it they move to an on-disk index.
+
+    With cache_dir, each table's output is kept in a cache of up to
+    cache_size bytes, and tables whose definition and INSERT statements
+    haven't changed since are copied from there on the next run. Tables
+    are then converted one by one as with jobs > 1.
+
+    Progress is journaled to a checkpoint file next to output_file. If a
+    run is interrupted, the next one with the same dump and options skips
+    the finished stages and tables and continues from the input offset
+    reached, unless resume is False. A single-process run with dedup or
+    excel_file can't restore its in-memory state, so it always starts
+    over.
+
+    A dump ending in .gz or .zst is decompressed as it is read, and an
+    output_file ending in .gz or .zst is compressed as it is written; a
+    single-process run into a compressed file starts over if interrupted.
+
+    With pipeline, a single-process run reads, splits, parses, formats and
+    writes in threads connected by queues of up to queue_size items; see
+    convert_statements().
+
+    Given tables or exclude_tables, only those tables, or all but those,
+    are converted. Their statements are found through an index of the
+    dump, built on first use and saved next to it, and read from the
+    memory-mapped dump, which has to be uncompressed. Tables are then
+    converted one by one as with jobs > 1.
+
+    Stages, and time, rows and bytes per table, are recorded in stats.
+    """
+    stats = stats or Instrumentation()
+    index = table_names = None
+    if tables is not None or exclude_tables:
+        index = load_index(input_file)
+        table_names = index.select(tables, exclude_tables)
+    per_table = jobs > 1 or bool(cache_dir) or index is not None
+    if jobs == 1 or dedup != 'none':
+        partition_size = None
+    checkpoint = None
+    if per_table or not (excel_file or dedup != 'none'):
+        checkpoint = Checkpoint(
+            checkpoint_path(output_file),
+            input_fingerprint([input_file], output_format=output_format, copy_dir=copy_dir,
+                              parallel=per_table, dedup=dedup, partition_size=partition_size, tables=table_names),
+            resume=resume
+        )
+        if checkpoint.resumed:
+            print(f"Resuming from checkpoint {checkpoint.path}")
+
+    # The schema is small, so it still goes through step 2 and its file
+    if checkpoint and checkpoint.is_done('schema') and os.path.exists(schema_file):
+        print(f"Reusing schema file: {schema_file}")
+    else:
+        with stats.stage('schema'):
+            convert_schema(input_file, schema_file, index, table_names)
+        if checkpoint:
+            checkpoint.record('schema', done=True)
+    creates, pks, indexes, fks, _ = combine_step.extract_sections(schema_file)
+    schema = load_schema(schema_file)
+    column_types = schema.column_types()
+
+    deduplicator = make_deduplicator(schema, dedup, dedup_memory // jobs)
+    sequences = SequenceValues(schema)
+
+    if copy_dir:
+        output_format = 'copy-data'
+
+    # A single-process run picks up inside the output file it was writing
+    resume_from = None
+    statement_checkpoint = None if compression_of(output_file) else checkpoint
+    if statement_checkpoint and not per_table and os.path.exists(output_file):
+        resume_from = statement_checkpoint.latest('convert')
+
+    excel_rows = None
+    if resume_from:
+        output = open(output_file, 'r+', encoding='utf-8', errors='surrogateescape')
+    else:
+        output = open_output(output_file)
+    with output as f, stats.stage('convert'):
+        if not resume_from:
+            combine_step.write_preamble(f, creates)
+
+        if per_table:
+            work_dir = os.path.splitext(output_file)[0] + '_parts'
+            cache = None
+            if cache_dir:
+                cache = TableCache(cache_dir, schema, cache_size, output_format=output_format, dedup=dedup,
+                                   partition_size=partition_size)
+            convert_tables_parallel(
+                input_file, f, column_types, output_format, jobs, work_dir, sequences, copy_dir, deduplicator,
+                checkpoint, cache, stats, partition_size, index, table_names
+            )
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            _, excel_rows = convert_statements(
+                input_file, f, column_types, output_format, copy_dir, collect_rows=bool(excel_file),
+                deduplicator=deduplicator, checkpoint=statement_checkpoint, resume_from=resume_from, stats=stats,
+                sequences=sequences, pipeline=pipeline, queue_size=queue_size
+            )
+
+        # Sequences continue after the values seen while converting, without scanning the tables
+        combine_step.write_postamble(f, pks, fks, indexes, sequences.statements())
+    if checkpoint:
+        checkpoint.remove()
+
+    stats.report()
+    if deduplicator:
+        deduplicator.close()
+        deduplicator.report()
+
+    if excel_rows is not None:
+        with excel_rows, stats.stage('excel'):
+            write_excel_export(excel_rows, excel_file)
+
+
+def load_table(input_file, table_name, ranges, column_types, dsn, batch_size, commit_every, sequences,
+               deduplicator=None):
+    """Load every INSERT of one table straight into PostgreSQL.
+
+    Runs in a worker process, which keeps its connection for the next
+    table. Returns (table_name, row_count, duplicates_dropped, stats,
+    sequence_values), where stats is the to_dict() of the table's
+    Instrumentation and sequence_values the highest value of each serial
+    column of the table.
+    """
+    import pg_loader
+    stats = Instrumentation()
+    loader = pg_loader.TableLoader(
+        pg_loader.connect(dsn), table_name, column_types.get(table_name, {}), batch_size, commit_every
+    )
+    with map_dump(input_file) as dump:
+        for byte_range in ranges:
+            start, end = byte_range[:2]
+            with stats.timer('parse', table_name):
+                converted = convert_insert(
+                    read_range(dump, byte_range).decode('utf-8', errors='surrogateescape'), column_types
+                )
+            if not converted:
+                continue
+            _, columns, rows = converted
+            if deduplicator:
+                with stats.timer('dedup', table_name):
+                    rows = deduplicator.filter_rows(table_name, columns, rows)
+            sequences.observe(table_name, columns, rows)
+            with stats.timer('copy', table_name):
+                loader.add_rows(columns, rows)
+            stats.count('bytes', end - start, table_name)
+    with stats.timer('copy', table_name):
+        row_count, _ = loader.finish()
+    stats.count('rows', row_count, table_name)
+    dropped = 0
+    if deduplicator:
+        deduplicator.close()
+        dropped = deduplicator.dropped.get(table_name, 0)
+    return table_name, row_count, dropped, stats.to_dict(), sequences.values.get(table_name, {})
+
+
+def load_dump(input_file, dsn, schema_file, jobs=1, batch_size=None, commit_every=None,
+              dedup='none', dedup_memory=DEFAULT_MEMORY_BUDGET, stats=None, partition_size=PARTITION_SIZE,
+              tables=None, exclude_tables=None):
+    """Convert a MySQL dump and load it into a live PostgreSQL database.
+
+    Tables are created first, then each table's rows are streamed in with
+    COPY. With jobs > 1, up to that many tables are loaded at once, each
+    worker process holding its own connection, and tables larger than
+    partition_size bytes are split between several workers that COPY into
+    them side by side, unless rows are deduplicated. Once all data is in, keys,
+    indexes and foreign keys are built by the same number of workers, and
+    sequences are set from the highest values loaded into their columns.
+    Each of these stages is recorded in stats. A
+    compressed dump is split into one temporary file per table first.
+    Given tables or exclude_tables, only those tables, or all but those,
+    are loaded, read through an index of the dump as in convert_dump().
+    """
+    import pg_loader
+    import post_load
+    stats = stats or Instrumentation()
+    batch_size = batch_size or pg_loader.DEFAULT_BATCH_SIZE
+    commit_every = commit_every or pg_loader.DEFAULT_COMMIT_EVERY
+
+    index = table_names = None
+    if tables is not None or exclude_tables:
+        index = load_index(input_file)
+        table_names = index.select(tables, exclude_tables)
+    with stats.stage('schema'):
+        convert_schema(input_file, schema_file, index, table_names)
+    creates = combine_step.extract_sections(schema_file)[0]
+    schema = load_schema(schema_file)
+    column_types = schema.column_types()
+    deduplicator = make_deduplicator(schema, dedup, dedup_memory // jobs)
+    sequences = SequenceValues(schema)
+
+    with stats.stage('create'), pg_loader.open_connection(dsn) as connection:
+        pg_loader.execute_statements(connection, creates)
+
+    if jobs == 1 or deduplicator:
+        partition_size = None
+    max_statement = min(partition_size, MAX_STATEMENT_SIZE) if partition_size else None
+    spool_dir = tempfile.mkdtemp(prefix='mysql2pgsql_dump_') if compression_of(input_file) else None
+    if index is not None:
+        table_ranges = indexed_inserts_by_table(input_file, index, table_names, max_statement=max_statement)
+    else:
+        table_ranges = group_inserts_by_table(input_file, spool_dir=spool_dir, max_statement=max_statement)
+    table_sizes = {table_name: ranges_size(ranges) for table_name, ranges in table_ranges.items()}
+    by_size = sorted(table_ranges, key=table_sizes.get, reverse=True)
+    # (arguments of load_table(), input bytes) for each table or partition of one
+    work = []
+    for table_name in by_size:
+        table_partitions = [table_ranges[table_name]]
+        if partition_size and table_sizes[table_name] > partition_size:
+            table_partitions = partition_ranges(table_ranges[table_name], partition_size)
+        for ranges in table_partitions:
+            arguments = (table_dump(input_file, spool_dir, table_name), table_name, ranges, column_types, dsn,
+                         batch_size, commit_every, sequences, deduplicator)
+            work.append((arguments, ranges_size(ranges)))
+    progress = Progress(f"Loading {input_file}", sum(table_sizes.values()))
+    done_bytes = 0
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=stop_profiling) if jobs > 1 else None
+    futures = {}
+    try:
+        with stats.stage('load'):
+            if executor:
+                futures = {executor.submit(load_table, *arguments): size for arguments, size in work}
+                results = ((future.result(), futures[future]) for future in as_completed(futures))
+            else:
+                results = ((load_table(*arguments), size) for arguments, size in work)
+            for (table_name, row_count, dropped, table_stats, sequence_values), size in results:
+                stats.merge(table_stats)
+                sequences.update(table_name, sequence_values)
+                done_bytes += size
+                progress.update(done_bytes, row_count)
+                if dropped:
+                    print(f"Dropped {dropped} duplicate rows from table {table_name}")
+    finally:
+        if executor:
+            # After a failure, tables that haven't started yet are dropped instead of loaded
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+        # The connection load_table() kept open in this process with --jobs 1
+        pg_loader.close_connections()
+        if spool_dir:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+    progress.finish()
+    stats.report()
+
+    with stats.stage('post_load'):
+        post_load.run_post_load(dsn, schema, jobs, table_order=by_size)
+    with stats.stage('sequences'), pg_loader.open_connection(dsn) as connection:
+        pg_loader.execute_statements(connection, sequences.statements())
+
+
+def write_excel_export(spool, excel_file):
+    """Write the spooled rows to an Excel file for review"""
+    excel_step = importlib.import_module('1_convert_to_xlsx')
+    excel_step.write_excel(excel_step.spooled_tables(spool), excel_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a MySQL dump to PostgreSQL in a single pass, without Excel intermediates"
+    )
+    parser.add_argument('--input', default=INPUT_SQL_FILE,
+                        help="MySQL dump to convert, optionally compressed as .gz or .zst")
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help="final PostgreSQL file, compressed if its name ends in .gz or .zst")
+    parser.add_argument('--schema', default=SCHEMA_FILE, help="converted schema file")
+    parser.add_argument('--format', choices=('insert', 'copy'), default='insert',
+                        help="write data as multi-row INSERT statements or COPY FROM stdin blocks")
+    parser.add_argument('--copy-dir', metavar='DIR',
+                        help="write each table's data to DIR/<table>.copy and load it with \\copy")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help="convert tables in N parallel worker processes")
+    parser.add_argument('--partition-size', type=int, default=PARTITION_SIZE // 2**20, metavar='MB',
+                        help="with --jobs, split the INSERTs of larger tables between several workers")
+    parser.add_argument('--tables', metavar='NAMES',
+                        help="only convert these comma-separated tables, read through an index of the dump")
+    parser.add_argument('--exclude-tables', metavar='NAMES',
+                        help="convert every table but these comma-separated ones, read through an index of the dump")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="read, parse, format and write in separate threads and report where the time goes")
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE, metavar='N',
+                        help="items each queue between two --pipeline stages holds")
+    parser.add_argument('--dedup', choices=('none', 'row', 'key'), default='none',
+                        help="drop repeated rows, comparing whole rows or primary keys")
+    parser.add_argument('--dedup-memory', type=int, default=DEFAULT_MEMORY_BUDGET // 2**20, metavar='MB',
+                        help="memory for seen keys before they move to an on-disk index")
+    parser.add_argument('--load', metavar='DSN',
+                        help="load into this PostgreSQL database with COPY instead of writing --output")
+    parser.add_argument('--batch-size', type=int, metavar='ROWS', help="rows per COPY batch with --load")
+    parser.add_argument('--commit-every', type=int, metavar='ROWS',
+                        help="rows per transaction and table with --load")
+    parser.add_argument('--excel', metavar='FILE', help="also export the extracted rows to an Excel file for review")
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help="reuse the converted output of tables that didn't change since an earlier run")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // 2**20, metavar='MB',
+                        help="size of --cache-dir before the least recently used tables are dropped")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="start over instead of continuing an interrupted conversion")
+    parser.add_argument('--report', metavar='FILE',
+                        help="JSON run report to write (default: next to --output, as *.report.json)")
+    parser.add_argument('--profile', metavar='DIR', help="profile each stage with cProfile into DIR/<stage>.prof")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="record the peak memory of each stage with tracemalloc (slows the run down)")
+    args = parser.parse_args()
+    args.input = find_dump(args.input)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.partition_size < 1:
+        parser.error("--partition-size must be at least 1")
+    tables = [name.strip() for name in args.tables.split(',')] if args.tables else None
+    exclude_tables = [name.strip() for name in args.exclude_tables.split(',')] if args.exclude_tables else None
+    if (tables or exclude_tables) and compression_of(args.input):
+        parser.error("--tables and --exclude-tables need an uncompressed dump, which can be read at random")
+    if (tables or exclude_tables) and (args.excel or args.pipeline):
+        parser.error("--tables and --exclude-tables can't be combined with --excel or --pipeline")
+    if tables or exclude_tables:
+        try:
+            load_index(args.input).select(tables, exclude_tables)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if args.pipeline and (args.jobs > 1 or args.cache_dir or args.load):
+        parser.error("--pipeline can only be used with --jobs 1 and without --cache-dir or --load")
+    if args.excel and (args.jobs > 1 or args.cache_dir):
+        parser.error("--excel can only be used with --jobs 1 and without --cache-dir")
+    if args.load and (args.excel or args.copy_dir or args.cache_dir):
+        parser.error("--load can't be combined with --excel, --copy-dir or --cache-dir")
+
+    stats = Instrumentation(args.profile, args.trace_memory)
+    report_file = args.report or report_path(args.output)
+    if args.load:
+        load_dump(args.input, args.load, args.schema, jobs=args.jobs, batch_size=args.batch_size,
+                  commit_every=args.commit_every, dedup=args.dedup, dedup_memory=args.dedup_memory * 2**20,
+                  stats=stats, partition_size=args.partition_size * 2**20, tables=tables,
+                  exclude_tables=exclude_tables)
+        stats.save_report(report_file, input_file=args.input, load=True, jobs=args.jobs)
+        print("\nLoad completed!")
+        return
+
+    convert_dump(args.input, args.output, args.schema, excel_file=args.excel,
+                 output_format=args.format, copy_dir=args.copy_dir, jobs=args.jobs,
+                 dedup=args.dedup, dedup_memory=args.dedup_memory * 2**20, resume=not args.no_resume,
+                 cache_dir=args.cache_dir, cache_size=args.cache_size * 2**20, stats=stats,
+                 partition_size=args.partition_size * 2**20, pipeline=args.pipeline, queue_size=args.queue_size,
+                 tables=tables, exclude_tables=exclude_tables)
+    stats.save_report(report_file, input_file=args.input, output_file=args.output,
+                      output_format=args.format, jobs=args.jobs, pipeline=args.pipeline)
+    print(f"\nConversion completed! File saved as {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import time
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+from pg_writer import format_copy_rows
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_COMMIT_EVERY = 1000000
+
+# One connection per DSN and process, reused for every table the process loads.
+# Keyed on the pid too: forked workers must not share the parent's socket.
+_connections = {}
+
+
+def open_connection(dsn):
+    """Open a new connection to dsn"""
+    if psycopg is None:
+        raise RuntimeError("Loading into PostgreSQL needs psycopg: pip install psycopg")
+    return psycopg.connect(dsn)
+
+
+def connect(dsn):
+    """Return this process's connection to dsn, opening it on first use"""
+    key = (dsn, os.getpid())
+    connection = _connections.get(key)
+    if connection is None or connection.closed:
+        connection = _connections[key] = open_connection(dsn)
+    return connection
+
+
+def close_connections():
+    """Close the connections connect() opened in this process"""
+    for key in [key for key in _connections if key[1] == os.getpid()]:
+        _connections.pop(key).close()
+
+
+def execute_statements(connection, statements):
+    """Run SQL statements one by one and commit them together"""
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    connection.commit()
+
+
+class TableLoader:
+    """Stream the rows of one table into PostgreSQL with COPY.
+
+    Rows are buffered and sent batch_size at a time as one COPY in text
+    format. The transaction is committed every commit_every rows, so a
+    failure only loses the rows since the last commit and the server
+    doesn't have to hold one huge transaction.
+    """
+
+    def __init__(self, connection, table_name, column_types,
+                 batch_size=DEFAULT_BATCH_SIZE, commit_every=DEFAULT_COMMIT_EVERY):
+        self.connection = connection
+        self.table_name = table_name
+        self.column_types = column_types
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.row_count = 0
+        self._columns = None
+        self._buffer = []
+        self._uncommitted = 0
+        self._started = time.perf_counter()
+
+    def add_rows(self, columns, rows):
+        """Queue a batch of parsed rows, sending full COPY batches as they fill"""
+        if columns != self._columns:
+            self._send()
+            self._columns = columns
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.batch_size:
+            self._send(self.batch_size)
+
+    def _send(self, count=None):
+        rows = self._buffer[:count] if count else self._buffer
+        if not rows:
+            return
+        self._buffer = self._buffer[len(rows):]
+        types = [self.column_types.get(col) for col in self._columns]
+        with self.connection.cursor() as cursor:
+            with cursor.copy(f"COPY {self.table_name} ({', '.join(self._columns)}) FROM STDIN") as copy:
+                copy.write(format_copy_rows(rows, types))
+        self.row_count += len(rows)
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.commit_every:
+            self.connection.commit()
+            self._uncommitted = 0
+
+    def finish(self):
+        """Send what is left, commit, and return (row_count, seconds)"""
+        self._send()
+        self.connection.commit()
+        return self.row_count, time.perf_counter() - self._started
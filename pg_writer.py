@@ -0,0 +1,192 @@
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+_BOOLEAN_TYPE = re.compile(r'\b(bool|boolean|tinyint\(1\)|bit\(1\))\b', re.IGNORECASE)
+_BYTEA_TYPE = re.compile(r'\s*bytea\b', re.IGNORECASE)
+# Column types whose values carry a date, which MySQL allows to be zero
+_DATE_TYPE = re.compile(r'\s*(date|datetime|timestamp)\b', re.IGNORECASE)
+# Characters that must be backslash-escaped in COPY text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+COPY_NULL = '\\N'
+TRUE_STRINGS = ('true', 't', 'yes', 'y', '1')
+FALSE_STRINGS = ('false', 'f', 'no', 'n', '0')
+
+
+def is_boolean_type(col_type):
+    """Check if the column type should be considered boolean."""
+    if not col_type:
+        return False
+    # Matches any occurrence of bool, boolean, tinyint(1), or bit(1)
+    return bool(_BOOLEAN_TYPE.search(col_type))
+
+
+def column_kind(column_type):
+    """How a column's values are converted: 'boolean', 'bytea', 'date', or None for as they are"""
+    if not column_type:
+        return None
+    if is_boolean_type(column_type):
+        return 'boolean'
+    if _BYTEA_TYPE.match(column_type):
+        return 'bytea'
+    if _DATE_TYPE.match(column_type):
+        return 'date'
+    return None
+
+
+def is_zero_date(text):
+    """Check for a MySQL zero date, or a date with a zero year, month or day, which PostgreSQL rejects"""
+    return text[:4] == '0000' or text[5:7] == '00' or text[8:10] == '00'
+
+
+def _bytea_hex(value):
+    """Hex digits of a value bound for a bytea column"""
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, str):
+        # A plain string literal in a blob column; undo the dump reader's decoding
+        return value.encode('utf-8', errors='surrogateescape').hex()
+    return str(value).encode('ascii').hex()
+
+
+def _sql_value(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, Decimal)):
+        return str(value)
+    if isinstance(value, bytes):
+        # bytea hex input format
+        return "'\\x" + value.hex() + "'"
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _sql_boolean(value):
+    # Convert to 'true' or 'false' if recognized as boolean
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, Decimal)):
+        return 'true' if value else 'false'
+    if isinstance(value, bytes):
+        return 'true' if any(value) else 'false'
+    val_str = value.lower().strip()
+    if val_str in TRUE_STRINGS:
+        return 'true'
+    elif val_str in FALSE_STRINGS:
+        return 'false'
+    return 'NULL'
+
+
+def _sql_bytea(value):
+    if value is None:
+        return 'NULL'
+    return "'\\x" + _bytea_hex(value) + "'"
+
+
+def _sql_date(value):
+    if isinstance(value, str):
+        return 'NULL' if is_zero_date(value) else "'" + value.replace("'", "''") + "'"
+    # MySQL also takes the number 0 for a zero date
+    return 'NULL' if value == 0 else _sql_value(value)
+
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, (int, Decimal)):
+        return str(value)
+    if isinstance(value, bytes):
+        # bytea hex input, with the backslash itself escaped for COPY
+        return '\\\\x' + value.hex()
+    return copy_escape(value)
+
+
+def _copy_boolean(value):
+    literal = _sql_boolean(value)
+    return COPY_NULL if literal == 'NULL' else literal
+
+
+def _copy_bytea(value):
+    if value is None:
+        return COPY_NULL
+    return '\\\\x' + _bytea_hex(value)
+
+
+def _copy_date(value):
+    if isinstance(value, str):
+        return COPY_NULL if is_zero_date(value) else copy_escape(value)
+    return COPY_NULL if value == 0 else _copy_value(value)
+
+
+_SQL_FORMATTERS = {None: _sql_value, 'boolean': _sql_boolean, 'bytea': _sql_bytea, 'date': _sql_date}
+_COPY_FORMATTERS = {None: _copy_value, 'boolean': _copy_boolean, 'bytea': _copy_bytea, 'date': _copy_date}
+
+
+@lru_cache(maxsize=None)
+def sql_formatter(column_type):
+    """Return the function that formats values of a column type as PostgreSQL literals.
+
+    The column type is looked at once here rather than for every value.
+    """
+    return _SQL_FORMATTERS[column_kind(column_type)]
+
+
+@lru_cache(maxsize=None)
+def copy_formatter(column_type):
+    """Return the function that formats values of a column type as COPY text fields"""
+    return _COPY_FORMATTERS[column_kind(column_type)]
+
+
+def format_sql_value(value, column_type=None):
+    """Format a value produced by insert_parser as a PostgreSQL literal"""
+    return sql_formatter(column_type)(value)
+
+
+def write_insert_statement(f, table_name, columns, rows, column_types):
+    """Write one multi-row INSERT statement for a batch of parsed rows"""
+    if not rows:
+        return
+    formatters = [sql_formatter(column_types.get(col)) for col in columns]
+    f.write(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES\n")
+    f.write(',\n'.join(
+        '(' + ', '.join([format_value(val) for format_value, val in zip(formatters, row)]) + ')'
+        for row in rows
+    ))
+    f.write(';\n\n')
+
+
+def copy_escape(text):
+    """Escape a string for a field in PostgreSQL COPY text format"""
+    return text.translate(_COPY_ESCAPES)
+
+
+def format_copy_value(value, column_type=None):
+    """Format a value produced by insert_parser as a COPY text field"""
+    return copy_formatter(column_type)(value)
+
+
+def copy_header(table_name, columns):
+    """Return the COPY command that starts a block of inline data"""
+    return f"COPY {table_name} ({', '.join(columns)}) FROM stdin;\n"
+
+
+def format_copy_rows(rows, types):
+    """Return rows as tab-separated COPY text lines, without header or terminator"""
+    formatters = [copy_formatter(col_type) for col_type in types]
+    return ''.join(
+        '\t'.join([format_value(val) for format_value, val in zip(formatters, row)]) + '\n'
+        for row in rows
+    )
+
+
+def write_copy_rows(f, rows, types):
+    """Write rows as tab-separated COPY text lines, without header or terminator"""
+    f.write(format_copy_rows(rows, types))
+
+
+def write_copy_block(f, table_name, columns, rows, column_types):
+    """Write one COPY ... FROM stdin block for a batch of parsed rows"""
+    if not rows:
+        return
+    f.write(copy_header(table_name, columns))
+    write_copy_rows(f, rows, [column_types.get(col) for col in columns])
+    f.write('\\.\n\n')
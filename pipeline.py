@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+
+# Items each queue between two stages holds before the stage feeding it has to wait
+PIPELINE_QUEUE_SIZE = 8
+# Seconds between checks for a failed stage while waiting on a queue
+_POLL_INTERVAL = 0.1
+# Put on a queue after a stage's last item
+_END = object()
+
+
+class PipelineAborted(Exception):
+    """Raised in a stage waiting on a queue when another stage has failed"""
+
+
+class IterableReader:
+    """File-like read() over an iterable of byte chunks, such as a read stage's output"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def read(self, size=-1):
+        # One chunk per call, whatever its size; b'' at the end
+        return next(self._chunks, b'')
+
+
+class _Channel:
+    """Bounded queue between two stages, recording how full it gets"""
+
+    def __init__(self, size, abort):
+        self.size = size
+        self._queue = queue.Queue(size)
+        self._abort = abort
+        self.puts = 0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        """Add item, waiting while the queue is full"""
+        depth = self._queue.qsize()
+        self.puts += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def get(self):
+        """Take the next item, waiting while the queue is empty"""
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                return self._queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+
+class _Stage:
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.inbox = None
+        self.outbox = None
+        self.items_in = 0
+        self.items_out = 0
+        self.seconds = 0.0
+        # Time spent waiting on an empty inbox, and on a full outbox
+        self.wait_seconds = 0.0
+        self.stall_seconds = 0.0
+
+
+class Pipeline:
+    """Run stages in their own threads, connected by bounded queues.
+
+    Each stage is a function from an iterator of its input items to an
+    iterable of output items, so a stage may drop, split or merge items
+    and keep state between them. The first stage is called without input
+    and the return value of the last one is only iterated, to drain it.
+    As a queue fills up the stage feeding it waits, so memory stays
+    bounded by queue_size items per queue. Threads only overlap where a
+    stage releases the GIL, as file I/O, zlib and zstandard do.
+
+    If a stage raises, the other stages stop at their next queue operation
+    and run() raises the error. Afterwards measurements() tells, per
+    stage, how long it was busy, how long it waited for input and how long
+    it stalled on a full queue, and how full its input queue was.
+    """
+
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stages = []
+
+    def add(self, name, function):
+        self.stages.append(_Stage(name, function))
+        return self
+
+    def run(self):
+        abort = threading.Event()
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.outbox = downstream.inbox = _Channel(self.queue_size, abort)
+        errors = []
+        threads = [
+            threading.Thread(target=self._run_stage, args=(stage, abort, errors), name=f"stage {stage.name}",
+                             daemon=True)
+            for stage in self.stages
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            abort.set()
+            for thread in threads:
+                thread.join()
+            raise
+        if errors:
+            raise errors[0]
+
+    def _run_stage(self, stage, abort, errors):
+        started = time.perf_counter()
+        try:
+            if stage.inbox is None:
+                outputs = stage.function()
+            else:
+                outputs = stage.function(self._receive(stage))
+            for item in outputs or ():
+                if stage.outbox is not None:
+                    self._send(stage, item)
+                stage.items_out += 1
+            if stage.outbox is not None:
+                self._send(stage, _END)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            stage.seconds = time.perf_counter() - started
+
+    def _receive(self, stage):
+        while True:
+            started = time.perf_counter()
+            item = stage.inbox.get()
+            stage.wait_seconds += time.perf_counter() - started
+            if item is _END:
+                return
+            stage.items_in += 1
+            yield item
+
+    def _send(self, stage, item):
+        started = time.perf_counter()
+        stage.outbox.put(item)
+        stage.stall_seconds += time.perf_counter() - started
+
+    def measurements(self):
+        """{stage: {'items_in', 'items_out', 'seconds', 'busy_seconds', 'wait_seconds', 'stall_seconds', ...}}
+
+        Stages after the first also have the size of their input queue
+        and its mean and max depth, sampled whenever an item was added.
+        """
+        measurements = {}
+        for stage in self.stages:
+            measurement = {
+                'items_in': stage.items_in,
+                'items_out': stage.items_out,
+                'seconds': stage.seconds,
+                'busy_seconds': stage.seconds - stage.wait_seconds - stage.stall_seconds,
+                'wait_seconds': stage.wait_seconds,
+                'stall_seconds': stage.stall_seconds,
+            }
+            inbox = stage.inbox
+            if inbox is not None:
+                measurement['queue_size'] = inbox.size
+                measurement['mean_queue_depth'] = inbox.depth_total / inbox.puts if inbox.puts else 0.0
+                measurement['max_queue_depth'] = inbox.max_depth
+            measurements[stage.name] = measurement
+        return measurements
@@ -0,0 +1,114 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pg_loader
+
+
+def key_statements(table):
+    """Primary key and secondary index statements of one table"""
+    statements = []
+    if table.primary_key:
+        statements.append(f"ALTER TABLE {table.name} ADD PRIMARY KEY ({', '.join(table.primary_key)})")
+    for index in table.indexes:
+        unique = 'UNIQUE ' if index.unique else ''
+        statements.append(f"CREATE {unique}INDEX {index.name} ON {table.name} ({', '.join(index.columns)})")
+    return statements
+
+
+def foreign_key_names(table):
+    """Constraint names for a table's foreign keys, as PostgreSQL would pick them"""
+    names = []
+    for fk in table.foreign_keys:
+        name = f"{table.name}_{'_'.join(fk.columns)}_fkey"[:63]
+        if name in names:
+            name = f"{name[:60]}_{len(names)}"
+        names.append(name)
+    return names
+
+
+def foreign_key_dependencies(schema):
+    """Return {table_name: tables whose keys must exist before its foreign keys are added}.
+
+    A foreign key needs the unique key it references, and adding it
+    conflicts with index builds on its own table, so a table waits for
+    itself and every table it references.
+    """
+    return {
+        name: {name} | {fk.ref_table for fk in table.foreign_keys if fk.ref_table in schema.tables}
+        for name, table in schema.tables.items()
+        if table.foreign_keys
+    }
+
+
+def build_keys(dsn, table):
+    """Build a table's primary key and indexes on a connection of its own"""
+    started = time.perf_counter()
+    statements = key_statements(table)
+    if statements:
+        with pg_loader.open_connection(dsn) as connection:
+            pg_loader.execute_statements(connection, statements)
+    return time.perf_counter() - started
+
+
+def build_foreign_keys(dsn, table):
+    """Add a table's foreign keys as NOT VALID, then validate them.
+
+    Adding a NOT VALID constraint only takes a brief lock; the scan of
+    existing rows happens in VALIDATE, which doesn't block other tables.
+    """
+    started = time.perf_counter()
+    names = foreign_key_names(table)
+    with pg_loader.open_connection(dsn) as connection:
+        pg_loader.execute_statements(connection, [
+            f"ALTER TABLE {table.name} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(fk.columns)}) "
+            f"REFERENCES {fk.ref_table} ({', '.join(fk.ref_columns)}) NOT VALID"
+            for name, fk in zip(names, table.foreign_keys)
+        ])
+        for name in names:
+            pg_loader.execute_statements(connection, [f"ALTER TABLE {table.name} VALIDATE CONSTRAINT {name}"])
+    return time.perf_counter() - started
+
+
+def run_post_load(dsn, schema, jobs=1, table_order=None):
+    """Build keys, indexes and foreign keys of loaded tables in parallel.
+
+    Each table's primary key and indexes are built by one worker. As soon
+    as a table and every table it references have their keys, its foreign
+    keys are added and validated by another worker, while the remaining
+    tables are still being indexed. Adding a foreign key locks its own
+    table and the one it references, so foreign keys that share a table
+    are added one after another; with tables that reference each other,
+    they would otherwise deadlock. table_order, e.g. largest first, sets
+    the order tables are started in.
+    """
+    table_order = [name for name in (table_order or []) if name in schema.tables]
+    table_order += [name for name in schema.tables if name not in table_order]
+    dependencies = foreign_key_dependencies(schema)
+    keys_done = set()
+    # Tables locked by the foreign keys being added
+    locked = set()
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = {
+            executor.submit(build_keys, dsn, schema.tables[name]): ('keys', name)
+            for name in table_order
+        }
+        waiting = [name for name in table_order if name in dependencies]
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, name = running.pop(future)
+                seconds = future.result()
+                if stage == 'keys':
+                    keys_done.add(name)
+                    print(f"Built keys for table: {name} in {seconds:.2f}s")
+                else:
+                    locked -= dependencies[name]
+                    print(f"Validated foreign keys for table: {name} in {seconds:.2f}s")
+
+            for name in [name for name in waiting if dependencies[name] <= keys_done]:
+                if dependencies[name] & locked:
+                    continue
+                waiting.remove(name)
+                locked |= dependencies[name]
+                running[executor.submit(build_foreign_keys, dsn, schema.tables[name])] = ('foreign keys', name)
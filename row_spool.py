@@ -0,0 +1,99 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+DEFAULT_FLUSH_ROWS = 10000
+
+
+class RowSpool:
+    """Append-only on-disk store of parsed rows, one chunk file per table.
+
+    Rows are buffered per table and appended to the table's file as pickled
+    chunks of at most flush_rows rows, so memory use doesn't grow with the
+    number of INSERT batches. Tables can then be read back one at a time,
+    chunk by chunk, in the order they first appeared.
+    """
+
+    def __init__(self, directory=None, flush_rows=DEFAULT_FLUSH_ROWS):
+        self._owns_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix='row_spool_')
+        os.makedirs(self.directory, exist_ok=True)
+        self.flush_rows = flush_rows
+        self._columns = {}
+        self._counts = {}
+        self._files = {}
+        self._buffers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, table_name):
+        return table_name in self._files
+
+    def _path(self, table_name):
+        # Index-based names, so any table name is a valid file name
+        return os.path.join(self.directory, f"{self._files[table_name]}.chunks")
+
+    def append(self, table_name, columns, rows):
+        """Add a batch of rows; columns of the first batch of a table are kept"""
+        if table_name not in self._files:
+            self._files[table_name] = len(self._files)
+            self._columns[table_name] = columns
+            self._counts[table_name] = 0
+            self._buffers[table_name] = []
+            # Truncate anything left in a reused directory
+            open(self._path(table_name), 'wb').close()
+        buffer = self._buffers[table_name]
+        buffer.extend(rows)
+        self._counts[table_name] += len(rows)
+        if len(buffer) >= self.flush_rows:
+            self._flush(table_name)
+
+    def _flush(self, table_name):
+        buffer = self._buffers[table_name]
+        if not buffer:
+            return
+        with open(self._path(table_name), 'ab') as f:
+            pickle.dump(buffer, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._buffers[table_name] = []
+
+    def tables(self):
+        """Table names in the order they were first appended"""
+        return list(self._files)
+
+    def columns(self, table_name):
+        return self._columns[table_name]
+
+    def row_count(self, table_name):
+        return self._counts[table_name]
+
+    def iter_chunks(self, table_name):
+        """Yield the rows of a table as lists, in the order they were appended"""
+        self._flush(table_name)
+        with open(self._path(table_name), 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def iter_rows(self, table_name):
+        for chunk in self.iter_chunks(table_name):
+            yield from chunk
+
+    def close(self):
+        """Remove the chunk files, and the directory if the spool created it"""
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            for table_name in self._files:
+                try:
+                    os.remove(self._path(table_name))
+                except FileNotFoundError:
+                    pass
+        self._files.clear()
+        self._buffers.clear()
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+
+_CREATE_TABLE = re.compile(r'CREATE TABLE (?:IF NOT EXISTS )?"?(\w+)"?\s*\(', re.IGNORECASE)
+_COLUMN = re.compile(r'"?(\w+)"?\s+(.*)', re.DOTALL)
+# Everything after the type in a column definition starts with one of these
+_CONSTRAINT_START = re.compile(
+    r'\s(?:NOT\s+NULL|NULL|DEFAULT|CHECK|PRIMARY\s+KEY|REFERENCES|UNIQUE|COLLATE|GENERATED)\b|$',
+    re.IGNORECASE
+)
+_DEFAULT = re.compile(r"\bDEFAULT\s+('(?:[^']|'')*'|\w+(?:\([^)]*\))?|-?[\d.]+)", re.IGNORECASE)
+# KEY and INDEX only count when followed by an optional name and a column
+# list, so a column that happens to be called "key" isn't taken for an index
+_TABLE_CONSTRAINT = re.compile(
+    r'(?:CONSTRAINT\s+\w+\s+)?(?:(PRIMARY\s+KEY|UNIQUE|FOREIGN\s+KEY|CHECK)\b|(?:KEY|INDEX)\s*(?:\w+\s*)?\()',
+    re.IGNORECASE
+)
+_PRIMARY_KEY = re.compile(r'ALTER TABLE (\w+)\s+ADD PRIMARY KEY \(([^)]+)\)', re.IGNORECASE)
+_FOREIGN_KEY = re.compile(
+    r'ALTER TABLE (\w+)\s+ADD FOREIGN KEY \(([^)]+)\) REFERENCES (\w+)\s*\(([^)]+)\)', re.IGNORECASE
+)
+_INDEX = re.compile(r'CREATE (UNIQUE )?INDEX (\w+) ON (\w+)\s*\(([^)]+)\)', re.IGNORECASE)
+
+
+@dataclass
+class Column:
+    name: str
+    type: str
+    nullable: bool = True
+    default: str = None
+
+
+@dataclass
+class ForeignKey:
+    columns: list
+    ref_table: str
+    ref_columns: list
+
+
+@dataclass
+class Index:
+    name: str
+    columns: list
+    unique: bool = False
+
+
+@dataclass
+class Table:
+    name: str
+    columns: list = field(default_factory=list)
+    primary_key: list = field(default_factory=list)
+    foreign_keys: list = field(default_factory=list)
+    indexes: list = field(default_factory=list)
+    # Next value of the table's AUTO_INCREMENT column, from the dump's table options
+    auto_increment: int = None
+
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    def column_types(self):
+        """Return {column_name: pg_type}, in column order"""
+        return {column.name: column.type for column in self.columns}
+
+
+@dataclass
+class Schema:
+    tables: dict = field(default_factory=dict)
+
+    def column_types(self):
+        """Return {table_name: {column_name: pg_type}} for every table"""
+        return {name: table.column_types() for name, table in self.tables.items()}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'tables': [asdict(table) for table in self.tables.values()]}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        schema = cls()
+        for table_data in data['tables']:
+            table = Table(
+                name=table_data['name'],
+                columns=[Column(**column) for column in table_data['columns']],
+                primary_key=table_data['primary_key'],
+                foreign_keys=[ForeignKey(**fk) for fk in table_data['foreign_keys']],
+                indexes=[Index(**index) for index in table_data.get('indexes', [])],
+                auto_increment=table_data.get('auto_increment'),
+            )
+            schema.tables[table.name] = table
+        return schema
+
+
+def split_definitions(body):
+    """Split a CREATE TABLE body on commas outside parentheses and quotes"""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, char in enumerate(body):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(body[start:i].strip())
+            start = i + 1
+    parts.append(body[start:].strip())
+    return [part for part in parts if part]
+
+
+def _column_list(text):
+    return [name.strip().strip('"') for name in text.split(',')]
+
+
+def parse_create_table(statement):
+    """Build a Table from a converted PostgreSQL CREATE TABLE statement"""
+    match = _CREATE_TABLE.search(statement)
+    if not match:
+        return None
+    table = Table(name=match.group(1))
+    body = statement[match.end():statement.rindex(')')]
+
+    for definition in split_definitions(body):
+        constraint = _TABLE_CONSTRAINT.match(definition)
+        if constraint:
+            if (constraint.group(1) or '').upper().startswith('PRIMARY'):
+                columns = re.search(r'\(([^)]*)\)', definition[constraint.end():])
+                if columns:
+                    table.primary_key = _column_list(columns.group(1))
+            continue
+
+        column = _COLUMN.match(definition)
+        if not column:
+            continue
+        name, rest = column.groups()
+        rest = ' '.join(rest.split())
+        type_end = _CONSTRAINT_START.search(rest).start()
+        default = _DEFAULT.search(rest)
+        table.columns.append(Column(
+            name=name,
+            type=rest[:type_end].strip().lower(),
+            nullable=not re.search(r'\bNOT\s+NULL\b', rest, re.IGNORECASE),
+            default=default.group(1) if default else None,
+        ))
+        if re.search(r'\bPRIMARY\s+KEY\b', rest[type_end:], re.IGNORECASE):
+            table.primary_key = [name]
+    return table
+
+
+def build_schema(create_statements, alter_statements=()):
+    """Build a Schema from converted CREATE TABLE, ALTER TABLE and CREATE INDEX statements"""
+    schema = Schema()
+    for statement in create_statements:
+        table = parse_create_table(statement)
+        if table:
+            schema.tables[table.name] = table
+
+    for statement in alter_statements:
+        primary_key = _PRIMARY_KEY.search(statement)
+        if primary_key and primary_key.group(1) in schema.tables:
+            schema.tables[primary_key.group(1)].primary_key = _column_list(primary_key.group(2))
+        for table_name, columns, ref_table, ref_columns in _FOREIGN_KEY.findall(statement):
+            if table_name in schema.tables:
+                schema.tables[table_name].foreign_keys.append(
+                    ForeignKey(_column_list(columns), ref_table, _column_list(ref_columns))
+                )
+        for unique, name, table_name, columns in _INDEX.findall(statement):
+            if table_name in schema.tables:
+                schema.tables[table_name].indexes.append(Index(name, _column_list(columns), bool(unique)))
+    return schema
+
+
+def parse_schema_file(schema_file):
+    """Parse a step 2 schema file, for when its sidecar is missing"""
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    create_statements = re.findall(r'CREATE TABLE.*?\);', content, re.DOTALL | re.IGNORECASE)
+    alter_statements = re.findall(r'ALTER TABLE.*?;|CREATE (?:UNIQUE )?INDEX.*?;', content, re.DOTALL | re.IGNORECASE)
+    return build_schema(create_statements, alter_statements)
+
+
+def sidecar_path(schema_file):
+    """Path of the JSON model written next to a schema file"""
+    return os.path.splitext(schema_file)[0] + '.json'
+
+
+_loaded = {}
+
+
+def load_schema(schema_file):
+    """Load the schema model for a step 2 schema file.
+
+    Reads the JSON sidecar when it is at least as new as the schema file
+    and falls back to parsing the SQL otherwise. The result is cached, so
+    repeated calls for the same unchanged file are free.
+    """
+    sidecar = sidecar_path(schema_file)
+    use_sidecar = os.path.exists(sidecar) and (
+        not os.path.exists(schema_file) or os.path.getmtime(sidecar) >= os.path.getmtime(schema_file)
+    )
+    source = sidecar if use_sidecar else schema_file
+    key = (os.path.abspath(source), os.path.getmtime(source))
+    if key not in _loaded:
+        _loaded[key] = Schema.load(sidecar) if use_sidecar else parse_schema_file(schema_file)
+    return _loaded[key]
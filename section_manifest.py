@@ -0,0 +1,126 @@
+import json
+import os
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def manifest_path(sql_file):
+    """Path of the section manifest written next to a SQL file"""
+    return os.path.splitext(sql_file)[0] + '.manifest.json'
+
+
+class ManifestWriter:
+    """Record where each section of a SQL file being written starts and ends.
+
+    Call begin() before writing a section's statements and end(section)
+    after them; for per-table data, pass the table name to end() as well.
+    Each section must be written as one contiguous run of statements,
+    each followed by a blank line.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.sections = {}
+        self.tables = []
+        self._start = None
+
+    def begin(self):
+        self._start = self.f.tell()
+
+    def end(self, section, table_name=None):
+        byte_range = [self._start, self.f.tell()]
+        if table_name is None:
+            self.sections[section] = byte_range
+        else:
+            self.sections.setdefault(section, []).append(byte_range)
+            self.tables.append(table_name)
+
+    def save(self, sql_file):
+        """Write the manifest; call after sql_file has been closed"""
+        stat = os.stat(sql_file)
+        with open(manifest_path(sql_file), 'w', encoding='utf-8') as f:
+            json.dump({
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sections': self.sections,
+                'tables': self.tables,
+            }, f, indent=1)
+
+
+def load_manifest(sql_file):
+    """Return the manifest of sql_file, or None if it is missing or stale"""
+    path = manifest_path(sql_file)
+    if not os.path.exists(path) or not os.path.exists(sql_file):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    stat = os.stat(sql_file)
+    # Any rewrite of the SQL file since the manifest was saved invalidates it
+    if (manifest.get('size'), manifest.get('mtime_ns')) != (stat.st_size, stat.st_mtime_ns):
+        return None
+    return manifest
+
+
+class ByteRanges:
+    """Byte ranges of a file, to be copied into another file without parsing"""
+
+    def __init__(self, path, ranges):
+        self.path = path
+        self.ranges = ranges
+
+    def __bool__(self):
+        return any(end > start for start, end in self.ranges)
+
+    def copy_to(self, f):
+        """Append the ranges to the open file f"""
+        f.flush()
+        try:
+            dst_fd = f.fileno()
+        except OSError:
+            # A compressed output has no file descriptor to copy into
+            dst_fd = None
+        with open(self.path, 'rb') as src:
+            for start, end in self.ranges:
+                if dst_fd is None:
+                    copy_range_to_stream(src, f.buffer, start, end - start)
+                else:
+                    copy_range(src.fileno(), dst_fd, start, end - start)
+
+
+def copy_range(src_fd, dst_fd, offset, count):
+    """Copy count bytes from offset in src_fd to the current position of dst_fd.
+
+    Uses copy_file_range or sendfile, so the data stays in the kernel,
+    and falls back to reading and writing where neither is available.
+    """
+    while count > 0:
+        try:
+            if hasattr(os, 'copy_file_range'):
+                copied = os.copy_file_range(src_fd, dst_fd, count, offset)
+            else:
+                copied = os.sendfile(dst_fd, src_fd, offset, count)
+        except (OSError, AttributeError):
+            break
+        if copied == 0:
+            break
+        offset += copied
+        count -= copied
+
+    while count > 0:
+        chunk = os.pread(src_fd, min(count, COPY_CHUNK_SIZE), offset)
+        if not chunk:
+            raise EOFError(f"Unexpected end of file copying byte range at offset {offset}")
+        written = os.write(dst_fd, chunk)
+        offset += written
+        count -= written
+
+
+def copy_range_to_stream(src, dst, offset, count):
+    """Copy count bytes from offset in the binary file src to the binary stream dst"""
+    src.seek(offset)
+    while count > 0:
+        chunk = src.read(min(count, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise EOFError(f"Unexpected end of file copying byte range at offset {offset}")
+        dst.write(chunk)
+        count -= len(chunk)
@@ -0,0 +1,92 @@
+SERIAL_TYPES = ('smallserial', 'serial', 'bigserial')
+
+
+def serial_columns(schema):
+    """{table_name: [column_name, ...]} of the columns backed by a sequence"""
+    columns = {}
+    for table in schema.tables.values():
+        names = [column.name for column in table.columns if column.type in SERIAL_TYPES]
+        if names:
+            columns[table.name] = names
+    return columns
+
+
+def _integer(value):
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def column_max(values):
+    """Largest integer among values, or None if there is none"""
+    try:
+        largest = max(values, default=None)
+    except TypeError:
+        largest = None
+    if largest is None or not isinstance(largest, int):
+        # NULLs, quoted numbers or floats read back from Excel; compare them as integers
+        largest = max((number for number in map(_integer, values) if number is not None), default=None)
+    return largest
+
+
+class SequenceValues:
+    """Highest value written to each serial column, to set its sequence without scanning the table.
+
+    Rows are passed to observe() as they are converted. A table whose rows
+    leave out a serial column gets that column's values from the sequence
+    itself, so its sequence is left alone. values is plain JSON, so it can
+    be journaled, cached and sent back from worker processes, and merged
+    again with update().
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns = serial_columns(schema)
+        # {table_name: {column_name: highest value, or None if filled by the sequence}}
+        self.values = {}
+
+    def observe(self, table_name, columns, rows):
+        """Record the values of the serial columns in a batch of rows"""
+        # A batch can be empty, e.g. once duplicates are dropped, and then says nothing about the sequence
+        if not rows:
+            return
+        for column in self.columns.get(table_name, ()):
+            if column not in columns:
+                self.update(table_name, {column: None})
+                continue
+            index = columns.index(column)
+            largest = column_max([row[index] for row in rows])
+            if largest is not None:
+                self.update(table_name, {column: largest})
+
+    def update(self, table_name, values):
+        """Merge {column_name: highest value} of a table, e.g. from a worker or a journal"""
+        table_values = self.values.setdefault(table_name, {})
+        for column, value in values.items():
+            if column not in table_values:
+                table_values[column] = value
+            elif table_values[column] is not None:
+                table_values[column] = None if value is None else max(table_values[column], value)
+
+    def statements(self):
+        """setval() statements that make each sequence continue after its column's values.
+
+        A sequence restarts after the highest value written, or at the
+        table's AUTO_INCREMENT option from the dump if that is higher.
+        """
+        statements = []
+        for table_name, columns in self.columns.items():
+            auto_increment = self.schema.tables[table_name].auto_increment or 1
+            for column in columns:
+                table_values = self.values.get(table_name, {})
+                if column in table_values and table_values[column] is None:
+                    continue
+                largest = table_values.get(column)
+                next_value = max(auto_increment, largest + 1 if largest is not None else 1)
+                statements.append(
+                    f"SELECT setval(pg_get_serial_sequence('{table_name}', '{column.lower()}'), {next_value}, false);"
+                )
+        return statements
@@ -0,0 +1,145 @@
+import argparse
+import random
+from dataclasses import dataclass
+
+# Every kind of column the generator can fill, with its MySQL column definition
+COLUMN_KINDS = {
+    'int': "int(11) DEFAULT NULL",
+    'flag': "tinyint(1) NOT NULL DEFAULT '0'",
+    'decimal': "decimal(12,2) DEFAULT NULL",
+    'varchar': "varchar(255) DEFAULT NULL",
+    'text': "text",
+    'datetime': "datetime DEFAULT NULL",
+    'unicode': "text",
+    'blob': "blob",
+    'hexblob': "longblob",
+}
+
+WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet']
+# Multi-byte text, plus characters that need escaping or could confuse a naive splitter
+UNICODE_PIECES = ['café', 'naïve', 'Ωmega', '中文字符', 'русский', '😀', "it's", 'back\\slash',
+                  'line\nbreak', 'tab\there', '"quoted"', 'semi;colon', '(paren)', '-- not a comment']
+# mysqldump's escapes inside quoted strings
+_STRING_ESCAPES = {'\\': '\\\\', "'": "\\'", '\n': '\\n', '\r': '\\r', '\0': '\\0', '\x1a': '\\Z'}
+_BYTE_ESCAPES = {ord(char): escape.encode() for char, escape in _STRING_ESCAPES.items()}
+_BYTE_ESCAPES[ord('"')] = b'\\"'
+
+
+@dataclass
+class Shape:
+    """Layout of a synthetic dump: how many tables, which columns, how rows are batched"""
+    tables: int
+    columns: list
+    rows_per_insert: int
+
+
+BASIC_COLUMNS = ['varchar', 'flag', 'decimal', 'datetime', 'text']
+
+SHAPES = {
+    'many_small_tables': Shape(tables=200, columns=BASIC_COLUMNS, rows_per_insert=100),
+    'few_huge_tables': Shape(tables=2, columns=BASIC_COLUMNS, rows_per_insert=1000),
+    'wide_rows': Shape(tables=4, columns=BASIC_COLUMNS * 8 + ['int'] * 20, rows_per_insert=100),
+    'blob_heavy': Shape(tables=4, columns=['varchar', 'blob', 'hexblob'], rows_per_insert=50),
+    'unicode_strings': Shape(tables=4, columns=['varchar', 'unicode', 'unicode'], rows_per_insert=500),
+    'many_inserts': Shape(tables=10, columns=BASIC_COLUMNS, rows_per_insert=5),
+}
+
+
+def quote_string(text):
+    return "'" + ''.join(_STRING_ESCAPES.get(char, char) for char in text) + "'"
+
+
+def quote_binary(data):
+    return b"_binary '" + b''.join(_BYTE_ESCAPES.get(byte, bytes((byte,))) for byte in data) + b"'"
+
+
+def column_value(kind, rng):
+    """One value of a column kind, as it would appear in a mysqldump INSERT"""
+    if rng.random() < 0.05 and kind not in ('flag',):
+        return 'NULL'
+    if kind == 'int':
+        return str(rng.randint(-2**31, 2**31 - 1))
+    if kind == 'flag':
+        return str(rng.randint(0, 1))
+    if kind == 'decimal':
+        return f"{rng.randint(0, 10**10)}.{rng.randint(0, 99):02d}"
+    if kind == 'varchar':
+        return quote_string(' '.join(rng.choices(WORDS, k=rng.randint(1, 4))))
+    if kind == 'text':
+        return quote_string(' '.join(rng.choices(WORDS, k=rng.randint(10, 60))))
+    if kind == 'datetime':
+        # A few zero dates, as MySQL allows them
+        if rng.random() < 0.02:
+            return "'0000-00-00 00:00:00'"
+        return (f"'{rng.randint(1990, 2030)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}'")
+    if kind == 'unicode':
+        return quote_string(' '.join(rng.choices(UNICODE_PIECES, k=rng.randint(3, 20))))
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def binary_value(kind, rng):
+    """A blob value as raw bytes, since it may not be valid UTF-8"""
+    data = rng.randbytes(rng.randint(16, 2048))
+    if kind == 'hexblob':
+        # mysqldump --hex-blob
+        return b'0x' + data.hex().encode()
+    return quote_binary(data)
+
+
+def create_table_statement(table_name, shape):
+    columns = [f"  `id` int(11) NOT NULL AUTO_INCREMENT"]
+    columns += [f"  `{kind}_{i}` {COLUMN_KINDS[kind]}" for i, kind in enumerate(shape.columns)]
+    columns.append("  PRIMARY KEY (`id`)")
+    return (f"DROP TABLE IF EXISTS `{table_name}`;\n"
+            f"CREATE TABLE `{table_name}` (\n" + ',\n'.join(columns) + "\n"
+            f") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n")
+
+
+def generate_dump(output_file, shape, size_bytes, seed=0):
+    """Write a mysqldump-style file of about size_bytes in the given shape.
+
+    The data is split evenly between the tables and written as extended
+    INSERTs of shape.rows_per_insert rows. The same seed always gives the
+    same file. Returns {'tables', 'rows', 'bytes'}.
+    """
+    rng = random.Random(seed)
+    table_quota = max(size_bytes // shape.tables, 1)
+    row_count = 0
+    with open(output_file, 'wb') as f:
+        f.write(b"-- MySQL dump (synthetic)\n/*!40101 SET NAMES utf8mb4 */;\n\n")
+        for t in range(shape.tables):
+            table_name = f"table_{t}"
+            f.write(create_table_statement(table_name, shape).encode('utf-8'))
+            f.write(f"LOCK TABLES `{table_name}` WRITE;\n".encode('utf-8'))
+            table_end = f.tell() + table_quota
+            while f.tell() < table_end:
+                tuples = []
+                for _ in range(shape.rows_per_insert):
+                    row_count += 1
+                    values = [str(row_count).encode()]
+                    for kind in shape.columns:
+                        if kind in ('blob', 'hexblob'):
+                            values.append(binary_value(kind, rng))
+                        else:
+                            values.append(column_value(kind, rng).encode('utf-8'))
+                    tuples.append(b'(' + b','.join(values) + b')')
+                f.write(f"INSERT INTO `{table_name}` VALUES ".encode('utf-8') + b','.join(tuples) + b';\n')
+            f.write(b"UNLOCK TABLES;\n\n")
+        size = f.tell()
+    return {'tables': shape.tables, 'rows': row_count, 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MySQL dump for benchmarking")
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='many_small_tables')
+    parser.add_argument('--size-mb', type=float, default=20, help="approximate size of the dump")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='0_to_be_convert.sql')
+    args = parser.parse_args()
+    stats = generate_dump(args.output, SHAPES[args.shape], int(args.size_mb * 2**20), args.seed)
+    print(f"Wrote {args.output}: {stats['tables']} tables, {stats['rows']} rows, {stats['bytes']} bytes")
+
+
+if __name__ == '__main__':
+    main()
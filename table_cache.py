@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import asdict
+
+DEFAULT_CACHE_SIZE = 10 * 1024 ** 3
+
+# Bump when a change to the converters changes their output for the same input,
+# or the metadata stored with it
+CACHE_VERSION = 2
+
+
+def payload_hasher():
+    """Running hash of a table's INSERT statements, fed while reading the dump"""
+    return hashlib.blake2b(digest_size=16)
+
+
+class TableCache:
+    """Converted output of each table, reused while its definition and rows don't change.
+
+    An entry is keyed by a hash of the table's definition in the schema,
+    the hash of its INSERT statements in the dump and the options that
+    shape the output, so a table is only converted again when one of them
+    changed. Entries are files in directory; a hit refreshes an entry's
+    mtime, and the least recently used entries are removed once the cache
+    grows past max_bytes.
+    """
+
+    def __init__(self, directory, schema, max_bytes=DEFAULT_CACHE_SIZE, **options):
+        self.directory = directory
+        self.schema = schema
+        self.max_bytes = max_bytes
+        self.options = options
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, table_name, payload_digest):
+        table = self.schema.tables.get(table_name)
+        definition = asdict(table) if table else None
+        return hashlib.blake2b(json.dumps({
+            'version': CACHE_VERSION,
+            'definition': definition,
+            'payload': payload_digest,
+            'options': self.options,
+        }, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.data', base + '.json'
+
+    def fetch(self, key, path):
+        """Copy a cached output to path and return its metadata, or None on a miss"""
+        data_path, meta_path = self._paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        shutil.copyfile(data_path, path)
+        os.utime(data_path)
+        return metadata
+
+    def store(self, key, path, **metadata):
+        """Add a converted output, then evict old entries if the cache is too big"""
+        data_path, meta_path = self._paths(key)
+        # Written under temporary names, so an entry is never seen half-stored
+        shutil.copyfile(path, data_path + '.tmp')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        os.replace(data_path + '.tmp', data_path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.data'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime_ns, stat.st_size, name[:-len('.data')]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
@@ -0,0 +1,52 @@
+import pytest
+
+import mysql2pgsql
+import synthetic_dump
+from checkpoint import Checkpoint
+
+
+def test_journal(tmp_path):
+    path = str(tmp_path / 'run.checkpoint.jsonl')
+    journal = Checkpoint(path, {'run': 1})
+    journal.record('convert', 't', offset=10)
+    journal.record('convert', 't', done=True, offset=20)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"stage": "convert", "ta')
+
+    resumed = Checkpoint(path, {'run': 1})
+    assert resumed.resumed
+    assert resumed.latest('convert', 't')['offset'] == 20
+    assert resumed.is_done('convert', 't') and not resumed.is_done('convert', 'u')
+    # Another run's inputs start the journal over
+    assert not Checkpoint(path, {'run': 2}).resumed
+    assert not Checkpoint(path, {'run': 2}).is_done('convert', 't')
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_interrupted_conversion_resumes_to_the_same_output(tmp_path, monkeypatch, jobs):
+    dump = str(tmp_path / 'dump.sql')
+    synthetic_dump.generate_dump(dump, synthetic_dump.SHAPES['many_small_tables'], 100_000)
+    reference = tmp_path / 'reference.sql'
+    mysql2pgsql.convert_dump(dump, str(reference), str(tmp_path / 'reference_schema.sql'), jobs=jobs)
+
+    monkeypatch.setattr(mysql2pgsql, 'CHECKPOINT_INTERVAL', 10_000)
+    observe = mysql2pgsql.SequenceValues.observe
+    calls = []
+
+    def crash(self, *args):
+        calls.append(args)
+        if len(calls) == 20:
+            raise RuntimeError("killed")
+        return observe(self, *args)
+    output = tmp_path / 'out.sql'
+    schema = str(tmp_path / 'schema.sql')
+    monkeypatch.setattr(mysql2pgsql.SequenceValues, 'observe', crash)
+    with pytest.raises(RuntimeError):
+        mysql2pgsql.convert_dump(dump, str(output), schema, jobs=jobs)
+    monkeypatch.setattr(mysql2pgsql.SequenceValues, 'observe', observe)
+    # The fingerprint and at least one record of the work done
+    assert len((tmp_path / 'out.checkpoint.jsonl').read_text().splitlines()) > 1
+
+    mysql2pgsql.convert_dump(dump, str(output), schema, jobs=jobs)
+    assert output.read_bytes() == reference.read_bytes()
+    assert not (tmp_path / 'out.checkpoint.jsonl').exists()
@@ -0,0 +1,75 @@
+import importlib
+import os
+
+from section_manifest import ManifestWriter
+
+step4 = importlib.import_module('4_combine_sql_files')
+
+SQL = b"""-- head
+CREATE TABLE a (s text DEFAULT 'x;y''z');
+/* c; */ INSERT INTO a VALUES (E'it\\'s;'), ("q;");
+DO $body$ BEGIN PERFORM 1; END $body$;
+COPY a (s) FROM stdin;
+x;y
+\\.
+SELECT 1 -- trailing;
+;
+SELECT 2"""
+
+
+def test_statement_spans():
+    assert [SQL[start:end] for start, end in step4.iter_statement_spans(SQL)] == [
+        b"CREATE TABLE a (s text DEFAULT 'x;y''z');",
+        b"INSERT INTO a VALUES (E'it\\'s;'), (\"q;\");",
+        b"DO $body$ BEGIN PERFORM 1; END $body$;",
+        b"COPY a (s) FROM stdin;\nx;y\n\\.",
+        b"SELECT 1 -- trailing;\n;",
+        b"SELECT 2",
+    ]
+
+
+def test_unterminated_string_runs_to_the_end():
+    assert list(step4.iter_statement_spans(b"SELECT 'a;")) == [(0, 10)]
+
+
+def write_inputs(tmp_path):
+    step2 = importlib.import_module('2_convert_to_pgsql_scheme')
+    schema_file = tmp_path / 'schema.sql'
+    step2.write_schema([
+        "CREATE TABLE `a` (`id` int NOT NULL AUTO_INCREMENT, `s` text, PRIMARY KEY (`id`), KEY `s` (`s`(5)));",
+        "CREATE TABLE `b` (`id` int NOT NULL, `a_id` int, FOREIGN KEY (`a_id`) REFERENCES `a` (`id`));",
+    ], [], str(schema_file))
+    insert_file = tmp_path / 'inserts.sql'
+    with open(insert_file, 'w', encoding='utf-8') as f:
+        manifest = ManifestWriter(f)
+        f.write('BEGIN;\n\n')
+        for table, values in (('a', "(1, 'x;y')"), ('b', '(1, 1)')):
+            manifest.begin()
+            f.write(f"INSERT INTO {table} VALUES\n{values};\n\n")
+            manifest.end('data', table)
+        f.write('COMMIT;\n\n')
+        manifest.begin()
+        f.write("SELECT setval(pg_get_serial_sequence('a', 'id'), 2, false);\n\n")
+        manifest.end('sequences')
+    manifest.save(str(insert_file))
+    return str(schema_file), str(insert_file)
+
+
+def test_manifest_sections_are_copied_like_parsed_ones(tmp_path):
+    schema_file, insert_file = write_inputs(tmp_path)
+    copied = tmp_path / 'copied.sql'
+    step4.combine_sql_files(schema_file, insert_file, str(copied))
+
+    # Touching the file makes its manifest stale, so the files are parsed instead
+    os.utime(insert_file, ns=(0, 0))
+    assert step4.manifest_sections(schema_file, insert_file) is None
+    parsed = tmp_path / 'parsed.sql'
+    step4.combine_sql_files(schema_file, insert_file, str(parsed))
+
+    copied_text = copied.read_text()
+    assert "CREATE INDEX a_s ON a (s);" in copied_text
+    assert "INSERT INTO b VALUES\n(1, 1);" in copied_text
+    assert copied_text.endswith("-- Sequences\n\nSELECT setval(pg_get_serial_sequence('a', 'id'), 2, false);\n\n")
+    # Parsing resets sequences from the data instead of using the setval() statements
+    assert copied_text[:copied_text.index('-- Sequences')] == \
+        parsed.read_text()[:-len(step4.SEQUENCE_RESET_SQL)]
@@ -0,0 +1,62 @@
+import gzip
+import io
+import os
+
+import pytest
+
+import compressed_io
+import mysql2pgsql
+from compressed_io import ThreadedReader, compressed_position, find_dump, open_dump, open_output
+
+DATA = b''.join(b'line %d\n' % n for n in range(20000))
+
+
+def compressions():
+    yield 'gzip'
+    if compressed_io.zstandard is not None:
+        yield 'zstd'
+
+
+@pytest.mark.parametrize('compression', list(compressions()))
+def test_round_trip(tmp_path, compression):
+    path = str(tmp_path / ('data.gz' if compression == 'gzip' else 'data.zst'))
+    with open_output(path) as f:
+        f.write(DATA.decode())
+    assert os.path.getsize(path) < len(DATA)
+    with open_dump(path) as f:
+        assert f.read() == DATA
+
+
+def test_reads_in_small_chunks_and_seeks_forward(tmp_path):
+    path = tmp_path / 'data.gz'
+    path.write_bytes(gzip.compress(DATA))
+    reader = ThreadedReader(str(path), 'gzip', chunk_size=1000)
+    try:
+        assert reader.read(5) == DATA[:5]
+        assert reader.seek(50_000) == 50_000
+        assert reader.read(10) == DATA[50_000:50_010]
+        with pytest.raises(io.UnsupportedOperation):
+            reader.seek(0)
+        assert reader.read() == DATA[50_010:]
+        assert reader.read() == b''
+        assert compressed_position(reader, reader.tell()) == path.stat().st_size
+    finally:
+        reader.close()
+
+
+def test_find_dump(tmp_path):
+    plain = str(tmp_path / 'dump.sql')
+    assert find_dump(plain) == plain
+    (tmp_path / 'dump.sql.gz').write_bytes(gzip.compress(b''))
+    assert find_dump(plain) == plain + '.gz'
+
+
+def test_compressed_dump_and_output_convert_like_plain_ones(tmp_path):
+    dump = (b"CREATE TABLE `t` (`id` int NOT NULL AUTO_INCREMENT, `s` text, PRIMARY KEY (`id`));\n" +
+            b''.join(b"INSERT INTO `t` VALUES (%d,'row %d');\n" % (n, n) for n in range(1, 500)))
+    (tmp_path / 'dump.sql').write_bytes(dump)
+    (tmp_path / 'dump.sql.gz').write_bytes(gzip.compress(dump))
+    mysql2pgsql.convert_dump(str(tmp_path / 'dump.sql'), str(tmp_path / 'plain.sql'), str(tmp_path / 'a.sql'))
+    mysql2pgsql.convert_dump(str(tmp_path / 'dump.sql.gz'), str(tmp_path / 'packed.sql.gz'),
+                             str(tmp_path / 'b.sql'))
+    assert gzip.decompress((tmp_path / 'packed.sql.gz').read_bytes()) == (tmp_path / 'plain.sql').read_bytes()
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from dedup import RowDeduplicator
+
+
+def test_whole_rows():
+    with RowDeduplicator() as dedup:
+        assert dedup.filter_rows('t', ['id', 'v'], [(1, 'a'), (1, 'a'), (1, '1')]) == [(1, 'a'), (1, '1')]
+        assert dedup.filter_rows('t', ['id', 'v'], [(1, 'a'), (2, 'b')]) == [(2, 'b')]
+        # Equal values of different types, and the same row in another table, are kept
+        assert dedup.filter_rows('t', ['id', 'v'], [('1', 'a')]) == [('1', 'a')]
+        assert dedup.filter_rows('u', ['id', 'v'], [(1, 'a')]) == [(1, 'a')]
+        assert dedup.dropped == {'t': 2}
+
+
+def test_primary_key():
+    with RowDeduplicator({'t': ['id']}) as dedup:
+        assert dedup.filter_rows('t', ['v', 'id'], [('a', 1), ('b', 1), ('c', 2)]) == [('a', 1), ('c', 2)]
+        # Without the key among its columns, a batch is compared on whole rows
+        assert dedup.filter_rows('t', ['v'], [('a',), ('a',)]) == [('a',)]
+
+
+@pytest.mark.parametrize('memory_budget', [1, 250])
+def test_keys_spilled_to_disk_are_still_seen(tmp_path, memory_budget):
+    with RowDeduplicator(memory_budget=memory_budget, directory=str(tmp_path)) as dedup:
+        for start in range(0, 30, 5):
+            assert dedup.filter_rows('t', ['id'], [(n,) for n in range(start, start + 5)]) == \
+                [(n,) for n in range(start, start + 5)]
+        assert os.listdir(tmp_path)
+        assert dedup.filter_rows('t', ['id'], [(n,) for n in range(35)]) == [(n,) for n in range(30, 35)]
+        assert dedup.dropped == {'t': 30}
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,51 @@
+import pytest
+
+import mysql2pgsql
+from dump_index import DumpIndex, map_dump
+
+DUMP = """CREATE TABLE `a` (`id` int NOT NULL, PRIMARY KEY (`id`));
+CREATE TABLE `b` (`id` int NOT NULL, `a_id` int, PRIMARY KEY (`id`),
+  CONSTRAINT `fk1` FOREIGN KEY (`a_id`) REFERENCES `a` (`id`));
+CREATE TABLE IF NOT EXISTS `c` (`id` int NOT NULL, `b_id` int, PRIMARY KEY (`id`));
+CREATE TABLE `my-t$1` (`id` int NOT NULL);
+ALTER TABLE `c` ADD CONSTRAINT `fk2` FOREIGN KEY (`b_id`) REFERENCES `b` (`id`);
+INSERT INTO `a` VALUES (1);
+INSERT INTO `b` VALUES (1,1);
+INSERT INTO `c` VALUES (1,1);
+INSERT INTO `my-t$1` VALUES (5);
+"""
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / 'dump.sql'
+    path.write_text(DUMP)
+    return path
+
+
+def test_ddl_and_inserts_are_indexed_under_the_same_names(dump):
+    index = DumpIndex.build(str(dump))
+    assert list(index.tables) == ['a', 'b', 'c', 'my-t$1']
+    assert all(len(table['create']) == 1 and len(table['inserts']) == 1 for table in index.tables.values())
+    assert len(index.tables['c']['alter']) == 1
+    with map_dump(str(dump)) as data:
+        creates, alters = index.ddl_statements(data, ['my-t$1', 'c'])
+    assert creates == ["CREATE TABLE IF NOT EXISTS `c` (`id` int NOT NULL, `b_id` int, PRIMARY KEY (`id`));",
+                       "CREATE TABLE `my-t$1` (`id` int NOT NULL);"]
+    assert alters == ["ALTER TABLE `c` ADD CONSTRAINT `fk2` FOREIGN KEY (`b_id`) REFERENCES `b` (`id`);"]
+
+
+def test_select(dump):
+    index = DumpIndex.build(str(dump))
+    assert index.select(['c', 'a']) == ['a', 'c']
+    assert index.select(exclude_tables=['a']) == ['b', 'c', 'my-t$1']
+    with pytest.raises(ValueError):
+        index.select(exclude_tables=['d'])
+
+
+def test_foreign_keys_to_tables_left_out_are_dropped(dump, tmp_path):
+    output = tmp_path / 'out.sql'
+    mysql2pgsql.convert_dump(str(dump), str(output), str(tmp_path / 'schema.sql'), tables=['b', 'c'])
+    text = output.read_text()
+    assert 'REFERENCES a(' not in text
+    assert 'ALTER TABLE c\n  ADD FOREIGN KEY (b_id) REFERENCES b(id);' in text
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+from dump_reader import iter_raw_statements
+
+DUMP = (b"-- MySQL dump\n/*!40101 SET NAMES utf8 */;\n"
+        b"INSERT INTO `t` VALUES (1,'a;b'),(2,'it\\'s; \\\\'),(3,\"q\\\";\"),(4,'x''y;');\n"
+        b"/* a ; comment */ # another ;\n"
+        b"CREATE TABLE `a;b` (`id` int) -- trailing ; comment\n;\n"
+        b"SELECT 1--2;\n"
+        b"SELECT 3")
+STATEMENTS = [
+    b"INSERT INTO `t` VALUES (1,'a;b'),(2,'it\\'s; \\\\'),(3,\"q\\\";\"),(4,'x''y;');",
+    b"CREATE TABLE `a;b` (`id` int) -- trailing ; comment\n;",
+    b"SELECT 1--2;",
+    b"SELECT 3",
+]
+
+
+class SplitStream:
+    """Reads data in two chunks, split at an offset, whatever size is asked for"""
+
+    def __init__(self, data, split):
+        self.chunks = [data[:split], data[split:]]
+
+    def read(self, size=-1):
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+def statements(stream, chunk_size=1 << 20):
+    return [statement for _, _, statement in iter_raw_statements(stream, chunk_size)]
+
+
+def test_statements_and_offsets():
+    found = list(iter_raw_statements(io.BytesIO(DUMP)))
+    assert [statement for _, _, statement in found] == STATEMENTS
+    assert all(DUMP[start:end] == statement for start, end, statement in found)
+
+
+@pytest.mark.parametrize('chunk_size', range(1, len(DUMP) + 1))
+def test_any_chunk_size(chunk_size):
+    assert list(iter_raw_statements(io.BytesIO(DUMP), chunk_size)) == list(iter_raw_statements(io.BytesIO(DUMP)))
+
+
+@pytest.mark.parametrize('split_after', [
+    b"(1,'a;",                  # inside a quoted string
+    b"(2,'it\\",                # right after a backslash escape
+    b"(2,'it\\'s; \\\\",        # after an escaped backslash, before the closing quote
+    b"(4,'x'",                  # between the two quotes of a doubled quote
+    b"/* a ;",                  # inside a block comment
+    b"/* a ; comment *",        # between the * and / that end it
+    b"# another ;",             # inside a # comment
+    b"-- trailing",             # inside a -- comment
+    b"SELECT 1-",               # between the two dashes of --
+    b"(4,'x''y;');",            # at the ';' that ends a statement
+])
+def test_split_between_chunks(split_after):
+    split = DUMP.index(split_after) + len(split_after)
+    assert statements(SplitStream(DUMP, split)) == STATEMENTS
+
+
+def test_dash_dash_needs_whitespace_to_start_a_comment():
+    assert statements(io.BytesIO(b"SELECT 1--2;\n-- c;\nSELECT 2;")) == [b"SELECT 1--2;", b"SELECT 2;"]
@@ -0,0 +1,28 @@
+import pytest
+
+import mysql2pgsql
+
+DUMP = (b"CREATE TABLE `t` (`id` int NOT NULL, `s` varchar(10), PRIMARY KEY (`id`));\n"
+        b"INSERT INTO `t` VALUES (1,'caf\xe9'),(2,'ok');\n")
+
+
+@pytest.mark.parametrize('output_format', ['insert', 'copy'])
+@pytest.mark.parametrize('jobs', [1, 2])
+@pytest.mark.parametrize('output_name', ['out.sql', 'out.sql.gz'])
+def test_bytes_that_are_not_utf8_pass_through(tmp_path, output_format, jobs, output_name):
+    dump = tmp_path / 'dump.sql'
+    dump.write_bytes(DUMP)
+    output = tmp_path / output_name
+    mysql2pgsql.convert_dump(str(dump), str(output), str(tmp_path / 'schema.sql'), output_format=output_format,
+                             jobs=jobs)
+    with mysql2pgsql.open_dump(str(output)) as f:
+        assert b'caf\xe9' in f.read()
+
+
+def test_copy_dir_keeps_bytes_that_are_not_utf8(tmp_path):
+    dump = tmp_path / 'dump.sql'
+    dump.write_bytes(DUMP)
+    copy_dir = tmp_path / 'copy'
+    mysql2pgsql.convert_dump(str(dump), str(tmp_path / 'out.sql'), str(tmp_path / 'schema.sql'),
+                             copy_dir=str(copy_dir))
+    assert (copy_dir / 't.copy').read_bytes() == b'1\tcaf\xe9\n2\tok\n'
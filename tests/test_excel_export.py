@@ -0,0 +1,46 @@
+import openpyxl
+
+from excel_export import ExcelExport, load_sheet_tables
+
+
+def read_sheets(path):
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {sheet: [list(row) for row in workbook[sheet].iter_rows(values_only=True)]
+                for sheet in workbook.sheetnames}
+    finally:
+        workbook.close()
+
+
+def test_long_tables_continue_on_more_sheets(tmp_path):
+    path = str(tmp_path / 'out.xlsx')
+    with ExcelExport(path, max_rows=3) as export:
+        assert export.add_table('t', ['id', 'v'], ((n, f"={n}") for n in range(5))) == 5
+        assert export.add_table('empty', ['id'], []) == 0
+    assert read_sheets(path) == {
+        't': [['id', 'v'], [0, '=0'], [1, '=1']],
+        't_2': [['id', 'v'], [2, '=2'], [3, '=3']],
+        't_3': [['id', 'v'], [4, '=4']],
+        'empty': [['id']],
+    }
+    assert load_sheet_tables(path) == {'t': 't', 't_2': 't', 't_3': 't', 'empty': 'empty'}
+
+
+def test_sheet_names_are_made_valid_and_unique(tmp_path):
+    path = str(tmp_path / 'out.xlsx')
+    long_name = 'a_table_name_much_longer_than_excel_allows'
+    with ExcelExport(path) as export:
+        for table_name in ('what?/[x]', long_name, long_name.upper() + '_2'):
+            export.add_table(table_name, ['id'], [(1,)])
+    assert load_sheet_tables(path) == {
+        'what___x_': 'what?/[x]',
+        long_name[:31]: long_name,
+        long_name.upper()[:29] + '~2': long_name.upper() + '_2',
+    }
+
+
+def test_cells_keep_their_types(tmp_path):
+    path = str(tmp_path / 'out.xlsx')
+    with ExcelExport(path) as export:
+        export.add_table('t', None, [(None, 'text', True, 2, 2.5, float('nan'), float('inf'))])
+    assert read_sheets(path)['t'] == [['0', '1', '2', '3', '4', '5', '6'], [None, 'text', True, 2, 2.5, None, 'inf']]
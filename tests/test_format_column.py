@@ -0,0 +1,24 @@
+import importlib
+
+import pandas as pd
+
+step3 = importlib.import_module('3_convert_to_pgsql_insert')
+
+
+def test_text_column():
+    values = pd.Series(['a', "it's", '', ' ', 'NaN', None, 3, 2.0, 2.5, True])
+    assert step3.format_column(values, 'text').tolist() == [
+        "'a'", "'it''s'", 'NULL', 'NULL', 'NULL', 'NULL', '3', '2', '2.5', 'true']
+
+
+def test_boolean_column():
+    values = pd.Series(['Yes', 'n', 'maybe', 1, 0.0, None, True])
+    assert step3.format_column(values, 'boolean').tolist() == ['true', 'false', 'NULL', 'true', 'false', 'NULL', 'true']
+
+
+def test_float_column():
+    assert step3.format_column(pd.Series([1.0, 2.5, None])).tolist() == ['1', '2.5', 'NULL']
+
+
+def test_zero_dates_are_null():
+    assert step3.format_column(pd.Series(['0000-00-00', '2020-01-02']), 'date').tolist() == ['NULL', "'2020-01-02'"]
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import pytest
+
+from insert_parser import insert_table_name, parse_insert
+
+
+def test_literals():
+    statement = ("INSERT INTO `t` VALUES (1, -2.5e3, 0.5, 'plain', NULL, null, NuLl, TRUE, false, '',"
+                 " \"double\", b'101', 0b11)")
+    assert parse_insert(statement) == ('t', None, [
+        (1, Decimal('-2.5e3'), Decimal('0.5'), 'plain', None, None, None, 1, 0, '', 'double', 5, 3),
+    ])
+
+
+def test_escapes():
+    statement = r"""INSERT INTO t VALUES ('x\Zy\0z\n\r\t\b', 'it''s', 'q\'s\\', "d""q\"", 'a%\_b\q')"""
+    assert parse_insert(statement)[2] == [
+        ('x\x1ay\x00z\n\r\t\b', "it's", "q's\\", 'd"q"', 'a%\\_bq'),
+    ]
+
+
+def test_binary_and_hex():
+    statement = r"INSERT INTO t VALUES (_binary 'a\'b\0', _BINARY'\\', 0x0aFF, X'0f', 0x, _utf8mb4'text')"
+    assert parse_insert(statement)[2] == [(b"a'b\x00", b'\\', b'\n\xff', b'\x0f', b'', 'text')]
+
+
+def test_binary_keeps_bytes_decoded_with_surrogateescape():
+    statement = b"INSERT INTO t VALUES (_binary '\xff\x00')".decode('utf-8', errors='surrogateescape')
+    assert parse_insert(statement)[2] == [(b'\xff\x00',)]
+
+
+def test_parentheses_and_semicolons_inside_strings():
+    statement = "INSERT INTO t VALUES (1,'p(;)q'),(2,\"),(\"),(3,'a'';(b')"
+    assert parse_insert(statement)[2] == [(1, 'p(;)q'), (2, '),('), (3, "a';(b")]
+
+
+def test_head_and_column_list():
+    statement = "insert ignore into `db`.`my``t` (`a`, \"b\", c) values (1,2,3),\n(4,5,6);"
+    assert parse_insert(statement) == ('my`t', ['a', 'b', 'c'], [(1, 2, 3), (4, 5, 6)])
+    assert insert_table_name(statement) == 'my`t'
+
+
+def test_empty_tuple():
+    assert parse_insert("INSERT INTO t VALUES ()")[2] == [()]
+
+
+def test_not_an_insert():
+    assert parse_insert("CREATE TABLE t (id int)") is None
+    assert insert_table_name("SELECT 1") is None
+
+
+@pytest.mark.parametrize('statement', [
+    "INSERT INTO t VALUES (1,",
+    "INSERT INTO t VALUES (1 2)",
+    "INSERT INTO t VALUES (_binary)",
+    "INSERT INTO t SELECT 1",
+])
+def test_malformed(statement):
+    with pytest.raises(ValueError):
+        parse_insert(statement)
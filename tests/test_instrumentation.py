@@ -0,0 +1,56 @@
+import json
+
+import instrumentation
+from instrumentation import Instrumentation, Progress
+
+
+def test_timers_counters_and_merge(tmp_path):
+    stats = Instrumentation()
+    stats.add_time('parse', 1.5, 't')
+    stats.count('rows', 10, 't')
+    worker = Instrumentation()
+    worker.add_time('parse', 0.5, 't')
+    worker.add_time('format', 2.0, 't')
+    worker.count('rows', 30, 't')
+    stats.merge(json.loads(json.dumps(worker.to_dict())))
+    with stats.stage('convert'):
+        pass
+
+    summary = stats.table_summary()['t']
+    assert summary['rows'] == 40
+    assert summary['timings'] == {'parse': 2.0, 'format': 2.0}
+    assert summary['rows_per_second'] == 10.0
+
+    path = tmp_path / 'run.report.json'
+    stats.save_report(str(path), output_file='out.sql')
+    report = json.loads(path.read_text())
+    assert report['output_file'] == 'out.sql'
+    assert report['totals'] == {'rows': 40}
+    assert set(report['stages']) == {'convert'}
+
+
+def test_profiled_stage(tmp_path):
+    stats = Instrumentation(profile_dir=str(tmp_path), trace_memory=True)
+    with stats.stage('parse'):
+        data = [bytes(1000) for _ in range(100)]
+    assert data and (tmp_path / 'parse.prof').exists()
+    assert stats.stages['parse']['peak_traced_bytes'] >= 100_000
+
+
+def test_progress_prints_at_most_every_interval(capsys, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(instrumentation.time, 'perf_counter', lambda: now[0])
+    progress = Progress('Converting', 2 * 2**20, interval=5)
+    for second in range(1, 10):
+        now[0] = second
+        progress.update(second * 2**20 // 10, rows=100)
+    progress.finish()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [
+        "Converting:  25.0% of 2.0 MB, 0.1 MB/s, 100 rows/s, elapsed 0:00:05, ETA 0:00:15",
+        "Converting: 100.0% of 2.0 MB, 0.2 MB/s, 100 rows/s, elapsed 0:00:09, ETA 0:00:00",
+    ]
+
+
+def test_report_path():
+    assert instrumentation.report_path('out/4_final.sql.gz') == 'out/4_final.sql.report.json'
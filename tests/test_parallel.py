@@ -0,0 +1,18 @@
+import pytest
+
+import mysql2pgsql
+import synthetic_dump
+
+
+@pytest.mark.parametrize('output_format', ['insert', 'copy'])
+@pytest.mark.parametrize('shape', ['many_small_tables', 'blob_heavy'])
+def test_jobs_write_the_same_output_as_one_process(tmp_path, shape, output_format):
+    dump = str(tmp_path / 'dump.sql')
+    synthetic_dump.generate_dump(dump, synthetic_dump.SHAPES[shape], 100_000)
+    outputs = []
+    for jobs in (1, 3):
+        output = tmp_path / f'out_{jobs}.sql'
+        mysql2pgsql.convert_dump(dump, str(output), str(tmp_path / f'schema_{jobs}.sql'),
+                                 output_format=output_format, jobs=jobs)
+        outputs.append(output.read_bytes())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from pg_writer import COPY_NULL, copy_escape, copy_header, format_copy_rows, format_copy_value
+
+
+def test_copy_escape():
+    assert copy_escape('a\\b\tc\nd\re') == 'a\\\\b\\tc\\nd\\re'
+    assert copy_escape("plain 'quoted' \\N") == "plain 'quoted' \\\\N"
+
+
+def test_copy_null():
+    assert COPY_NULL == '\\N'
+    for column_type in (None, 'text', 'bytea', 'boolean', 'date'):
+        assert format_copy_value(None, column_type) == COPY_NULL
+
+
+def test_copy_bytea_keeps_the_hex_prefix_backslash_escaped():
+    assert format_copy_value(b'\x00\xff\\', 'bytea') == '\\\\x00ff5c'
+    assert format_copy_value(b'\x00\xff', 'text') == '\\\\x00ff'
+    # Strings in blob columns are turned back into the bytes they were read as
+    raw = b'\xff\x00'.decode('utf-8', errors='surrogateescape')
+    assert format_copy_value(raw, 'bytea') == '\\\\xff00'
+
+
+def test_copy_rows():
+    rows = [(1, None, 'x\ty\n', b'\x01', Decimal('1.50'), '0000-00-00', 'yes'),
+            (2, '', '\\', None, 0, '2020-01-02', 0)]
+    types = [None, 'text', 'text', 'bytea', 'numeric', 'date', 'boolean']
+    assert format_copy_rows(rows, types) == (
+        '1\t\\N\tx\\ty\\n\t\\\\x01\t1.50\t\\N\ttrue\n'
+        '2\t\t\\\\\t\\N\t0\t2020-01-02\tfalse\n'
+    )
+
+
+def test_copy_header():
+    assert copy_header('t', ['a', 'b']) == 'COPY t (a, b) FROM stdin;\n'
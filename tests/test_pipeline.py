@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+import mysql2pgsql
+import synthetic_dump
+from pipeline import IterableReader, Pipeline
+
+
+def test_stages_pass_items_in_order():
+    received = []
+    pipeline = (Pipeline(queue_size=2)
+                .add('read', lambda: range(50))
+                .add('double', lambda items: (item * 2 for item in items))
+                .add('write', lambda items: received.extend(items)))
+    pipeline.run()
+    assert received == [item * 2 for item in range(50)]
+
+
+def test_stage_can_drop_and_split_items():
+    received = []
+
+    def split(items):
+        for item in items:
+            if item % 2:
+                yield from (item, item)
+
+    Pipeline().add('read', lambda: range(6)).add('split', split).add('write', received.extend).run()
+    assert received == [1, 1, 3, 3, 5, 5]
+
+
+def test_queue_is_bounded():
+    produced = []
+    release = threading.Event()
+
+    def read():
+        for item in range(20):
+            produced.append(item)
+            yield item
+
+    def write(items):
+        release.wait(5)
+        return items
+
+    pipeline = Pipeline(queue_size=3).add('read', read).add('write', write)
+    thread = threading.Thread(target=pipeline.run)
+    thread.start()
+    thread.join(0.5)
+    # The queue holds 3 items and the reader one more that it waits to put
+    assert len(produced) == 4
+    release.set()
+    thread.join(5)
+    assert len(produced) == 20
+    assert pipeline.measurements()['write']['max_queue_depth'] == 3
+
+
+def test_error_in_one_stage_stops_the_others():
+    def read():
+        yield from range(10 ** 9)
+
+    def fail(items):
+        for item in items:
+            if item == 5:
+                raise ValueError("bad item")
+            yield item
+
+    pipeline = Pipeline(queue_size=2).add('read', read).add('fail', fail).add('write', lambda items: items)
+    with pytest.raises(ValueError, match="bad item"):
+        pipeline.run()
+    assert pipeline.measurements()['read']['items_out'] < 100
+
+
+def test_measurements():
+    pipeline = Pipeline(queue_size=4).add('read', lambda: range(10)).add('write', lambda items: items)
+    pipeline.run()
+    measurements = pipeline.measurements()
+    assert set(measurements['read']) == {
+        'items_in', 'items_out', 'seconds', 'busy_seconds', 'wait_seconds', 'stall_seconds'}
+    assert set(measurements['write']) == set(measurements['read']) | {
+        'queue_size', 'mean_queue_depth', 'max_queue_depth'}
+    assert measurements['read']['items_out'] == measurements['write']['items_in'] == 10
+    assert measurements['write']['queue_size'] == 4
+
+
+def test_iterable_reader():
+    reader = IterableReader([b'ab', b'c'])
+    assert [reader.read(1) for _ in range(3)] == [b'ab', b'c', b'']
+
+
+@pytest.mark.parametrize('output_format', ['insert', 'copy'])
+def test_pipeline_writes_the_same_output_as_a_serial_run(tmp_path, output_format):
+    dump = str(tmp_path / 'dump.sql')
+    synthetic_dump.generate_dump(dump, synthetic_dump.SHAPES['many_small_tables'], 100_000)
+    outputs = []
+    for pipeline in (False, True):
+        output = tmp_path / f'out_{pipeline}.sql'
+        mysql2pgsql.convert_dump(dump, str(output), str(tmp_path / f'schema_{pipeline}.sql'),
+                                 output_format=output_format, pipeline=pipeline, queue_size=2)
+        outputs.append(output.read_bytes())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,30 @@
+import threading
+import time
+
+import post_load
+from schema_model import ForeignKey, Schema, Table
+
+
+def test_foreign_keys_sharing_a_table_are_added_one_after_another(monkeypatch):
+    schema = Schema()
+    for name, ref_table in (('a', 'b'), ('b', 'a'), ('c', 'a'), ('d', 'e'), ('e', None)):
+        foreign_keys = [ForeignKey(['ref_id'], ref_table, ['id'])] if ref_table else []
+        schema.tables[name] = Table(name, primary_key=['id'], foreign_keys=foreign_keys)
+    dependencies = post_load.foreign_key_dependencies(schema)
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def build_foreign_keys(dsn, table):
+        with lock:
+            overlaps.extend(name for name in active if dependencies[name] & dependencies[table.name])
+            active.append(table.name)
+        time.sleep(0.05)
+        with lock:
+            active.remove(table.name)
+        return 0.0
+
+    monkeypatch.setattr(post_load, 'build_keys', lambda dsn, table: 0.0)
+    monkeypatch.setattr(post_load, 'build_foreign_keys', build_foreign_keys)
+    post_load.run_post_load('', schema, jobs=4)
+    assert overlaps == []
@@ -0,0 +1,34 @@
+import pytest
+
+import mysql2pgsql
+
+
+def write_dump(path):
+    lines = ["CREATE TABLE `big` (\n  `id` int(11) NOT NULL AUTO_INCREMENT,\n  `name` varchar(20),\n"
+             "  PRIMARY KEY (`id`)\n) ENGINE=InnoDB;\n"]
+    for batch in range(20):
+        values = ','.join(f"({batch * 10 + n},'row {batch * 10 + n}')" for n in range(1, 11))
+        lines.append(f"INSERT INTO `big` (`id`, `name`) VALUES {values};\n")
+    path.write_text('\n'.join(lines))
+
+
+def test_resume_joins_partitions_finished_before_the_crash(tmp_path, monkeypatch):
+    dump = tmp_path / 'dump.sql'
+    write_dump(dump)
+    options = dict(jobs=2, partition_size=1024)
+    reference = tmp_path / 'reference.sql'
+    mysql2pgsql.convert_dump(str(dump), str(reference), str(tmp_path / 'reference_schema.sql'), **options)
+
+    # Stop the run after the last partition is journaled, before its table is joined
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed before the join")
+    output = tmp_path / 'out.sql'
+    schema = str(tmp_path / 'schema.sql')
+    join_partitions = mysql2pgsql.join_partitions
+    monkeypatch.setattr(mysql2pgsql, 'join_partitions', crash)
+    with pytest.raises(RuntimeError):
+        mysql2pgsql.convert_dump(str(dump), str(output), schema, **options)
+    monkeypatch.setattr(mysql2pgsql, 'join_partitions', join_partitions)
+
+    mysql2pgsql.convert_dump(str(dump), str(output), schema, **options)
+    assert output.read_text() == reference.read_text()
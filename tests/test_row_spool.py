@@ -0,0 +1,34 @@
+import os
+
+from row_spool import RowSpool
+
+
+def test_rows_come_back_per_table_in_order():
+    with RowSpool(flush_rows=3) as spool:
+        spool.append('b/../x', ['id'], [(1,), (2,)])
+        spool.append('a', ['id', 'name'], [(1, 'x')])
+        spool.append('b/../x', ['other'], [(n,) for n in range(3, 10)])
+        assert spool.tables() == ['b/../x', 'a']
+        assert spool.columns('b/../x') == ['id']
+        assert spool.row_count('b/../x') == 9
+        assert list(spool.iter_rows('b/../x')) == [(n,) for n in range(1, 10)]
+        # A batch that fills the buffer is flushed with it as one chunk
+        assert [len(chunk) for chunk in spool.iter_chunks('b/../x')] == [9]
+        assert list(spool.iter_rows('a')) == [(1, 'x')]
+        directory = spool.directory
+    assert not os.path.exists(directory)
+
+
+def test_memory_is_bounded_by_flush_rows():
+    with RowSpool(flush_rows=4) as spool:
+        for n in range(10):
+            spool.append('t', ['id'], [(n,)])
+            assert len(spool._buffers['t']) < 4
+        assert [len(chunk) for chunk in spool.iter_chunks('t')] == [4, 4, 2]
+
+
+def test_given_directory_is_kept(tmp_path):
+    with RowSpool(str(tmp_path)) as spool:
+        spool.append('t', ['id'], [(1,)])
+        assert list(spool.iter_rows('t')) == [(1,)]
+    assert tmp_path.exists() and os.listdir(tmp_path) == []
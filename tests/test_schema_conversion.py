@@ -0,0 +1,54 @@
+import importlib
+
+step2 = importlib.import_module('2_convert_to_pgsql_scheme')
+
+CREATE = """CREATE TABLE `users` (
+  `id` int(11) unsigned NOT NULL AUTO_INCREMENT,
+  `name` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT 'int(11) tinyint(1)',
+  `active` tinyint(1) NOT NULL DEFAULT '1',
+  `price` decimal(10,2) DEFAULT NULL,
+  `kind` enum('a','b') DEFAULT 'a',
+  `born` date NOT NULL DEFAULT '0000-00-00',
+  `data` longblob,
+  `created` datetime DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+  `score` double DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `email` (`name`(10)),
+  KEY `idx_price` (`price`),
+  FULLTEXT KEY `ft` (`name`),
+  CONSTRAINT `fk` FOREIGN KEY (`kind`) REFERENCES `kinds` (`id`)
+) ENGINE=InnoDB AUTO_INCREMENT=42 DEFAULT CHARSET=utf8mb4;"""
+
+
+def test_create_table():
+    create, indexes, foreign_keys = step2.convert_create_table(CREATE)
+    assert create == """CREATE TABLE users (
+  id serial NOT NULL,
+  name character varying(255) DEFAULT 'int(11) tinyint(1)',
+  active boolean NOT NULL DEFAULT true,
+  price numeric(10,2) DEFAULT NULL,
+  kind character varying DEFAULT 'a',
+  born date,
+  data bytea,
+  created timestamp DEFAULT NULL,
+  score double precision DEFAULT NULL,
+  PRIMARY KEY (id)
+);"""
+    assert indexes == ['CREATE UNIQUE INDEX users_email ON users (name);',
+                       'CREATE INDEX users_idx_price ON users (price);']
+    assert foreign_keys == ['ALTER TABLE users\n  ADD FOREIGN KEY (kind) REFERENCES kinds(id);']
+
+
+def test_types_in_strings_and_identifiers_are_left_alone():
+    assert step2.convert_ddl("`text` text COMMENT 'x', `int` varchar(3) DEFAULT 'blob'") == \
+        "text text, int character varying(3) DEFAULT 'blob'"
+
+
+def test_auto_increment_added_by_alter_table(tmp_path):
+    creates = ["CREATE TABLE `t` (\n  `id` bigint(20) NOT NULL,\n  `name` text\n) ENGINE=InnoDB;"]
+    alters = ["ALTER TABLE `t`\n  MODIFY `id` bigint(20) NOT NULL AUTO_INCREMENT, AUTO_INCREMENT=7;"]
+    schema_file = tmp_path / 'schema.sql'
+    step2.write_schema(creates, alters, str(schema_file))
+    text = schema_file.read_text()
+    assert '  id bigserial NOT NULL,' in text
+    assert 'ALTER TABLE t\n  ADD PRIMARY KEY (id);' in text
@@ -0,0 +1,23 @@
+import pytest
+
+import mysql2pgsql
+
+DUMP = """CREATE TABLE `items` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(20) DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB;
+
+INSERT INTO `items` (`id`, `name`) VALUES (1,'a'),(2,'b');
+INSERT INTO `items` (`id`, `name`) VALUES (1,'a');
+INSERT INTO `items` (`id`, `name`) VALUES (7,'c');
+"""
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_setval_survives_batches_emptied_by_dedup(tmp_path, jobs):
+    dump = tmp_path / 'dump.sql'
+    dump.write_text(DUMP)
+    output = tmp_path / 'out.sql'
+    mysql2pgsql.convert_dump(str(dump), str(output), str(tmp_path / 'schema.sql'), jobs=jobs, dedup='row')
+    assert "SELECT setval(pg_get_serial_sequence('items', 'id'), 8, false);" in output.read_text()
@@ -0,0 +1,47 @@
+import re
+import time
+
+import insert_parser
+from insert_parser import parse_insert, split_insert
+
+STATEMENT = (b"INSERT INTO `t` (`id`, `name`) VALUES (1,'a,(b'),(2,'c\\')'),(3,NULL),"
+             b"(4,'" + b'x' * 50 + b"'),(5,\"d\\\"),\");")
+
+
+def pieces_of(statement, max_bytes):
+    head_end, pieces = split_insert(statement, max_bytes)
+    return [statement[:head_end] + statement[start:end] for start, end in pieces]
+
+
+def test_pieces_hold_whole_tuples():
+    rows = parse_insert(STATEMENT.decode())[2]
+    for max_bytes in range(1, len(STATEMENT)):
+        pieces = pieces_of(STATEMENT, max_bytes)
+        split_rows = [row for piece in pieces for row in parse_insert(piece.decode().rstrip(';'))[2]]
+        assert split_rows == rows
+
+
+def test_cut_mid_tuple_ends_the_piece_before_it():
+    # max_bytes ends inside the fourth tuple's string
+    head_end, pieces = split_insert(STATEMENT, 60)
+    assert STATEMENT[pieces[0][0]:pieces[0][1]] == b"(1,'a,(b'),(2,'c\\')'),(3,NULL)"
+
+
+def run_end(pattern, values, end):
+    run = pattern.match(values, 0, end)
+    return run.end() if run else None
+
+
+def test_fallback_pattern_matches_the_same_runs():
+    fallback = re.compile(insert_parser._TUPLE_RUN_FALLBACK_PATTERN, re.VERBOSE)
+    values = STATEMENT[STATEMENT.index(b'VALUES ') + 7:]
+    for end in range(len(values) + 1):
+        assert run_end(fallback, values, end) == run_end(insert_parser._TUPLE_RUN, values, end)
+
+
+def test_fallback_pattern_gives_up_on_a_cut_tuple_quickly():
+    fallback = re.compile(insert_parser._TUPLE_RUN_FALLBACK_PATTERN, re.VERBOSE)
+    values = b'(1,2),(' + b'12345678,' * 10000
+    started = time.perf_counter()
+    assert run_end(fallback, values, len(values)) == 6
+    assert time.perf_counter() - started < 1
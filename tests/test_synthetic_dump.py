@@ -0,0 +1,30 @@
+import pytest
+
+import synthetic_dump
+from dump_reader import iter_statements
+from insert_parser import parse_insert
+
+
+@pytest.mark.parametrize('shape', sorted(synthetic_dump.SHAPES))
+def test_dump_parses_to_the_rows_it_reports(tmp_path, shape):
+    dump = str(tmp_path / 'dump.sql')
+    stats = synthetic_dump.generate_dump(dump, synthetic_dump.SHAPES[shape], 50_000)
+    rows = 0
+    tables = set()
+    for statement in iter_statements(dump):
+        parsed = parse_insert(statement)
+        if parsed:
+            table_name, _, parsed_rows = parsed
+            tables.add(table_name)
+            rows += len(parsed_rows)
+            assert all(len(row) == len(synthetic_dump.SHAPES[shape].columns) + 1 for row in parsed_rows)
+    assert (len(tables), rows) == (stats['tables'], stats['rows'])
+    assert stats['bytes'] == (tmp_path / 'dump.sql').stat().st_size
+
+
+def test_same_seed_same_dump(tmp_path):
+    shape = synthetic_dump.SHAPES['blob_heavy']
+    for name, seed in (('a', 1), ('b', 1), ('c', 2)):
+        synthetic_dump.generate_dump(str(tmp_path / name), shape, 20_000, seed)
+    assert (tmp_path / 'a').read_bytes() == (tmp_path / 'b').read_bytes()
+    assert (tmp_path / 'a').read_bytes() != (tmp_path / 'c').read_bytes()
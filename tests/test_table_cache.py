@@ -0,0 +1,46 @@
+import os
+
+import mysql2pgsql
+from schema_model import Schema
+from table_cache import TableCache
+
+DUMP = """CREATE TABLE `a` (`id` int NOT NULL AUTO_INCREMENT, PRIMARY KEY (`id`));
+CREATE TABLE `b` (`id` int NOT NULL AUTO_INCREMENT, `s` text, PRIMARY KEY (`id`));
+INSERT INTO `a` VALUES (1),(2);
+INSERT INTO `b` VALUES (1,'{}');
+"""
+
+
+def convert(tmp_path, name, payload, cache_dir=None):
+    dump = tmp_path / f'{name}.sql'
+    dump.write_text(DUMP.format(payload))
+    output = tmp_path / f'{name}_out.sql'
+    mysql2pgsql.convert_dump(str(dump), str(output), str(tmp_path / f'{name}_schema.sql'), cache_dir=cache_dir)
+    return output.read_text()
+
+
+def test_only_changed_tables_are_converted_again(tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    assert convert(tmp_path, 'first', 'x', cache_dir) == convert(tmp_path, 'plain', 'x')
+    capsys.readouterr()
+
+    assert convert(tmp_path, 'second', 'x', cache_dir) == convert(tmp_path, 'plain', 'x')
+    assert capsys.readouterr().out.count("Reusing cached output") == 2
+
+    assert convert(tmp_path, 'changed', 'y', cache_dir) == convert(tmp_path, 'plain', 'y')
+    reused = [line for line in capsys.readouterr().out.splitlines() if "Reusing cached output" in line]
+    assert reused == ["Reusing cached output for unchanged table a"]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TableCache(str(tmp_path / 'cache'), Schema(), max_bytes=10)
+    source = tmp_path / 'part.sql'
+    for n, key in enumerate(['old', 'used', 'new']):
+        source.write_text('12345')
+        cache.store(key, str(source), n=n)
+        os.utime(os.path.join(cache.directory, key + '.data'), ns=(n, n))
+    assert cache.fetch('old', str(source)) is None
+    assert cache.fetch('used', str(source)) == {'n': 1}
+    cache.store('newest', str(source), n=3)
+    assert cache.fetch('new', str(source)) is None
+    assert cache.fetch('used', str(source)) == {'n': 1}
@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+import pytest
+
+from pg_writer import column_kind, format_sql_value
+
+
+@pytest.mark.parametrize('column_type, kind', [
+    ('boolean', 'boolean'), ('bool', 'boolean'), ('bytea', 'bytea'), ('date', 'date'),
+    ('timestamp(6)', 'date'), ('integer', None), ('character varying(20)', None), (None, None),
+])
+def test_column_kind(column_type, kind):
+    assert column_kind(column_type) == kind
+
+
+@pytest.mark.parametrize('value, column_type, literal', [
+    (None, 'bytea', 'NULL'),
+    (b'\x00\xff', 'bytea', "'\\x00ff'"),
+    ('ab', 'bytea', "'\\x6162'"),
+    (b'\xff'.decode('utf-8', errors='surrogateescape'), 'bytea', "'\\xff'"),
+    (12, 'bytea', "'\\x3132'"),
+    ('0000-00-00 00:00:00', 'timestamp', 'NULL'),
+    ('2020-00-10', 'date', 'NULL'),
+    (0, 'date', 'NULL'),
+    ('2020-01-02 03:04:05', 'timestamp', "'2020-01-02 03:04:05'"),
+    (b'\x01', 'boolean', 'true'),
+    (b'\x00', 'boolean', 'false'),
+    (Decimal('0.0'), 'boolean', 'false'),
+    (' Yes ', 'boolean', 'true'),
+    ('maybe', 'boolean', 'NULL'),
+    (b'\x01\x02', None, "'\\x0102'"),
+    (Decimal('-1.50'), None, '-1.50'),
+    ("it's", None, "'it''s'"),
+])
+def test_sql_values(value, column_type, literal):
+    assert format_sql_value(value, column_type) == literal